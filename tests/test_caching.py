@@ -0,0 +1,117 @@
+import generic as g
+
+import shutil
+import tempfile
+
+from trimesh import caching
+
+class DiskCacheTest(g.unittest.TestCase):
+    def setUp(self):
+        self.path  = tempfile.mkdtemp()
+        self.truth = g.get_mesh('featuretype.STL')
+
+    def tearDown(self):
+        caching.set_disk_cache(None)
+        shutil.rmtree(self.path)
+
+    def mesh(self):
+        return g.trimesh.Trimesh(vertices = self.truth.vertices,
+                                 faces    = self.truth.faces)
+
+    def test_disk(self):
+        keys = ['face_adjacency',
+                'faces_unique_edges',
+                'bounding_box_oriented',
+                'identifier']
+        disk = caching.DiskCache(self.path,
+                                 keys = keys + ['face_adjacency_edges'])
+        caching.set_disk_cache(disk)
+
+        computed = self.mesh()
+        for key in keys:
+            getattr(computed, key)
+        self.assertTrue(len(disk.files()) == len(keys))
+
+        loaded = self.mesh()
+        # face adjacency edges are stored with face adjacency
+        self.assertTrue(g.np.allclose(loaded.face_adjacency_edges,
+                                      computed.face_adjacency_edges))
+        self.assertTrue(g.np.allclose(loaded.face_adjacency,
+                                      computed.face_adjacency))
+        self.assertTrue(g.np.allclose(loaded.faces_unique_edges,
+                                      computed.faces_unique_edges))
+        self.assertTrue(g.np.allclose(loaded.identifier,
+                                      computed.identifier))
+        self.assertTrue(g.np.allclose(loaded.bounding_box_oriented.box_extents,
+                                      computed.bounding_box_oriented.box_extents))
+        stats = loaded._cache.stats()
+        for key in keys:
+            self.assertTrue(stats[key]['loaded'] == 1)
+            self.assertTrue(stats[key]['compute_time'] == 0.0)
+
+        # a different mesh doesn't load the values
+        moved = self.mesh()
+        moved.apply_translation([1,0,0])
+        moved.face_adjacency
+        self.assertTrue(moved._cache.stats()['face_adjacency']['loaded'] == 0)
+
+        # a corrupt file is a miss rather than an error
+        for file_name, size, used in disk.files():
+            with open(file_name, 'wb') as file_obj:
+                file_obj.write(b'garbage')
+        corrupt = self.mesh()
+        self.assertTrue(g.np.allclose(corrupt.face_adjacency,
+                                      computed.face_adjacency))
+
+    def test_limit(self):
+        disk = caching.DiskCache(self.path, max_bytes=1)
+        caching.set_disk_cache(disk)
+        mesh = self.mesh()
+        mesh.face_adjacency
+        mesh.identifier
+        self.assertTrue(disk.nbytes <= 1)
+
+    def test_pack(self):
+        values = {'array'  : g.np.arange(10).reshape((-1,2)),
+                  'scalar' : 3.5,
+                  'ragged' : [g.np.arange(3), g.np.arange(5)],
+                  'tuple'  : (g.np.eye(3), g.np.ones(2)),
+                  'dict'   : {'a' : 1.0, 'b' : [1.0, 2.0]}}
+        unpacked = caching.unpack(caching.pack(values))
+        self.assertTrue(g.np.allclose(unpacked['array'], values['array']))
+        self.assertTrue(unpacked['scalar'] == 3.5)
+        self.assertTrue(len(unpacked['ragged']) == 2)
+        self.assertTrue(g.np.allclose(unpacked['ragged'][1], g.np.arange(5)))
+        self.assertTrue(isinstance(unpacked['tuple'], tuple))
+        self.assertTrue(unpacked['dict'] == values['dict'])
+        # objects which can't be stored as arrays aren't packed
+        self.assertTrue(caching.pack({'a' : object()}) is None)
+
+    def test_facets(self):
+        # facets with area are a tuple of a ragged list and an array
+        facets, area = self.truth.facets(return_area=True)
+        unpacked = caching.unpack(caching.pack({'facets_1' : (facets, area)}))
+        self.assertTrue(isinstance(unpacked['facets_1'], tuple))
+        self.assertTrue(isinstance(unpacked['facets_1'][0], list))
+        self.assertTrue(all(g.np.allclose(a, b) for a, b in 
+                            zip(unpacked['facets_1'][0], facets)))
+        self.assertTrue(g.np.allclose(unpacked['facets_1'][1], area))
+
+        # ragged tuples stay tuples
+        ragged = (g.np.arange(3), g.np.arange(5))
+        unpacked = caching.unpack(caching.pack({'ragged' : ragged}))
+        self.assertTrue(isinstance(unpacked['ragged'], tuple))
+
+        disk = caching.DiskCache(self.path)
+        caching.set_disk_cache(disk)
+        computed = self.mesh().facets(return_area=True)
+        loaded = self.mesh()
+        result = loaded.facets(return_area=True)
+        self.assertTrue(loaded._cache.stats()['facets_1']['loaded'] == 1)
+        self.assertTrue(isinstance(result, tuple))
+        self.assertTrue(len(result[0]) == len(computed[0]))
+        self.assertTrue(g.np.allclose(result[1], computed[1]))
+
+if __name__ == '__main__':
+    g.trimesh.util.attach_to_log()
+    g.unittest.main()
@@ -26,6 +26,165 @@ class ExportTest(g.unittest.TestCase):
                 self.assertTrue(loaded.vertices.shape == mesh.vertices.shape)
                 g.log.info('Mesh vertices/faces consistent after export->import')
                 
+    def test_stl(self):
+        mesh   = g.get_mesh('featuretype.STL')
+        export = mesh.export(file_type='stl')
+
+        for mmap in [False, True]:
+            loaded = g.trimesh.load(file_obj  = g.io_wrap(export),
+                                    file_type = 'stl',
+                                    mmap      = mmap)
+            self.assertTrue(g.np.allclose(loaded.triangles, mesh.triangles))
+
+        # loaders ignore keyword arguments they don't use
+        for name in ['ballA.off', 'tube.obj', 'octagonal_pocket.ply']:
+            file_name = g.os.path.join(g.dir_models, name)
+            loaded = g.trimesh.load_mesh(file_name, mmap=True)
+            self.assertTrue(len(loaded.faces) == len(g.get_mesh(name).faces))
+
+        file_name = g.os.path.join(g.dir_models, 'featuretype.STL')
+        with open(file_name, 'rb') as file_obj:
+            blob = g.trimesh.io.stl.stl_blob(file_obj, mmap=True)
+            self.assertTrue(isinstance(blob, g.np.memmap))
+            self.assertTrue(len(blob) == len(mesh.faces))
+            triangles = g.np.array(blob['vertices'])
+        with open(file_name, 'rb') as file_obj:
+            chunks = list(g.trimesh.io.stl.stl_chunks(file_obj, chunk_size=1000))
+        self.assertTrue(max(len(i) for i in chunks) == 1000)
+        self.assertTrue(g.np.allclose(g.np.vstack([i['vertices'] for i in chunks]),
+                                      triangles))
+
+    def test_ply(self):
+        def ply_blob(vertices, faces, colors):
+            # a binary PLY with a list of vertex indices and a color per face
+            header = '''ply
+format binary_little_endian 1.0
+element vertex {}
+property float x
+property float y
+property float z
+element face {}
+property list uchar int vertex_indices
+property uchar red
+property uchar green
+property uchar blue
+end_header
+'''.format(len(vertices), len(faces)).encode('utf-8')
+            blob = header + g.np.array(vertices, dtype='<f4').tobytes()
+            for face, color in zip(faces, colors):
+                blob += (g.np.array(len(face), dtype='u1').tobytes() + 
+                         g.np.array(face, dtype='<i4').tobytes() + 
+                         g.np.array(color, dtype='u1').tobytes())
+            return blob
+
+        vertices = [[0,0,0], [1,0,0], [1,1,0], [0,1,0], [0,0,1]]
+
+        # mixed list lengths are read and fan triangulated
+        blob = ply_blob(vertices, 
+                        faces  = [[0,1,2,3], [0,1,4], [1,2,4]],
+                        colors = [[255,0,0], [0,255,0], [0,0,255]])
+        loaded = g.trimesh.io.ply.load_ply(g.io_wrap(blob))
+        self.assertTrue((loaded['faces'] == [[0,1,2], [0,2,3], [0,1,4], [1,2,4]]).all())
+        self.assertTrue((loaded['face_colors'] == [[255,0,0], [255,0,0], 
+                                                   [0,255,0], [0,0,255]]).all())
+
+        # constant length lists which aren't triangles are triangulated
+        blob = ply_blob(vertices,
+                        faces  = [[0,1,2,3], [1,2,4,0]],
+                        colors = [[255,0,0], [0,255,0]])
+        loaded = g.trimesh.io.ply.load_ply(g.io_wrap(blob))
+        self.assertTrue((loaded['faces'] == [[0,1,2], [0,2,3], [1,2,4], [1,4,0]]).all())
+        self.assertTrue((loaded['face_colors'] == [[255,0,0], [255,0,0], 
+                                                   [0,255,0], [0,255,0]]).all())
+        mesh = g.trimesh.load(g.io_wrap(blob), file_type='ply')
+        self.assertTrue(len(mesh.faces) == 4)
+        self.assertTrue((mesh.visual.face_colors[:,:3] == loaded['face_colors']).all())
+
+        # a single pentagon
+        blob = ply_blob(vertices, 
+                        faces  = [[0,1,2,3,4]],
+                        colors = [[255,0,0]])
+        loaded = g.trimesh.io.ply.load_ply(g.io_wrap(blob))
+        self.assertTrue((loaded['faces'] == [[0,1,2], [0,2,3], [0,3,4]]).all())
+        self.assertTrue(len(loaded['face_colors']) == 3)
+
+        # constant length lists are read as a single memory mapped view
+        file_name = g.os.path.join(g.dir_models, 'octagonal_pocket.ply')
+        with open(file_name, 'rb') as file_obj:
+            loaded = g.trimesh.io.ply.load_ply(file_obj, mmap=True)
+        self.assertTrue(isinstance(loaded['faces'], g.np.memmap))
+        mesh = g.get_mesh('octagonal_pocket.ply')
+        self.assertTrue(mesh.is_watertight)
+
+    def test_obj(self):
+        def load(text):
+            # parse with blocks which split lines and one large block
+            loaded = [g.trimesh.io.wavefront.load_wavefront(g.io_wrap(text), 
+                                                            block_size = block_size)
+                      for block_size in [7, 2**20]]
+            for key in ['vertices', 'faces']:
+                self.assertTrue(g.np.allclose(loaded[0][key], loaded[1][key]))
+            return loaded[1]
+
+        # quads, mixed index syntax and relative indices
+        loaded = load('''# a comment
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0 1 0 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 1
+f 1/1/1 2/2/1 3/3/1 4/4/1
+v 0 0 1
+f -5/-4/1 -4/-3/1 -1/-1/1''')
+        self.assertTrue(loaded['vertices'].shape == (5,3))
+        self.assertTrue((loaded['faces'] == [[0,1,2], [0,2,3], [0,1,4]]).all())
+        self.assertTrue(g.np.allclose(loaded['vertex_normals'][:4], [0,0,1]))
+        self.assertTrue(g.np.allclose(loaded['metadata']['vertex_texture'][:4], 
+                                      [[0,0], [1,0], [1,1], [0,1]]))
+
+        # index syntax may change between face lines
+        loaded = load('''v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 1
+vn 0 0 1
+f 1 2 3
+f 1//1 3//1 4//1
+f 1/1 2/1 3/1
+f 1 3 4
+f 2/2/1 3/2/1 4/2/1''')
+        self.assertTrue((loaded['faces'] == [[0,1,2],
+                                             [0,2,3],
+                                             [0,1,2],
+                                             [0,2,3],
+                                             [1,2,3]]).all())
+        self.assertTrue(g.np.allclose(loaded['vertex_normals'], [0,0,1]))
+        self.assertTrue(g.np.allclose(loaded['metadata']['vertex_texture'],
+                                      [[0,0], [1,1], [1,1], [1,1]]))
+
+        # leading whitespace, tabs after keywords and inline comments
+        loaded = load('''v 0 0 0
+v\t1 0 0 # second vertex
+  v 0 1 0
+\tv 1 1 0\r
+f 1 2 3 # first face
+f\t1 3 4
+   f 2 4 3
+\tf 1 2 4 #f 1 2 3''')
+        self.assertTrue(g.np.allclose(loaded['vertices'], [[0,0,0], [1,0,0], 
+                                                           [0,1,0], [1,1,0]]))
+        self.assertTrue((loaded['faces'] == [[0,1,2], [0,2,3], 
+                                             [1,3,2], [0,1,3]]).all())
+
+        mesh = g.get_mesh('tube.obj')
+        self.assertTrue(mesh.is_watertight)
+                
 if __name__ == '__main__':
     g.trimesh.util.attach_to_log()
     g.unittest.main()
@@ -78,6 +78,128 @@ class MeshTests(g.unittest.TestCase):
             mesh.fill_holes()
             self.assertTrue(mesh.is_watertight)
             
+    def test_fill_holes_large(self):
+        mesh   = g.trimesh.creation.icosphere(4)
+        volume = mesh.volume
+        # remove patches of faces to make holes with many vertices
+        centers = g.trimesh.unitize(g.np.random.normal(size=(10,3)))
+        distance = g.np.linalg.norm(mesh.triangles_center[:,None,:] - centers, 
+                                    axis=2).min(axis=1)
+        mesh.faces = mesh.faces[distance > .15]
+        self.assertFalse(mesh.is_watertight)
+
+        self.assertFalse(mesh.copy().fill_holes(engine='networkx'))
+        self.assertTrue(mesh.fill_holes())
+        self.assertTrue(mesh.is_winding_consistent)
+        self.assertTrue(abs(mesh.volume - volume) < volume * .05)
+
+    def test_fill_holes_concave(self):
+        # a U shaped loop with an area of 28, and a convex hull of 36
+        vertices = g.np.array([[0,0,0], [6,0,0], [6,6,0], [4,6,0],
+                               [4,2,0], [2,2,0], [2,6,0], [0,6,0]],
+                              dtype=g.np.float64)
+        # the same loop rotated out of plane and reversed
+        rotated = g.trimesh.points.transform_points(
+            vertices, g.trimesh.transformations.random_rotation_matrix())
+        vertices = g.np.vstack((vertices, rotated))
+        loops    = g.np.append(g.np.arange(8), g.np.arange(8, 16)[::-1])
+        loop_id  = g.np.repeat([0, 1], 8)
+
+        faces = g.trimesh.repair.triangulate_loops(vertices, loops, loop_id)
+        self.assertTrue(len(faces) == 12)
+        for loop in [0, 1]:
+            triangles = vertices[faces[faces.max(axis=1) // 8 == loop]]
+            area = g.trimesh.triangles.area(triangles)
+            self.assertTrue(g.np.isclose(area, 28.0))
+            # every fill triangle winds the same way as a convex corner
+            normals  = g.trimesh.triangles.normals(triangles)[0]
+            expected = g.trimesh.triangles.normals(
+                [vertices[loops[loop * 8:loop * 8 + 3]]])[0][0]
+            self.assertTrue((g.np.dot(normals, expected) > 0.0).all())
+
+    def test_components(self):
+        for mesh in g.get_meshes(5):
+            components = [g.trimesh.graph.connected_components(mesh.face_adjacency,
+                                                                nodes  = len(mesh.faces),
+                                                                engine = engine)
+                          for engine in ['scipy', 'networkx']]
+            self.assertTrue(len(components[0]) == len(components[1]))
+            self.assertTrue(sorted(len(i) for i in components[0]) == 
+                            sorted(len(i) for i in components[1]))
+
+    def test_fix_winding(self):
+        for mesh in g.get_meshes(5):
+            if not mesh.is_watertight: continue
+            faces = mesh.faces.copy()
+            flip  = g.np.random.random(len(faces)) < .3
+            faces[flip] = faces[flip][:,::-1]
+            broken = g.trimesh.Trimesh(vertices = mesh.vertices,
+                                       faces    = faces,
+                                       process  = False)
+            self.assertFalse(broken.is_winding_consistent)
+            g.trimesh.repair.fix_face_winding(broken)
+            self.assertTrue(broken.is_winding_consistent)
+            self.assertTrue(g.np.isclose(abs(broken.volume), mesh.volume))
+
+    def test_submesh_packed(self):
+        sphere = g.trimesh.creation.icosphere(1)
+        count  = 20
+        vertices = g.np.vstack([sphere.vertices + [i * 3.0, 0, 0] 
+                                for i in range(count)])
+        faces    = g.np.vstack([sphere.faces + i * len(sphere.vertices) 
+                                for i in range(count)])
+        mesh = g.trimesh.Trimesh(vertices, faces, process=False)
+
+        packed = mesh.split(packed=True)
+        self.assertTrue(len(packed) == count)
+        self.assertTrue(packed.watertight.all())
+        self.assertTrue(len(packed.vertices) == len(vertices))
+
+        meshes = mesh.split()
+        self.assertTrue(len(meshes) == count)
+        for a, b in zip(packed, meshes):
+            self.assertTrue(a.is_watertight)
+            self.assertTrue(g.np.allclose(a.vertices, b.vertices))
+            self.assertTrue(g.np.allclose(a.triangles, b.triangles))
+
+        # submeshes which aren't watertight have their holes filled
+        index = [g.np.arange(len(sphere.faces)), 
+                 g.np.arange(len(sphere.faces), len(sphere.faces) * 2 - 1), 
+                 g.np.arange(len(sphere.faces) * 2, len(sphere.faces) * 2 + 2)]
+        subset = mesh.submesh(index, only_watertight=True, packed=True)
+        self.assertTrue(len(subset) == 2)
+        self.assertTrue(subset.watertight.all())
+        self.assertTrue(g.np.allclose(subset[1].bounds, 
+                                      sphere.bounds + [3.0, 0, 0]))
+
+        appended = mesh.submesh(index[:2], append=True)
+        self.assertTrue(len(appended.faces) == len(sphere.faces) * 2 - 1)
+            
+    def test_subdivide_to_size(self):
+        for mesh in g.get_meshes(5):
+            if not mesh.is_watertight: continue
+            volume   = mesh.volume
+            max_edge = mesh.scale / 10
+            mesh.subdivide_to_size(max_edge, max_iter=20)
+            length = g.np.linalg.norm(g.np.diff(mesh.vertices[mesh.edges_unique], 
+                                                axis=1).reshape((-1,3)), 
+                                      axis=1)
+            self.assertTrue(length.max() <= max_edge)
+            self.assertTrue(mesh.is_watertight)
+            self.assertTrue(mesh.is_winding_consistent)
+            self.assertTrue(g.np.isclose(mesh.volume, volume))
+
+    def test_decimate(self):
+        mesh = g.trimesh.creation.icosphere(5)
+        vertices, faces, index = g.trimesh.remesh.decimate_clustering(mesh.vertices,
+                                                                      mesh.faces,
+                                                                      pitch = .1)
+        self.assertTrue(len(faces) < len(mesh.faces) / 5)
+        self.assertTrue(len(index) == len(faces))
+        decimated = g.trimesh.Trimesh(vertices, faces)
+        self.assertTrue(decimated.is_watertight)
+        self.assertTrue(abs(decimated.volume - mesh.volume) < mesh.volume * .05)
+
     def test_fix_normals(self):
         for mesh in g.get_meshes(5):
             mesh.fix_normals()
@@ -8,6 +8,28 @@ class PackingTest(g.unittest.TestCase):
     def test_obb(self):
         from trimesh.path import packing as packing
         inserted, transforms = packing.multipack(self.nestable)
+        self.assertTrue(inserted.all())
+
+    def test_packer(self):
+        from trimesh.path import packing as packing
+        sizes = g.np.random.random((500,2)) * [10, 5] + .5
+        packer = packing.Packer(sheet_size=[40,40])
+        sheets, offsets = packer.add_many(sizes)
+        self.assertTrue((sheets >= 0).all())
+        self.assertTrue(packer.sheet_count > 1)
+        # a rectangle larger than the sheet isn't added
+        self.assertTrue(packer.add([50, 1])[0] is None)
+
+        for sheet in range(packer.sheet_count):
+            low  = offsets[sheets == sheet]
+            high = low + sizes[sheets == sheet]
+            self.assertTrue((low >= 0.0).all() and (high <= 40.0 + 1e-9).all())
+            # no rectangles on a sheet overlap
+            overlap = ((low[:,None] < high[None,:] - 1e-9) & 
+                       (high[:,None] > low[None,:] + 1e-9)).all(axis=2)
+            g.np.fill_diagonal(overlap, False)
+            self.assertFalse(overlap.any())
+        self.assertTrue((packer.density() > .5).all())
 
 if __name__ == '__main__':
     g.trimesh.util.attach_to_log()
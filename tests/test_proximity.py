@@ -0,0 +1,61 @@
+import generic as g
+
+class NearestTest(g.unittest.TestCase):
+    def test_naive(self):
+        mesh   = g.get_mesh('featuretype.STL')
+        points = (g.np.random.random((100,3)) * mesh.extents * 1.5) + mesh.bounds[0]
+
+        closest, distance, tid = mesh.nearest.on_surface(points)
+        self.assertTrue(g.np.allclose(g.np.linalg.norm(closest - points, axis=1), 
+                                      distance))
+
+        # check against every triangle for every point
+        for point, dist in zip(points, distance):
+            on_tri = g.trimesh.triangles.closest_point(mesh.triangles,
+                                                       g.np.tile(point, (len(mesh.faces), 1)))
+            truth = g.np.linalg.norm(on_tri - point, axis=1).min()
+            self.assertTrue(abs(truth - dist) < g.tol.merge)
+
+    def test_degenerate(self):
+        # cube centered at the origin with side length 1
+        mesh = g.get_mesh('unit_cube.STL')
+        # add a colinear and a colocated triangle beside the cube
+        vertices = g.np.vstack((mesh.vertices, 
+                                [[2, 0, 0], [3, 0, 0], [4, 0, 0]]))
+        count = len(mesh.vertices)
+        faces = g.np.vstack((mesh.faces, 
+                             [[count, count + 2, count + 1],
+                              [count, count, count + 2]]))
+        degenerate = g.trimesh.Trimesh(vertices, faces, process=False)
+        # keep the faces with zero area
+        degenerate._validate = False
+
+        # points beside the degenerate triangles and inside the cube
+        points = g.np.vstack(([[3.0, 1.0, 0.0],
+                               [2.5, 0.0, 1.0]], 
+                              g.np.random.random((100,3)) - .5))
+        closest, distance, tid = degenerate.nearest.on_surface(points)
+        self.assertTrue(g.np.isfinite(closest).all())
+        self.assertTrue((tid < len(mesh.faces)).all())
+
+        truth = mesh.nearest.on_surface(points)[1]
+        self.assertTrue(g.np.allclose(distance, truth))
+
+    def test_cube(self):
+        # cube centered at the origin with side length 1
+        mesh = g.get_mesh('unit_cube.STL')
+        points = g.np.array([[0.0, 0.0, 0.0],
+                             [0.0, 0.0, 0.4],
+                             [0.0, 0.0, 1.0],
+                             [1.0, 1.0, 1.0]])
+        truth = [.5, .1, -.5, -(.75 ** .5)]
+
+        distance = mesh.nearest.signed_distance(points)
+        self.assertTrue(g.np.allclose(distance, truth))
+
+        distance, vertex_id = mesh.nearest.vertex(points[-1:])
+        self.assertTrue(g.np.allclose(mesh.vertices[vertex_id], .5))
+
+if __name__ == '__main__':
+    g.trimesh.util.attach_to_log()
+    g.unittest.main()
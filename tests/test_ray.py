@@ -34,6 +34,52 @@ class RayTests(g.unittest.TestCase):
         rps = dimension[0] / (toc-tic)
         g.log.info('Measured %f rays/second', rps)
 
+    def test_batch(self):
+        mesh = g.get_mesh('unit_sphere.STL')
+        count = 100
+        rays_ori = g.np.random.random((count, 3)) - .5
+        rays_ori[:,2] = -5
+        rays_dir = g.np.tile([0,0,1], (count, 1))
+        rays = g.np.column_stack((rays_ori, rays_dir)).reshape((-1,2,3))
+
+        offsets, hit_id, t, bary = mesh.ray.intersects_batch(rays)
+        self.assertTrue(len(offsets) == count + 1)
+        self.assertTrue(offsets[-1] == len(hit_id) == len(t) == len(bary))
+        self.assertTrue(g.np.allclose(bary.sum(axis=1), 1.0))
+
+        # the hit location from t should match the barycentric location
+        ray_index = g.np.repeat(g.np.arange(count), g.np.diff(offsets))
+        on_ray = rays_ori[ray_index] + rays_dir[ray_index] * t.reshape((-1,1))
+        on_tri = (mesh.triangles[hit_id] * bary.reshape((-1,3,1))).sum(axis=1)
+        self.assertTrue(g.np.allclose(on_ray, on_tri))
+
+        # check against the single ray kernel with every triangle
+        for i in range(count):
+            single = g.trimesh.ray.ray_triangle_cpu.ray_triangles(mesh.triangles, 
+                                                                   *rays[i])
+            self.assertTrue(g.np.array_equal(g.np.sort(hit_id[offsets[i]:offsets[i+1]]),
+                                             g.np.nonzero(single)[0]))
+
+    def test_bvh(self):
+        mesh  = g.get_mesh('featuretype.STL')
+        tree  = mesh.triangles_tree()
+        boxes = g.np.sort(g.np.random.random((20,2,3)), axis=1)
+        boxes = boxes * mesh.extents + mesh.bounds[0]
+
+        box_index, tri_index = tree.query_boxes(boxes)
+        tri_bounds = g.np.stack((mesh.triangles.min(axis=1),
+                                 mesh.triangles.max(axis=1)), axis=1)
+        for i, box in enumerate(boxes):
+            truth = g.np.nonzero(g.np.logical_and((box[0] <= tri_bounds[:,1]).all(axis=1),
+                                                  (box[1] >= tri_bounds[:,0]).all(axis=1)))[0]
+            self.assertTrue(g.np.array_equal(g.np.sort(tri_index[box_index == i]), 
+                                             truth))
+            self.assertTrue(g.np.array_equal(g.np.sort(tree.intersection(box.reshape(-1))), 
+                                             truth))
+        # every primitive should be referenced by exactly one leaf
+        leaves = g.np.nonzero(tree.is_leaf)[0]
+        self.assertTrue(tree.node_count[leaves].sum() == len(mesh.faces))
+
     def test_contains(self):
         mesh = g.get_mesh('unit_cube.STL')
         scale = 1+(g.trimesh.constants.tol.merge*2)
@@ -46,6 +92,27 @@ class RayTests(g.unittest.TestCase):
         self.assertTrue(test_in.all())
         self.assertFalse(test_out.any())
 
+    def test_winding(self):
+        mesh   = g.get_mesh('unit_sphere.STL')
+        points = (g.np.random.random((1000,3)) - .5) * 3.0
+        radius = g.np.linalg.norm(points, axis=1)
+        # stay away from the tesselated surface
+        points = points[g.np.abs(radius - 1.0) > .05]
+        truth  = g.np.linalg.norm(points, axis=1) < 1.0
+
+        winding = mesh.winding.number(points)
+        self.assertTrue(g.np.allclose(winding, truth, atol=.05))
+        self.assertTrue((mesh.contains(points) == truth).all())
+        self.assertTrue((mesh.contains(points, engine='ray') == truth).all())
+
+        # the approximation should match the exact sum
+        exact = mesh.winding.number(points[:20], beta=g.np.inf)
+        self.assertTrue(g.np.allclose(exact, truth[:20]))
+
+        # points on vertices are on the boundary
+        on_vertex = mesh.winding.number(mesh.vertices)
+        self.assertTrue(g.np.allclose(on_vertex, .5, atol=.1))
+
 if __name__ == '__main__':
     g.trimesh.util.attach_to_log()
     g.unittest.main()
@@ -19,6 +19,156 @@ class GraphTests(unittest.TestCase):
         for i in range(5000):
             g.add_edge(random_chr(), random_chr())
 
+class TransformTests(unittest.TestCase):
+    def test_cache(self):
+        forest = trimesh.scene.transforms.TransformForest()
+        # a deep chain with branches, and some edges stored backwards
+        for i in range(100):
+            parent = 'world' if i == 0 else i - 1
+            matrix = trimesh.transformations.random_rotation_matrix()
+            matrix[0:3,3] = np.random.random(3)
+            if i % 3 == 0:
+                forest.update(frame_from = i, 
+                              frame_to   = parent, 
+                              matrix     = np.linalg.inv(matrix))
+            else:
+                forest.update(frame_from = parent, 
+                              frame_to   = i, 
+                              matrix     = matrix)
+            forest.update(frame_from = i, 
+                          frame_to   = str(i), 
+                          matrix     = np.eye(4))
+
+        def path_product(frame):
+            path      = forest._get_path('world', frame)
+            transform = np.eye(4)
+            for u, v in zip(path[:-1], path[1:]):
+                data, direction = forest.transforms.get_edge_data_direction(u, v)
+                matrix = data['matrix']
+                if direction < 0:
+                    matrix = np.linalg.inv(matrix)
+                transform = np.dot(transform, matrix)
+            return transform
+
+        frames = list(range(100)) + [str(i) for i in range(100)]
+        stack  = forest.get_many(frames)
+        self.assertTrue(stack.shape == (200,4,4))
+        truth  = np.array([path_product(i) for i in frames])
+        self.assertTrue(np.allclose(stack, truth))
+
+        # updating a transform only changes frames below it
+        before = forest.get_many(frames)
+        forest.update(frame_from = 49, 
+                      frame_to   = 50,
+                      matrix     = trimesh.transformations.random_rotation_matrix())
+        self.assertTrue(0 in forest._world)
+        self.assertFalse(99 in forest._world)
+        after = forest.get_many(frames)
+        moved = ~np.isclose(before, after).all(axis=(1,2))
+        self.assertTrue(set(np.array(frames, dtype=object)[moved]) ==
+                        set(list(range(50,100)) + [str(i) for i in range(50,100)]))
+        self.assertTrue(np.allclose(after, [path_product(i) for i in frames]))
+
+        # matrices returned can be changed without changing the cache
+        matrix = forest.get(10)
+        matrix[0:3,3] += 1.0
+        self.assertTrue(np.allclose(forest.get(10), after[10]))
+        self.assertTrue(np.allclose(forest.get(10, frame_from = 5),
+                                    np.dot(np.linalg.inv(after[5]), after[10])))
+
+        self.assertRaises(nx.NetworkXNoPath, forest.get, 'not a frame')
+
+class SceneTests(unittest.TestCase):
+    def test_instances(self):
+        box      = trimesh.creation.box()
+        cylinder = trimesh.creation.cylinder(radius=.1, height=1.0)
+        count    = 1000
+        transforms = [trimesh.transformations.random_rotation_matrix() 
+                      for i in range(count)]
+        for matrix in transforms:
+            matrix[0:3,3] = np.random.random(3) * 10
+        # a reflection, which reverses the winding of faces
+        transforms[0] = np.diag([-1.0, 1.0, 1.0, 1.0])
+        box.metadata['transforms']      = transforms
+        cylinder.metadata['transforms'] = transforms[:10]
+
+        instanced = trimesh.scene.Scene()
+        instanced.add_mesh([box, cylinder], instanced=True)
+        nodes = trimesh.scene.Scene()
+        nodes.add_mesh([box, cylinder])
+
+        self.assertTrue(len(instanced.nodes) == 0)
+        self.assertTrue(instanced.instances['mesh_0'].shape == (count,4,4))
+        self.assertTrue(np.allclose(instanced.bounds, nodes.bounds))
+        self.assertTrue(np.allclose(instanced.centroid, nodes.centroid))
+
+        dumped = instanced.dump()
+        self.assertTrue(len(dumped) == count + 10)
+        merged = instanced.dump(concatenate=True)
+        self.assertTrue(len(merged.faces) == sum(len(i.faces) for i in dumped))
+        self.assertTrue(np.allclose(merged.bounds, instanced.bounds))
+        self.assertTrue(np.isclose(merged.volume, sum(i.volume for i in dumped)))
+        self.assertTrue(np.isclose(merged.volume, nodes.dump(concatenate=True).volume))
+        self.assertTrue(np.allclose(merged.face_normals, 
+                                    trimesh.triangles.normals(merged.triangles)[0]))
+
+        # changing the instance table changes the cached bounds
+        bounds = instanced.bounds.copy()
+        instanced.instances['mesh_0'][:,0:3,3] += 100.0
+        self.assertFalse(np.allclose(instanced.bounds, bounds))
+
+    def test_raster(self):
+        from trimesh.scene import raster
+        sphere = trimesh.creation.icosphere()
+        sphere.visual.face_colors = [255, 0, 0, 255]
+        scene = trimesh.scene.Scene(sphere)
+
+        for smooth in [True, False]:
+            image = raster.render_scene(scene, 
+                                        resolution = (64,48), 
+                                        smooth     = smooth)
+            self.assertTrue(image.shape == (48,64,4))
+            # the sphere is in the middle and red
+            center = image[24,32].astype(int)
+            self.assertTrue(center[0] > 0 and center[0] > center[1] + 50)
+            # the background is in the corners
+            self.assertTrue((image[0,0] == image[-1,-1]).all())
+            self.assertFalse((image[0,0] == image[24,32]).all())
+
+            # a reflected instance of a symmetric mesh looks the same
+            # rather than having its faces culled as back faces
+            reflected = sphere.copy()
+            reflected.metadata['transforms'] = [np.diag([-1.0, 1.0, 1.0, 1.0])]
+            mirror = trimesh.scene.Scene()
+            mirror.add_mesh(reflected, instanced=True)
+            mirror.set_camera()
+            scene.set_camera()
+            self.assertTrue((raster.render_scene(mirror, 
+                                                 resolution = (64,48),
+                                                 smooth     = smooth) == 
+                             raster.render_scene(scene,
+                                                 resolution = (64,48),
+                                                 smooth     = smooth)).all())
+
+        # a blue box in front of the sphere hides it
+        box = trimesh.creation.box()
+        box.apply_scale(.5)
+        box.visual.face_colors = [0, 0, 255, 255]
+        box.metadata['transforms'] = [trimesh.transformations.translation_matrix([0,0,1.5])]
+        scene.add_mesh(box)
+        image = raster.render_scene(scene, resolution=(64,48))
+        center = image[24,32].astype(int)
+        self.assertTrue(center[2] > center[0] + 50)
+
+        images = raster.render_scenes([scene, scene], 
+                                      resolution = (64,48), 
+                                      processes  = 2)
+        self.assertTrue(all((i == image).all() for i in images))
+
+        png = raster.export_png(image)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertRaises(ValueError, scene.save_image, 'nothing.png', engine='nothing')
+
 if __name__ == '__main__':
     trimesh.util.attach_to_log()
     unittest.main()
@@ -26,6 +26,43 @@ class SectionTest(g.unittest.TestCase):
             assert planar.is_closed
             assert (len(planar.polygons_full) > 0)
 
+    def test_multiplane(self):
+        # sections at many levels should match sectioning one at a time
+        step = .125
+        heights = g.np.arange(start = self.mesh.bounds[0][2] - step,
+                              stop  = self.mesh.bounds[1][2] + 2*step,
+                              step  = step)[::-1]
+        normal = [0,0,1]
+
+        lines = g.trimesh.intersections.mesh_multiplane(mesh         = self.mesh,
+                                                        plane_normal = normal,
+                                                        plane_origin = [0,0,0],
+                                                        heights      = heights,
+                                                        chunk_size   = 100)
+        sections = self.mesh.section_multiplane(plane_normal = normal,
+                                                plane_origin = [0,0,0],
+                                                heights      = heights)
+        assert len(lines) == len(heights)
+        assert len(sections) == len(heights)
+
+        for z, line, section in zip(heights, lines, sections):
+            single = g.trimesh.intersections.mesh_plane(mesh         = self.mesh,
+                                                        plane_normal = normal,
+                                                        plane_origin = [0,0,z])
+            assert len(single) == len(line)
+            if len(line) == 0:
+                assert section is None
+                continue
+            assert g.np.allclose(g.np.sort(single.reshape((-1,3)), axis=0),
+                                 g.np.sort(line.reshape((-1,3)), axis=0))
+
+            # sections are 2D and move back onto the plane at their height
+            vertices = g.np.column_stack((section.vertices,
+                                          g.np.zeros(len(section.vertices))))
+            vertices = g.trimesh.points.transform_points(vertices,
+                                                         section.metadata['to_3D'])
+            assert g.np.allclose(vertices[:,2], z)
+
 if __name__ == '__main__':
     g.trimesh.util.attach_to_log()
     g.unittest.main()
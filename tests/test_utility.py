@@ -80,6 +80,193 @@ class UtilTests(unittest.TestCase):
         modified.append(int(a.md5(), 16))
         self.assertTrue((np.diff(modified) == 0).all())
 
+    def test_hash(self):
+        data = np.random.random((300000, 3))
+        for hasher in ['md5', 'blake2b']:
+            for incremental in [False, True]:
+                trimesh.util.set_hash_function(hasher, incremental=incremental)
+                a = trimesh.util.tracked_array(data.copy())
+                a.md5()
+                a[10] = 1.0
+                a[-5:, 1] = 2.0
+                a[[3, 200000]] += 1.0
+                b = trimesh.util.tracked_array(np.array(a))
+                self.assertTrue(a.md5() == b.md5())
+        trimesh.util.set_hash_function()
+
+        # shape and dtype are part of the hash
+        a = trimesh.util.tracked_array(np.arange(6))
+        self.assertFalse(a.md5() == a.reshape((2, 3)).md5())
+        self.assertFalse(a.md5() == a.view(np.float64).md5())
+
+    def test_version(self):
+        a = trimesh.util.tracked_array(np.random.random(TEST_DIM))
+        versions = deque([a.version])
+        a[0][0] = 10
+        versions.append(a.version)
+        a[1:] += 1
+        versions.append(a.version)
+        # writes to a view are writes to the array
+        b = a[:,0]
+        b *= 2
+        versions.append(a.version)
+        self.assertTrue((np.diff(versions) > 0).all())
+
+        # reading and slicing doesn't change the version
+        version = a.version
+        c = a[[0,1,2]] + a[1:].sum()
+        self.assertTrue(a.version == version)
+
+    def test_versioned_cache(self):
+        m = g.get_mesh('featuretype.STL')
+        m = trimesh.Trimesh(vertices   = m.vertices, 
+                            faces      = m.faces,
+                            cache_mode = 'version')
+        area  = m.area
+        edges = m.edges_unique
+        adjacency = m.face_adjacency
+
+        # moving vertices keeps values only computed from faces
+        m.vertices[:,0] *= 2.0
+        self.assertTrue(m.edges_unique is edges)
+        self.assertTrue(m.face_adjacency is adjacency)
+        self.assertFalse(np.isclose(m.area, area))
+        self.assertTrue(np.isclose(m.area, m.area_faces.sum()))
+        self.assertTrue(np.allclose(m.face_normals,
+                                    trimesh.triangles.normals(m.triangles)[0]))
+
+        # changing faces clears them
+        m.faces = m.faces[::-1]
+        self.assertFalse(m.edges_unique is edges)
+        self.assertTrue(np.allclose(m.edges_unique, 
+                                    trimesh.Trimesh(m.vertices, 
+                                                    m.faces, 
+                                                    process=False).edges_unique))
+
+    def test_cache_stats(self):
+        trimesh.util.reset_cache_stats()
+        m = g.get_mesh('featuretype.STL')
+        m.face_adjacency
+        m.face_adjacency
+        stats = m._cache.stats()['face_adjacency']
+        self.assertTrue(stats['hits'] == 1)
+        self.assertTrue(stats['misses'] == 1)
+        self.assertTrue(stats['compute_time'] > 0.0)
+        self.assertTrue(stats['nbytes'] == m.face_adjacency.nbytes)
+
+        # reads by the library itself aren't counted, such as the
+        # face normals checked every time faces are requested
+        hits = m._cache.stats()['face_adjacency']['hits']
+        for i in range(3):
+            m.faces
+            m.face_adjacency
+        stats = m._cache.stats()
+        self.assertTrue(stats['face_adjacency']['hits'] == hits + 3)
+        self.assertTrue(stats['face_normals']['hits'] == 0)
+        self.assertTrue(stats['face_normals']['misses'] == 0)
+
+        m.vertices = m.vertices + 1.0
+        m.face_adjacency
+        stats = m._cache.stats()['face_adjacency']
+        self.assertTrue(stats['invalidated'] == 1)
+        self.assertTrue(stats['misses'] == 2)
+
+        # global stats include every mesh and are plain data
+        other = g.get_mesh('featuretype.STL')
+        other.face_adjacency
+        total = trimesh.util.cache_stats()
+        self.assertTrue(total['face_adjacency']['misses'] == 3)
+        json.dumps(total)
+
+        trimesh.util.reset_cache_stats()
+        total = trimesh.util.cache_stats()['face_adjacency']
+        self.assertTrue(total['misses'] == 0)
+        # other live meshes may also hold values
+        self.assertTrue(total['nbytes'] >= 2 * m.face_adjacency.nbytes)
+
+    def test_cache_limit(self):
+        m = g.get_mesh('featuretype.STL')
+        truth = trimesh.Trimesh(m.vertices, m.faces)
+        keys = ['face_adjacency', 
+                'face_adjacency_edges', 
+                'faces_unique_edges', 
+                'edges_face',
+                'area',
+                'face_normals']
+
+        for policy in ['lru', 'cost']:
+            for limit in [0, 10000, 100000]:
+                m = trimesh.Trimesh(truth.vertices, 
+                                    truth.faces, 
+                                    cache_limit=limit)
+                m._cache.policy = policy
+                # evicted values are recomputed transparently
+                for key in keys * 3:
+                    self.assertTrue(np.allclose(getattr(m, key),
+                                                getattr(truth, key)))
+                    # the value just stored by face_normals is kept
+                    self.assertTrue(m._cache._held <= 
+                                    limit + truth.face_normals.nbytes)
+                evicted = sum(v['evicted'] for v in m._cache.stats().values())
+                self.assertTrue(evicted > 0)
+
+        # process- wide limit across meshes
+        try:
+            trimesh.util.set_cache_limit(500000)
+            meshes = [trimesh.Trimesh(truth.vertices, truth.faces) 
+                      for i in range(5)]
+            for mesh in meshes:
+                mesh.face_adjacency
+                mesh.triangles
+            held = sum(v['nbytes'] for v in trimesh.util.cache_stats().values())
+            self.assertTrue(held <= 500000)
+        finally:
+            trimesh.util.set_cache_limit(None)
+
+    def test_cache_limit_tree(self):
+        truth = g.get_mesh('featuretype.STL')
+        points = ((np.random.random((100, 3)) - .5) * truth.scale) + truth.centroid
+        contains = truth.contains(points)
+        distance = truth.nearest.on_surface(points)[1]
+
+        # a tree is counted by the arrays it holds
+        tree = truth.triangles_bvh()
+        self.assertTrue(trimesh.util.nbytes_object(tree) >=
+                        tree.primitives.nbytes + tree.node_bounds.nbytes)
+
+        # a budget smaller than the tree evicts it between queries
+        try:
+            trimesh.util.set_cache_limit(tree.primitives.nbytes)
+            m = trimesh.Trimesh(truth.vertices, truth.faces)
+            for i in range(3):
+                self.assertTrue((m.contains(points) == contains).all())
+                self.assertTrue(np.allclose(m.nearest.on_surface(points)[1],
+                                            distance))
+                m.face_adjacency
+            stats = trimesh.util.cache_stats()
+            self.assertTrue(stats['tree']['evicted'] > 0)
+            self.assertTrue(stats['dipoles']['evicted'] > 0)
+        finally:
+            trimesh.util.set_cache_limit(None)
+
+class WeldTests(unittest.TestCase):
+    def test_weld(self):
+        mesh = g.get_mesh('featuretype.STL')
+        soup = np.vstack([mesh.triangles.reshape((-1,3))] * 2)
+
+        unique, inverse = trimesh.grouping.weld_vertices(soup)
+        self.assertTrue(len(unique) == len(trimesh.grouping.unique_rows(soup)[0]))
+        self.assertTrue(np.allclose(soup[unique][inverse], soup))
+        # unique vertices are in order of appearance
+        self.assertTrue((np.diff(unique) > 0).all())
+
+        # welding in chunks gives the same result as all at once
+        welder = trimesh.grouping.VertexWelder()
+        index  = np.hstack([welder.add(i) for i in np.array_split(soup, 7)])
+        self.assertTrue((index == inverse).all())
+        self.assertTrue(np.allclose(welder.vertices, soup[unique]))
+        self.assertTrue(welder.merged == len(soup) - len(unique))
+
 class SceneTests(unittest.TestCase):
     def setUp(self):
         filename = os.path.join(g.dir_models, 'box.STL')
@@ -96,7 +283,7 @@ class IOTest(unittest.TestCase):
     def test_dae(self):
         a = g.get_mesh('ballA.off')
         r = a.export(file_type='dae')
- 
+
 class ContainsTest(unittest.TestCase):
     def setUp(self):
         self.sphere = g.get_mesh('unit_sphere.STL')
@@ -0,0 +1,74 @@
+import generic as g
+
+class VoxelTest(g.unittest.TestCase):
+    def test_scanline(self):
+        from trimesh import voxel
+        for name in ['unit_sphere.STL', 'box.STL']:
+            mesh  = g.get_mesh(name)
+            pitch = mesh.scale / 30
+
+            scan = voxel.mesh_to_run(mesh, pitch)
+            ray  = voxel.mesh_to_run(mesh, pitch, engine='ray')
+
+            self.assertTrue(g.np.allclose(scan['origin'], ray['origin']))
+            self.assertTrue((voxel.run_to_raw(**scan) == 
+                             voxel.run_to_raw(**ray)).all())
+
+    def test_surface(self):
+        mesh  = g.get_mesh('unit_sphere.STL')
+        pitch = mesh.scale / 30
+
+        filled  = mesh.voxelized(pitch)
+        surface = mesh.voxelized(pitch, fill=False)
+        self.assertTrue(surface.raw.sum() < filled.raw.sum())
+
+        # every vertex should be inside an occupied surface voxel
+        index = g.np.floor((mesh.vertices - surface.origin) / pitch).astype(int)
+        index = g.np.clip(index, 0, g.np.array(surface.raw.shape) - 1)
+        self.assertTrue(surface.raw[tuple(index.T)].all())
+
+        # the center of the sphere is inside
+        center = g.np.floor((-surface.origin) / pitch).astype(int)
+        self.assertTrue(filled.raw[tuple(center)])
+        self.assertFalse(surface.raw[tuple(center)])
+
+    def test_sparse(self):
+        mesh  = g.get_mesh('unit_sphere.STL')
+        pitch = mesh.scale / 30
+        a = mesh.voxelized(pitch)
+        self.assertTrue(a.filled_count == a.raw.sum())
+        self.assertTrue(g.np.isclose(a.volume(), a.raw.sum() * pitch**3))
+
+        points = (g.np.random.random((1000, 3)) * 2.4) - 1.2
+        index  = g.np.floor((points - a.origin) / pitch).astype(int)
+        valid  = g.np.logical_and((index >= 0).all(axis=1),
+                                  (index < a.shape).all(axis=1))
+        truth  = g.np.zeros(len(points), dtype=bool)
+        truth[valid] = a.raw[tuple(index[valid].T)]
+        self.assertTrue((a.is_filled(points) == truth).all())
+
+        region = a.raw_region([2, 4, 6], [20, 25, 12])
+        self.assertTrue((region == a.raw[2:20, 4:25, 6:12]).all())
+
+        moved = mesh.copy()
+        moved.apply_translation([.5, 0, 0])
+        b = moved.voxelized(pitch)
+
+        union        = a.union(b)
+        intersection = a.intersection(b)
+        difference   = a.difference(b)
+        self.assertTrue(union.filled_count == (a.filled_count + 
+                                               b.filled_count - 
+                                               intersection.filled_count))
+        self.assertTrue(difference.filled_count == (a.filled_count - 
+                                                    intersection.filled_count))
+        self.assertTrue(union.is_filled(a.points).all())
+        self.assertFalse(difference.is_filled(b.points).any())
+
+        boxes = a.as_mesh()
+        self.assertTrue(boxes.is_watertight)
+        self.assertTrue(g.np.isclose(boxes.volume, a.volume()))
+
+if __name__ == '__main__':
+    g.trimesh.util.attach_to_log()
+    g.unittest.main()
@@ -24,6 +24,8 @@ from . import remesh
 from . import bounds
 from . import units
 from . import permutate
+from . import proximity
+from . import winding
 
 from .io.export    import export_mesh
 from .ray.ray_mesh import RayMeshIntersector, contains_points
@@ -47,6 +49,8 @@ class Trimesh(object):
                  vertex_normals = None,
                  metadata       = None,
                  process        = True,
+                 cache_mode     = 'md5',
+                 cache_limit    = None,
                  **kwargs):
         '''
         A Trimesh object contains a triangular 3D mesh. 
@@ -61,6 +65,11 @@ class Trimesh(object):
         vertex_normals: (n,3) float set of normal vectors for vertices
         metadata:       dict, any metadata about the mesh
         process:        bool, if True basic mesh cleanup will be done on instantiation
+        cache_mode:     str, 'md5' clears cached values when the md5 of the mesh
+                        changes, 'version' clears each value only when the arrays
+                        it was computed from are written to, which avoids hashing
+        cache_limit:    int, maximum bytes of cached values held by this mesh,
+                        above which the least recently used are evicted
         '''
         # self._data stores information about the mesh which CANNOT be regenerated.
         # in the base class all that is stored here is vertex and face information
@@ -70,8 +79,16 @@ class Trimesh(object):
 
         # self._cache stores information about the mesh which CAN be regenerated from
         # self._data, but may be slow to calculate. In order to maintain consistency
-        # the cache is cleared when self._data.md5() changes
-        self._cache = util.Cache(id_function = self._data.md5)
+        # the cache is cleared when self._data.md5() changes, or with a versioned cache
+        # each value is cleared when the arrays it was computed from are changed
+        if cache_mode == 'version':
+            self._cache = util.Cache(id_function = self._data.md5,
+                                     store       = self._data)
+        elif cache_mode == 'md5':
+            self._cache = util.Cache(id_function = self._data.md5)
+        else:
+            raise ValueError('Cache mode must be md5 or version!')
+        self._cache.max_bytes = cache_limit
 
         # check for None only to avoid warning messages in subclasses
         if vertices is not None:
@@ -104,6 +121,12 @@ class Trimesh(object):
         # and is cached for subsequent queries
         self.ray = RayMeshIntersector(self)
 
+        # query the mesh for the closest points and signed distances
+        self.nearest = proximity.ProximityQuery(self)
+
+        # generalized winding numbers for robust containment queries
+        self.winding = winding.WindingQuery(self)
+
         # a quick way to get permuated versions of the current mesh
         self.permutate = permutate.Permutator(self)
         
@@ -161,7 +184,7 @@ class Trimesh(object):
 
         Returns
         ----------
-        md5: string, appended md5 hashes of numpy arrays for faces and vertices
+        md5: string, hash of the md5 hashes of numpy arrays for faces and vertices
         '''
         md5 = self._data.md5()
         return md5
@@ -217,7 +240,10 @@ class Trimesh(object):
     @face_normals.setter
     def face_normals(self, values):
         if values is None: return
-        self._cache['face_normals'] = np.asanyarray(values, dtype=np.float64)
+        # face normals are regenerated from the triangles if missing
+        self._cache.set('face_normals', 
+                        np.asanyarray(values, dtype=np.float64),
+                        evictable = True)
         
     @property
     def vertices(self):
@@ -253,15 +279,18 @@ class Trimesh(object):
                Available as an argument to avoid a circular reference in some functions
         '''
         if not self._validate: return 
-        # pull faces directly from DataStore to avoid infinite recursion
-        if faces is None:
-            faces = self._data['faces']
-        if np.shape(self._cache.get('face_normals')) != np.shape(faces):
-            log.debug('Generating face normals as shape was incorrect')
-            tri_cached = self.vertices.view(np.ndarray)[faces]
-            face_normals, valid = triangles.normals(tri_cached)
-            self.update_faces(valid)
-            self._cache['face_normals'] = face_normals
+        # checking the shape of face normals shouldn't make the value
+        # being computed depend on vertices in a versioned cache
+        with self._cache.recording(merge=False):
+            # pull faces directly from DataStore to avoid infinite recursion
+            if faces is None:
+                faces = self._data['faces']
+            if np.shape(self._cache.get('face_normals')) != np.shape(faces):
+                log.debug('Generating face normals as shape was incorrect')
+                tri_cached = self.vertices.view(np.ndarray)[faces]
+                face_normals, valid = triangles.normals(tri_cached)
+                self.update_faces(valid)
+                self.face_normals = face_normals
 
     @util.cache_decorator
     def vertex_normals(self):
@@ -441,17 +470,44 @@ class Trimesh(object):
         triangles.flags.writeable = False
         return triangles
 
-    def triangles_tree(self):
+    def triangles_tree(self, engine=None):
         '''
-        An R-tree containing each face of the mesh.
+        A tree containing the bounding box of each face of the mesh.
+
+        Arguments
+        ----------
+        engine: str, 'bvh' (or None) for a pure numpy bounding volume
+                hierarchy or 'rtree' for an rtree.index
         
         Returns
         ----------
-        tree: rtree.index where each triangle in self.faces has a rectangular cell
+        tree: trimesh.bvh.BVH or rtree.index where each triangle 
+              in self.faces has a rectangular cell
         '''
-        tree = triangles.bounds_tree(self.triangles)
+        tree = triangles.bounds_tree(self.triangles, engine=engine)
         return tree
 
+    def triangles_bvh(self):
+        '''
+        A BVH of the triangles of the mesh, shared by the ray, proximity
+        and winding number queries and cached until the mesh changes.
+
+        Returns
+        ----------
+        tree: trimesh.bvh.BVH, the tree of the ray queries unless 
+              they use an rtree, in which case a separate BVH 
+        '''
+        # share the tree with the ray queries unless they use rtree
+        tree = self.ray.tree
+        if hasattr(tree, 'query_boxes'):
+            return tree
+        cached = self._cache.get('triangles_bvh')
+        if cached is not None:
+            return cached
+        return self._cache.set('triangles_bvh',
+                               self.triangles_tree(engine='bvh'),
+                               evictable = True)
+
     @util.cache_decorator
     def triangles_center(self):
         '''
@@ -663,7 +719,8 @@ class Trimesh(object):
         On the current mesh remove any faces which are duplicates. 
         '''
         unique, inverse = grouping.unique_rows(np.sort(self.faces, axis=1))
-        self.update_faces(unique)
+        # keep the remaining faces in their original order
+        self.update_faces(np.sort(unique))
         
     def rezero(self):
         '''
@@ -672,7 +729,7 @@ class Trimesh(object):
         self.apply_translation(self.bounds[0] * -1.0)
 
     @_log_time
-    def split(self, only_watertight=True, adjacency=None):
+    def split(self, only_watertight=True, adjacency=None, packed=False):
         '''
         Returns a list of Trimesh objects, based on face connectivity.
         Splits into individual components, sometimes referred to as 'bodies'
@@ -681,14 +738,16 @@ class Trimesh(object):
         ---------
         only_watertight: only meshes which are watertight are returned
         adjacency: if not None, override face adjacency with custom values (n,2)
+        packed: if True return a util.PackedMeshes object rather than a list
 
         Returns
         ---------
-        meshes: (n) list of Trimesh objects
+        meshes: (n) list of Trimesh objects, or util.PackedMeshes
         '''
         meshes = graph.split(self, 
                              only_watertight = only_watertight,
-                             adjacency       = adjacency)
+                             adjacency       = adjacency,
+                             packed          = packed)
         log.info('split found %i components', len(meshes))
         return meshes
         
@@ -852,6 +911,8 @@ class Trimesh(object):
         cached = self._cache[key]
         if cached is not None:
             return cached
+        if self._cache.disk_load(key, type(self).__name__):
+            return self._cache[key]
 
         facets = graph.facets(self)
         if return_area:
@@ -860,6 +921,7 @@ class Trimesh(object):
         else: 
             result = facets
         self._cache[key] = result
+        self._cache.disk_save(key, type(self).__name__)
         return result
             
     @_log_time    
@@ -872,15 +934,20 @@ class Trimesh(object):
         '''
         repair.fix_normals(self)
 
-    def fill_holes(self):
+    def fill_holes(self, engine=None):
         '''
-        Fill single triangle and single quad holes in the current mesh.
+        Fill holes in the current mesh.
+
+        Arguments
+        ----------
+        engine: str, 'loops' (or None) fills holes of any size,
+                'networkx' only fills single triangle and single quad holes
         
         Returns
         ----------
         watertight: bool, is the mesh watertight after the function completes
         '''
-        return repair.fill_holes(self)
+        return repair.fill_holes(self, engine=engine)
 
     def subdivide(self, face_index=None):
         '''
@@ -901,6 +968,24 @@ class Trimesh(object):
         '''
         remesh.subdivide(self, face_index=face_index)
 
+    def subdivide_to_size(self, max_edge, max_iter=10):
+        '''
+        Subdivide the mesh until every edge is shorter than max_edge.
+        Edges shared by two faces are split once, so a watertight 
+        mesh stays watertight.
+
+        Arguments
+        ----------
+        max_edge: float, maximum length of any edge
+        max_iter: int, maximum number of passes of edge splitting
+        '''
+        vertices, faces = remesh.subdivide_to_size(self.vertices.view(np.ndarray),
+                                                   self.faces.view(np.ndarray),
+                                                   max_edge = max_edge,
+                                                   max_iter = max_iter)
+        self.vertices = vertices
+        self.faces    = faces
+
     @_log_time
     def smoothed(self, angle=.4):
         '''
@@ -945,6 +1030,67 @@ class Trimesh(object):
         path = load_path(lines)
         return path
 
+    def section_multiplane(self,
+                           plane_normal,
+                           plane_origin,
+                           heights,
+                           processes = None):
+        '''
+        Return cross sections of the current mesh at many parallel planes.
+
+        Vertex heights are computed once and each face is only checked
+        against the planes it spans, which is much faster than calling
+        section once per plane.
+
+        Arguments
+        ---------
+        plane_normal: (3) vector for plane normal
+        plane_origin: (3) vector for plane origin
+        heights:      (n) float, distance of each plane from plane_origin
+                      along plane_normal
+        processes:    int, if passed build paths with a process pool
+
+        Returns
+        ---------
+        sections: (n) list of Path2D, or None for levels that
+                  don't intersect the mesh. The transform from each
+                  section back to 3D is stored in metadata['to_3D']
+        '''
+        heights = np.asanyarray(heights, dtype=np.float64).reshape(-1)
+        lines   = intersections.mesh_multiplane(mesh         = self,
+                                                plane_normal = plane_normal,
+                                                plane_origin = plane_origin,
+                                                heights      = heights)
+
+        # the transform which moves the plane at height zero onto XY
+        to_2D = geometry.plane_transform(origin = plane_origin,
+                                         normal = plane_normal)
+        planar = [transform_points(i.reshape((-1,3)),
+                                   to_2D)[:,:2].reshape((-1,2,2))
+                  for i in lines]
+
+        valid = [i for i, line in enumerate(planar) if len(line) > 0]
+        if processes is None:
+            paths = [load_path(planar[i]) for i in valid]
+        else:
+            from multiprocessing import Pool
+            pool = Pool(processes)
+            try:
+                paths = pool.map(load_path, [planar[i] for i in valid])
+            finally:
+                pool.close()
+                pool.join()
+
+        to_3D = np.linalg.inv(to_2D)
+        sections = [None] * len(heights)
+        for index, path in zip(valid, paths):
+            # sections are flat on the XY plane, offset them by height
+            offset = np.eye(4)
+            offset[2,3] = heights[index]
+            path.metadata['to_3D'] = np.dot(to_3D, offset)
+            sections[index] = path
+        return sections
+
     @util.cache_decorator
     def _convex_hull_raw(self):
         '''
@@ -1067,7 +1213,7 @@ class Trimesh(object):
         log.debug('Mesh transformed by matrix, normals restored to cache')
         return self
 
-    def voxelized(self, pitch):
+    def voxelized(self, pitch, fill=True):
         '''
         Return a Voxel object representing the current mesh
         discretized into voxels at the specified pitch
@@ -1075,12 +1221,13 @@ class Trimesh(object):
         Arguments
         ----------
         pitch: float, the edge length of a single voxel
+        fill:  bool, if False only voxelize the surface of the mesh
 
         Returns
         ----------
         voxelized: Voxel object representing the current mesh
         '''
-        voxelized = Voxel(self, pitch)
+        voxelized = Voxel(self, pitch, fill=fill)
         return voxelized
 
     def outline(self, face_ids=None):
@@ -1201,11 +1348,15 @@ class Trimesh(object):
         only_watertight: only return submeshes which are watertight. 
         append: return a single mesh which has the faces specified appended.
                  if this flag is set, only_watertight is ignored
+        packed: return a util.PackedMeshes object, which stores every
+                submesh in shared arrays and creates Trimesh objects
+                only when indexed
 
         Returns
         ---------
-        if append: Trimesh object
-        else:      list of Trimesh objects
+        if append:   Trimesh object
+        elif packed: util.PackedMeshes object
+        else:        list of Trimesh objects
         '''
         return util.submesh(mesh = self,
                             faces_sequence=faces_sequence, 
@@ -1304,14 +1455,18 @@ class Trimesh(object):
         return Trimesh(process=True, 
                        **boolean.intersection(meshes = np.append(self, other), 
                                               engine = engine))
-    def contains(self, points):
+    def contains(self, points, engine=None):
         '''
         Given a set of points, determine whether or not they are inside the mesh.
-        This raises an error if called on a non- watertight mesh.
+        A warning is logged if called on a non- watertight mesh.
 
         Arguments
         ---------
         points: (n,3) set of points in space
+        engine: str, how to check containment:
+                'winding' (or None): generalized winding number, which is 
+                                     robust to points near edges and vertices
+                'ray': parity of ray hits along +Z
         
         Returns
         ---------
@@ -1319,7 +1474,12 @@ class Trimesh(object):
         '''
         if not self.is_watertight: 
             log.warning('Mesh is non- watertight for contained point query!')
-        contains = contains_points(self, points)
+        if engine in [None, 'winding']:
+            contains = winding.contains_points(self, points)
+        elif engine == 'ray':
+            contains = contains_points(self, points)
+        else:
+            raise ValueError('contains engine {} is not available!'.format(engine))
         return contains
 
     def copy(self):
@@ -0,0 +1,543 @@
+'''
+trimesh.bvh: an array- backed bounding volume hierarchy
+
+The tree is stored as flat numpy arrays and built level by level with
+vectorized median splits, so no python loop runs over primitives.
+Queries are also evaluated a tree level at a time for every ray or
+box at once, returning flat (query index, primitive index) pairs.
+'''
+import numpy as np
+
+from .constants import log, tol, _log_time
+
+class BVH(object):
+    '''
+    Bounding volume hierarchy over a set of axis aligned bounding boxes.
+
+    Attributes
+    ----------
+    primitive_bounds: (n, 2, 3) float, AABB of each primitive
+    primitives:       (n,) int, primitive indices ordered so that every node
+                      references a contiguous range
+    node_bounds:      (k, 2, 3) float, AABB of each node
+    node_children:    (k, 2) int, child node indexes, -1 for leaves
+    node_start:       (k,) int, first index in primitives for each node
+    node_count:       (k,) int, number of primitives contained in each node
+    '''
+    def __init__(self, bounds, leaf_size=8):
+        '''
+        Build a BVH from a set of bounding boxes.
+
+        Arguments
+        ----------
+        bounds:    (n, 2, 3) float, [min, max] of each primitive or
+                   (n, 6) float, interleaved bounds [minx,miny,minz,maxx,maxy,maxz]
+        leaf_size: int, maximum number of primitives in a leaf node
+        '''
+        bounds = np.asanyarray(bounds, dtype=np.float64)
+        if len(bounds.shape) == 2:
+            bounds = bounds.reshape((-1, 2, 3))
+        if len(bounds.shape) != 3 or bounds.shape[1:] != (2, 3):
+            raise ValueError('Bounds must be (n,2,3) or (n,6)!')
+
+        self.primitive_bounds = bounds
+        self.leaf_size = max(int(leaf_size), 1)
+        self._build()
+
+    @_log_time
+    def _build(self):
+        '''
+        Populate the flat node arrays using median splits along the
+        longest axis of the primitive centroids in each node.
+        '''
+        bounds    = self.primitive_bounds
+        count     = len(bounds)
+        centroids = bounds.mean(axis=1)
+
+        # every node is at most this, as each split creates 2 nodes
+        # from one and leaves have at least one primitive
+        node_max = max(2 * count - 1, 1)
+        node_start    = np.zeros(node_max, dtype=np.int64)
+        node_count    = np.zeros(node_max, dtype=np.int64)
+        node_children = np.zeros((node_max, 2), dtype=np.int64) - 1
+
+        order = np.arange(count)
+        node_count[0] = count
+        node_total    = 1
+        # the nodes on the current level of the tree
+        level = np.array([0])
+
+        while len(level) > 0:
+            split = level[node_count[level] > self.leaf_size]
+            if len(split) == 0:
+                break
+            start = node_start[split]
+            size  = node_count[split]
+
+            # the positions in order occupied by every splitting node
+            position, owner = _ranges(start, size)
+
+            # split along the axis with the largest centroid extent
+            # centroids are gathered so each node is packed contiguously
+            cen     = centroids[order[position]]
+            packed  = np.cumsum(size) - size
+            cen_min = _reduce_ranges(np.minimum, cen, packed, size)
+            cen_max = _reduce_ranges(np.maximum, cen, packed, size)
+            axis    = (cen_max - cen_min).argmax(axis=1)
+
+            # sort every node's primitives along that node's axis
+            key = cen[np.arange(len(position)), axis[owner]]
+            resort = np.lexsort((key, owner))
+            order[position] = order[position][resort]
+
+            # median split into two children
+            left = size // 2
+            children = np.arange(node_total, node_total + 2 * len(split)).reshape((-1, 2))
+            node_total += 2 * len(split)
+
+            node_children[split] = children
+            node_start[children[:,0]] = start
+            node_count[children[:,0]] = left
+            node_start[children[:,1]] = start + left
+            node_count[children[:,1]] = size - left
+
+            level = children.reshape(-1)
+
+        self.primitives    = order
+        self.node_start    = node_start[:node_total]
+        self.node_count    = node_count[:node_total]
+        self.node_children = node_children[:node_total]
+
+        # with primitives ordered every node is a contiguous range
+        self.node_bounds = np.zeros((node_total, 2, 3))
+        if count > 0:
+            self.node_bounds[:,0] = self.node_reduce(np.minimum, bounds[:,0])
+            self.node_bounds[:,1] = self.node_reduce(np.maximum, bounds[:,1])
+        log.debug('BVH built with %d nodes for %d primitives', node_total, count)
+
+    @property
+    def is_leaf(self):
+        '''
+        Returns
+        ----------
+        is_leaf: (k,) bool, which nodes have no children
+        '''
+        return self.node_children[:,0] < 0
+
+    def node_reduce(self, ufunc, values):
+        '''
+        Reduce a per- primitive value over the primitives contained 
+        by every node of the tree.
+
+        Arguments
+        ----------
+        ufunc:  numpy ufunc with a reduceat method, eg np.add
+        values: (n, *) values, indexed by primitive
+
+        Returns
+        ----------
+        reduced: (k, *) values reduced over each node
+        '''
+        values = np.asanyarray(values)
+        if len(values) != len(self.primitives):
+            raise ValueError('Must be one value per primitive!')
+        reduced = _reduce_ranges(ufunc,
+                                 values[self.primitives],
+                                 self.node_start,
+                                 self.node_count)
+        return reduced
+
+    def node_primitives(self, node):
+        '''
+        Expand a set of nodes into the primitives they contain.
+
+        Arguments
+        ----------
+        node: (m,) int, node indexes
+
+        Returns
+        ----------
+        owner:     (p,) int, index into node for each primitive
+        primitive: (p,) int, primitive index
+        '''
+        node = np.asanyarray(node, dtype=np.int64)
+        position, owner = _ranges(self.node_start[node],
+                                  self.node_count[node])
+        return owner, self.primitives[position]
+
+    @property
+    def bounds(self):
+        '''
+        Bounds of every primitive in the tree, in the interleaved
+        format used by rtree.
+
+        Returns
+        ----------
+        bounds: (6,) float, [minx, miny, minz, maxx, maxy, maxz]
+        '''
+        return self.node_bounds[0].reshape(-1)
+
+    def intersection(self, bounds):
+        '''
+        Find the primitives whose bounding boxes intersect a box.
+        Matches the rtree.index.Index.intersection call signature.
+
+        Arguments
+        ----------
+        bounds: (6,) float, interleaved [minx,miny,minz,maxx,maxy,maxz]
+
+        Returns
+        ----------
+        indexes: (m,) int, primitives intersecting the box
+        '''
+        boxes = np.reshape(bounds, (1, 2, 3))
+        return self.query_boxes(boxes)[1]
+
+    def query_boxes(self, boxes):
+        '''
+        Find every pair of query box and primitive whose bounding boxes overlap.
+
+        Arguments
+        ----------
+        boxes: (m, 2, 3) float, [min, max] of query boxes
+
+        Returns
+        ----------
+        box_index:       (p,) int, index of query box
+        primitive_index: (p,) int, index of primitive
+        '''
+        boxes = np.asanyarray(boxes, dtype=np.float64).reshape((-1, 2, 3))
+
+        def box_test(query, node):
+            return box_test_pairs(boxes[query], self.node_bounds[node])
+
+        query, primitive = self._traverse(len(boxes), box_test)
+        # leaves contain primitives which may not overlap the box
+        ok = box_test_pairs(boxes[query], self.primitive_bounds[primitive])
+        return query[ok], primitive[ok]
+
+    def query_rays(self, origins, directions):
+        '''
+        Find every pair of ray and primitive where the ray passes through
+        the bounding box of the primitive.
+
+        Arguments
+        ----------
+        origins:    (m, 3) float, ray origins
+        directions: (m, 3) float, ray directions
+
+        Returns
+        ----------
+        ray_index:       (p,) int, index of ray
+        primitive_index: (p,) int, index of primitive
+        '''
+        origins    = np.asanyarray(origins,    dtype=np.float64).reshape((-1, 3))
+        directions = np.asanyarray(directions, dtype=np.float64).reshape((-1, 3))
+        with np.errstate(divide='ignore'):
+            inverse = 1.0 / directions
+
+        # pad boxes so rays grazing a flat primitive are not rejected
+        # by floating point error before the narrow phase sees them
+        pad = np.array([[-1.0], [1.0]]) * tol.merge
+
+        def ray_test(query, node):
+            return ray_box_pairs(origins[query],
+                                 inverse[query],
+                                 self.node_bounds[node] + pad)
+
+        ray_index, primitive = self._traverse(len(origins), ray_test)
+        ok = ray_box_pairs(origins[ray_index],
+                           inverse[ray_index],
+                           self.primitive_bounds[primitive] + pad)
+        return ray_index[ok], primitive[ok]
+
+    def query_nearest(self, points, distance, mask=None):
+        '''
+        Find the closest primitive to each point.
+
+        The search radius of each point starts at the closest primitive in
+        the leaf reached by always stepping into the nearer child. The tree
+        is then descended for every point at once, and as every primitive
+        in a node is no further than the farthest corner of the node's box
+        the radius also shrinks on every level.
+        The leaves that remain are then evaluated in rounds ordered by 
+        their distance to each point, with the radius shrinking to the 
+        closest primitive found after every round, so only leaves close
+        to the result are ever evaluated.
+
+        Arguments
+        ----------
+        points:   (m, 3) float, points in space
+        distance: function, distance(query, primitive) returns (p,) float
+                  distance from points[query] to each primitive, where
+                  non- finite values discard the primitive
+        mask:     (n,) bool, which primitives may be returned, or None for all
+
+        Returns
+        ----------
+        primitive_index: (m,) int, closest primitive to each point, or -1
+        distance:        (m,) float, distance to that primitive, or inf
+        '''
+        points = np.asanyarray(points, dtype=np.float64).reshape((-1, 3))
+
+        # nodes containing no allowed primitives are never entered
+        # so the farthest corner of every node bounds the result
+        if mask is None:
+            node_ok = np.ones(len(self.node_start), dtype=bool)
+        else:
+            mask    = np.asanyarray(mask, dtype=bool)
+            node_ok = self.node_reduce(np.logical_or, mask)
+
+        result = np.zeros(len(points), dtype=np.int64) - 1
+        best   = np.zeros(len(points), dtype=np.float64) + np.inf
+        radius = best.copy()
+        if len(self.primitive_bounds) == 0 or not node_ok[0]:
+            return result, best
+
+        def evaluate(query, node):
+            # evaluate every primitive in a set of leaves and keep 
+            # the closest for each point if it is an improvement
+            owner, primitive = self.node_primitives(node)
+            candidate = query[owner]
+            if mask is not None:
+                allowed   = mask[primitive]
+                candidate = candidate[allowed]
+                primitive = primitive[allowed]
+
+            value = np.asanyarray(distance(candidate, primitive),
+                                  dtype=np.float64)
+            value[np.logical_not(np.isfinite(value))] = np.inf
+
+            order = np.lexsort((value, candidate))
+            first = order[np.append(True, np.diff(candidate[order]) != 0)]
+            first = first[value[first] < best[candidate[first]]]
+            result[candidate[first]] = primitive[first]
+            best[candidate[first]]   = value[first]
+            radius[candidate[first]] = np.minimum(radius[candidate[first]], 
+                                                  value[first])
+
+        # start with the leaf reached by always stepping into the
+        # nearer child, which is usually close to the result
+        dive   = np.zeros(len(points), dtype=np.int64)
+        branch = self.node_children[dive, 0] >= 0
+        while branch.any():
+            children = self.node_children[dive[branch]]
+            near = np.column_stack([_box_distance(points[branch], 
+                                                  self.node_bounds[c])[0]
+                                    for c in children.T])
+            near[np.logical_not(node_ok[children])] = np.inf
+            dive[branch] = children[np.arange(len(children)), 
+                                    near.argmin(axis=1)]
+            branch = self.node_children[dive, 0] >= 0
+        evaluate(np.arange(len(points)), dive)
+
+        query = np.arange(len(points))
+        node  = np.zeros(len(points), dtype=np.int64)
+        # the (query, leaf, distance to leaf) reached by the descent
+        leaves = []
+        while len(query) > 0:
+            keep  = node_ok[node]
+            query = query[keep]
+            node  = node[keep]
+
+            if len(query) == 0:
+                break
+            near, far = _box_distance(points[query], self.node_bounds[node])
+            # query is sorted so reduce the farthest corner per point
+            start = np.append(0, np.nonzero(np.diff(query))[0] + 1)
+            owner = query[start]
+            radius[owner] = np.minimum(radius[owner], 
+                                       np.minimum.reduceat(far, start))
+            # pad so floating point error never prunes the closest node
+            keep  = near <= radius[query] + tol.merge
+            query = query[keep]
+            node  = node[keep]
+            near  = near[keep]
+
+            # the leaf reached by the dive was already evaluated
+            leaf = self.node_children[node, 0] < 0
+            done = np.logical_and(leaf, node == dive[query])
+            new  = np.logical_and(leaf, np.logical_not(done))
+            leaves.append((query[new], node[new], near[new]))
+
+            branch = np.logical_not(leaf)
+            query  = np.repeat(query[branch], 2)
+            node   = self.node_children[node[branch]].reshape(-1)
+
+        query, node, near = [np.hstack(i) for i in zip(*leaves)]
+        # rank the leaves of every point from nearest to farthest
+        order = np.lexsort((near, query))
+        query, node, near = query[order], node[order], near[order]
+        start = np.append(0, np.nonzero(np.diff(query))[0] + 1)
+        rank  = np.arange(len(query)) - np.repeat(start, np.diff(np.append(start, 
+                                                                           len(query))))
+        # evaluate ranks [0, 1), [1, 2), [2, 4), [4, 8)...
+        low = 0
+        while len(query) > 0:
+            high    = max(low * 2, 1)
+            current = rank < high
+            evaluate(query[current], node[current])
+
+            # drop evaluated leaves and leaves outside the new radius
+            keep = np.logical_and(np.logical_not(current),
+                                  near <= radius[query] + tol.merge)
+            query, node, near, rank = query[keep], node[keep], near[keep], rank[keep]
+            low = high
+
+        return result, best
+
+    def _traverse(self, query_count, test):
+        '''
+        Descend the tree for every query at once, one level per iteration.
+
+        Arguments
+        ----------
+        query_count: int, number of queries
+        test:        function, test(query, node) returns (p,) bool
+                     for whether query should descend into node
+
+        Returns
+        ----------
+        query_index:     (p,) int, index of query
+        primitive_index: (p,) int, index of primitive in a leaf reached by query
+        '''
+        query = np.arange(query_count)
+        node  = np.zeros(query_count, dtype=np.int64)
+        if len(self.primitive_bounds) == 0:
+            query = query[:0]
+
+        result_query = []
+        result_prim  = []
+        while len(query) > 0:
+            hit   = test(query, node)
+            query = query[hit]
+            node  = node[hit]
+
+            leaf = self.node_children[node, 0] < 0
+            if leaf.any():
+                owner, primitive = self.node_primitives(node[leaf])
+                result_query.append(query[leaf][owner])
+                result_prim.append(primitive)
+
+            branch = np.logical_not(leaf)
+            query  = np.repeat(query[branch], 2)
+            node   = self.node_children[node[branch]].reshape(-1)
+
+        if len(result_query) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        query_index     = np.hstack(result_query)
+        primitive_index = np.hstack(result_prim)
+        # return pairs grouped by query
+        order = np.argsort(query_index, kind='mergesort')
+        return query_index[order], primitive_index[order]
+
+def _box_distance(points, boxes):
+    '''
+    Pairwise distance from points to the closest and farthest 
+    point of axis aligned bounding boxes.
+
+    Arguments
+    ----------
+    points: (n, 3) float, points in space
+    boxes:  (n, 2, 3) float, [min, max] boxes
+
+    Returns
+    ----------
+    near: (n,) float, distance from points[i] to boxes[i], zero if inside
+    far:  (n,) float, distance from points[i] to the farthest corner of boxes[i]
+    '''
+    near = np.maximum(np.maximum(boxes[:,0] - points, 
+                                 points - boxes[:,1]), 0.0)
+    far  = np.maximum(np.abs(points - boxes[:,0]),
+                      np.abs(points - boxes[:,1]))
+    return np.linalg.norm(near, axis=1), np.linalg.norm(far, axis=1)
+
+def box_test_pairs(a, b):
+    '''
+    Pairwise overlap test of axis aligned bounding boxes.
+
+    Arguments
+    ----------
+    a: (n, 2, 3) float, [min, max] boxes
+    b: (n, 2, 3) float, [min, max] boxes
+
+    Returns
+    ----------
+    overlap: (n,) bool, whether a[i] and b[i] overlap
+    '''
+    overlap = np.logical_and((a[:,0] <= b[:,1]).all(axis=1),
+                             (a[:,1] >= b[:,0]).all(axis=1))
+    return overlap
+
+def ray_box_pairs(origins, inverse, boxes):
+    '''
+    Pairwise slab test of rays against axis aligned bounding boxes.
+    Only the part of the ray in front of the origin is considered.
+
+    Arguments
+    ----------
+    origins: (n, 3) float, ray origins
+    inverse: (n, 3) float, 1.0 / ray direction (inf for zero components)
+    boxes:   (n, 2, 3) float, [min, max] boxes
+
+    Returns
+    ----------
+    hit: (n,) bool, whether ray i passes through box i
+    '''
+    with np.errstate(invalid='ignore'):
+        t_a = (boxes[:,0] - origins) * inverse
+        t_b = (boxes[:,1] - origins) * inverse
+    # a zero direction component with the origin on the slab plane
+    # gives 0 * inf = nan, which should not reject the box
+    t_a[np.isnan(t_a)] = -np.inf
+    t_b[np.isnan(t_b)] =  np.inf
+    t_near = np.minimum(t_a, t_b).max(axis=1)
+    t_far  = np.maximum(t_a, t_b).min(axis=1)
+    hit = np.logical_and(t_far >= t_near, t_far >= 0.0)
+    return hit
+
+def _ranges(start, count):
+    '''
+    Expand a set of ranges into a flat index array.
+
+    Arguments
+    ----------
+    start: (n,) int, first index of each range
+    count: (n,) int, length of each range
+
+    Returns
+    ----------
+    position: (count.sum(),) int, every index in every range
+    owner:    (count.sum(),) int, which range each index belongs to
+    '''
+    start = np.asanyarray(start, dtype=np.int64)
+    count = np.asanyarray(count, dtype=np.int64)
+    owner = np.repeat(np.arange(len(count)), count)
+    # position relative to the start of each range
+    offset   = np.arange(len(owner)) - np.repeat(np.cumsum(count) - count, count)
+    position = start[owner] + offset
+    return position, owner
+
+def _reduce_ranges(ufunc, values, start, count):
+    '''
+    Reduce contiguous ranges of values with a numpy ufunc.
+
+    Arguments
+    ----------
+    ufunc:  numpy ufunc with a reduceat method, eg np.minimum
+    values: (n, d) values
+    start:  (m,) int, first index of each range in values
+    count:  (m,) int, length of each range, must be nonzero
+
+    Returns
+    ----------
+    reduced: (m, d) values reduced over each range
+    '''
+    start = np.asanyarray(start, dtype=np.int64)
+    count = np.asanyarray(count, dtype=np.int64)
+    # reduceat reduces between consecutive indices, so interleave the
+    # start and end of every range and discard the gap reductions
+    values  = np.concatenate((values, values[:1]))
+    indices = np.column_stack((start, start + count)).reshape(-1)
+    reduced = ufunc.reduceat(values, indices, axis=0)[::2]
+    return reduced
@@ -0,0 +1,419 @@
+'''
+trimesh.caching: persistent on-disk cache of derived mesh properties
+
+Expensive cached properties (face adjacency, facets, convex hulls, etc)
+are stored as numpy files in a directory, keyed by the md5 of the data
+they were computed from, and loaded on a cache miss before recomputing.
+
+Files are written to a temporary name and renamed into place so other
+processes never read a partial file, and reads which race an eviction
+are treated as a miss.
+'''
+import numpy as np
+
+import os
+import tempfile
+
+from collections import deque
+
+from . import util
+from .constants import log
+
+# cached properties which are persisted unless keys are passed
+_DISK_KEYS = ['face_adjacency',
+              'face_adjacency_edges',
+              'facets_0',
+              'facets_1',
+              'convex_hull',
+              'bounding_box_oriented',
+              'identifier']
+
+# separates the key, kind and index in the names of packed arrays
+_SEPARATOR = '|'
+
+class DiskCache(object):
+    '''
+    Store packed cached values in a directory, one file per
+    cached property per md5.
+    '''
+    def __init__(self, path, max_bytes=None, keys=None, mmap=False):
+        '''
+        Arguments
+        ----------
+        path:      str, directory to store files in, created if missing
+        max_bytes: int, if the files exceed this the least recently
+                   used are deleted, None for no limit
+        keys:      sequence of str, cached properties to persist,
+                   if None a default set of expensive ones
+        mmap:      bool, if True single arrays are loaded as copy-on-write
+                   memory maps rather than read into memory
+        '''
+        self.path      = os.path.abspath(os.path.expanduser(path))
+        self.max_bytes = max_bytes
+        self.mmap      = bool(mmap)
+        if keys is None:
+            keys = _DISK_KEYS
+        self.keys = set(keys)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        # estimate of bytes held, recounted when over max_bytes
+        self._held = None
+
+    def _file_name(self, identifier, name, extension):
+        # hash the identifier so any id function gives a short, safe name
+        hashed = util.md5_object(str(identifier).encode('utf-8'))
+        return os.path.join(self.path,
+                            hashed[:2],
+                            hashed,
+                            name + extension)
+
+    def load(self, identifier, name):
+        '''
+        Load values stored for a cached property.
+
+        Arguments
+        ----------
+        identifier: str, md5 of the data the values were computed from
+        name:       str, name of cached property, including namespace
+
+        Returns
+        ----------
+        values: dict, {cache key : value}, or None if not stored
+        '''
+        single = self._file_name(identifier, name, '.npy')
+        multi  = self._file_name(identifier, name, '.npz')
+        try:
+            if os.path.isfile(single):
+                mmap_mode = None
+                if self.mmap:
+                    mmap_mode = 'c'
+                values = {name.split('.')[-1] : np.load(single,
+                                                        mmap_mode    = mmap_mode,
+                                                        allow_pickle = False)}
+                _touch(single)
+            elif os.path.isfile(multi):
+                with np.load(multi, allow_pickle=False) as archive:
+                    values = unpack(dict(archive))
+                _touch(multi)
+            else:
+                return None
+        except (IOError, OSError, ValueError, KeyError):
+            # removed by another process or not a file we wrote
+            log.debug('unable to load %s from disk cache', name, exc_info=True)
+            return None
+        return values
+
+    def save(self, identifier, name, values):
+        '''
+        Store the values of a cached property.
+
+        Arguments
+        ----------
+        identifier: str, md5 of the data the values were computed from
+        name:       str, name of cached property, including namespace
+        values:     dict, {cache key : value}
+
+        Returns
+        ----------
+        saved: bool, False if values couldn't be packed into arrays
+        '''
+        packed = pack(values)
+        if packed is None:
+            return False
+        key = name.split('.')[-1]
+        simple = (len(packed) == 1 and
+                  _SEPARATOR.join([key, 'array', '0']) in packed)
+        if simple:
+            file_name = self._file_name(identifier, name, '.npy')
+        else:
+            file_name = self._file_name(identifier, name, '.npz')
+
+        directory = os.path.dirname(file_name)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        except OSError:
+            # created by another process
+            if not os.path.isdir(directory):
+                raise
+
+        # write to a temporary file and rename into place atomically
+        handle, temp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file_obj:
+                if simple:
+                    np.save(file_obj, list(packed.values())[0])
+                else:
+                    np.savez(file_obj, **packed)
+            _replace(temp_name, file_name)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        if self._held is not None:
+            self._held += os.path.getsize(file_name)
+        self.evict()
+        return True
+
+    def files(self):
+        '''
+        Every stored file with its size and time of last use.
+
+        Returns
+        ----------
+        files: list of (str, int, float), file name, bytes and mtime
+        '''
+        files = []
+        for root, dirs, names in os.walk(self.path):
+            for file_name in names:
+                if not file_name.endswith(('.npy', '.npz')):
+                    continue
+                file_name = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(file_name)
+                except OSError:
+                    continue
+                files.append((file_name, stat.st_size, stat.st_mtime))
+        return files
+
+    @property
+    def nbytes(self):
+        '''
+        Bytes of every stored file.
+
+        Returns
+        ----------
+        nbytes: int
+        '''
+        self._held = sum(i[1] for i in self.files())
+        return self._held
+
+    def evict(self):
+        '''
+        Delete least recently used files until under max_bytes.
+        '''
+        if self.max_bytes is None:
+            return
+        if self._held is not None and self._held <= self.max_bytes:
+            return
+        files = self.files()
+        held  = sum(i[1] for i in files)
+        for file_name, size, used in sorted(files, key=lambda x: x[2]):
+            if held <= self.max_bytes:
+                break
+            try:
+                os.remove(file_name)
+            except OSError:
+                # removed by another process
+                pass
+            held -= size
+        self._held = held
+
+    def clear(self):
+        '''
+        Delete every stored file.
+        '''
+        for file_name, size, used in self.files():
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+        self._held = 0
+
+def set_disk_cache(disk):
+    '''
+    Set a disk cache used by every Cache which doesn't have its own.
+
+    Arguments
+    ----------
+    disk: DiskCache, str path to create one in, or None to disable
+    '''
+    if util.is_string(disk):
+        disk = DiskCache(disk)
+    util._cache_disk['disk'] = disk
+
+def pack(values):
+    '''
+    Pack cached values into a flat dict of arrays.
+
+    Arrays, scalars, dicts of arrays, sequences of any supported value,
+    and Trimesh and Box objects are supported.
+
+    Arguments
+    ----------
+    values: dict, {cache key : value}
+
+    Returns
+    ----------
+    packed: dict, {'key|kind|index' : np.ndarray}, or None if any
+            value isn't supported
+    '''
+    packed = {}
+    for key, value in values.items():
+        packer = _packer(value)
+        if packer is None:
+            return None
+        kind, arrays = packer
+        for index, array in enumerate(arrays):
+            packed[_SEPARATOR.join([key, kind, str(index)])] = array
+    return packed
+
+def unpack(packed):
+    '''
+    Unpack the result of pack.
+
+    Arguments
+    ----------
+    packed: dict, {'key|kind|index' : np.ndarray}
+
+    Returns
+    ----------
+    values: dict, {cache key : value}
+    '''
+    grouped = {}
+    for name, array in packed.items():
+        key, kind, index = name.split(_SEPARATOR)
+        if key not in grouped:
+            grouped[key] = (kind, {})
+        grouped[key][1][int(index)] = array
+
+    values = {}
+    for key, (kind, arrays) in grouped.items():
+        arrays = [arrays[i] for i in range(len(arrays))]
+        values[key] = _unpackers[kind](arrays)
+    return values
+
+def _packer(value):
+    '''
+    Find the kind of a value and the arrays which represent it.
+    '''
+    if isinstance(value, np.ndarray):
+        if value.dtype == np.object_:
+            return None
+        return 'array', [np.asarray(value)]
+    if isinstance(value, (bool, int, float, np.generic)):
+        return 'scalar', [np.asarray(value)]
+    if isinstance(value, dict):
+        names = list(value.keys())
+        if not all(util.is_string(i) for i in names):
+            return None
+        kinds = deque()
+        for name in names:
+            item = value[name]
+            if isinstance(item, list) and _is_array(np.asarray(item)):
+                kinds.append('list')
+            elif _is_array(item):
+                kinds.append('array')
+            else:
+                return None
+        return 'dict', ([np.array(names, dtype=np.str_),
+                         np.array(kinds, dtype=np.str_)] + 
+                        [np.asarray(value[i]) for i in names])
+    if isinstance(value, (list, tuple)):
+        if len(value) == 0:
+            return None
+        container = np.array(type(value).__name__, dtype=np.str_)
+        if not all(_is_array(i) for i in value):
+            # sequences of other values, eg: (facets, area), 
+            # store the kind and array count of every item
+            items = [_packer(i) for i in value]
+            if any(i is None for i in items):
+                return None
+            return 'sequence', ([container,
+                                 np.array([i[0] for i in items], dtype=np.str_),
+                                 np.array([len(i[1]) for i in items], dtype=np.int64)] + 
+                                [a for i in items for a in i[1]])
+        arrays = [np.asarray(i) for i in value]
+        if all(i.ndim == 1 and i.dtype == arrays[0].dtype for i in arrays):
+            # store ragged sequences of 1D arrays as one array and lengths
+            return 'ragged', [np.concatenate(arrays),
+                              np.array([len(i) for i in arrays], dtype=np.int64),
+                              container]
+        return type(value).__name__, arrays
+    name = type(value).__name__
+    if name == 'Trimesh':
+        return 'trimesh', [np.asarray(value.vertices),
+                           np.asarray(value.faces),
+                           np.asarray(value.face_normals)]
+    if name == 'Box':
+        return 'box', [np.asarray(value.box_transform),
+                       np.asarray(value.box_extents)]
+    return None
+
+def _is_array(value):
+    '''
+    Can a value be stored as a single numpy array.
+    '''
+    if isinstance(value, np.ndarray):
+        return value.dtype != np.object_
+    return isinstance(value, (bool, int, float, np.generic))
+
+def _unpack_dict(arrays):
+    names, kinds = arrays[:2]
+    values = {}
+    for name, kind, value in zip(names, kinds, arrays[2:]):
+        if kind == 'list':
+            value = value.tolist()
+        elif value.ndim == 0:
+            value = value[()]
+        values[str(name)] = value
+    return values
+
+def _unpack_trimesh(arrays):
+    from .base import Trimesh
+    return Trimesh(vertices     = arrays[0],
+                   faces        = arrays[1],
+                   face_normals = arrays[2],
+                   process      = False)
+
+def _unpack_box(arrays):
+    from .primitives import Box
+    return Box(box_transform = arrays[0],
+               box_extents   = arrays[1])
+
+def _unpack_ragged(arrays):
+    data, lengths = arrays[:2]
+    split = np.split(data, np.cumsum(lengths)[:-1])
+    # files saved before the container was stored are lists
+    if len(arrays) > 2:
+        return _containers[str(arrays[2])](split)
+    return split
+
+def _unpack_sequence(arrays):
+    container, kinds, counts = arrays[:3]
+    end   = np.cumsum(counts) + 3
+    items = [_unpackers[str(kind)](arrays[e - count:e]) 
+             for kind, count, e in zip(kinds, counts, end)]
+    return _containers[str(container)](items)
+
+_containers = {'list'  : list,
+               'tuple' : tuple}
+
+_unpackers = {'array'   : lambda x: x[0],
+              'scalar'  : lambda x: x[0][()],
+              'list'    : list,
+              'tuple'   : tuple,
+              'ragged'  : _unpack_ragged,
+              'sequence': _unpack_sequence,
+              'dict'    : _unpack_dict,
+              'trimesh' : _unpack_trimesh,
+              'box'     : _unpack_box}
+
+def _touch(file_name):
+    '''
+    Update the modification time of a file, for least recently used eviction.
+    '''
+    try:
+        os.utime(file_name, None)
+    except OSError:
+        pass
+
+def _replace(source, destination):
+    '''
+    Atomically move source to destination, replacing it if it exists.
+    '''
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+    else:
+        os.rename(source, destination)
@@ -131,6 +131,31 @@ def triangulate_quads(quads):
     faces = np.vstack((quads[:,[0,1,2]],
                        quads[:,[2,3,0]]))
     return faces
+
+def triangulate_fans(counts):
+    '''
+    Fan triangulate polygons stored as a flat sequence of corners.
+
+    Arguments
+    ----------
+    counts: (n,) int, number of corners of each polygon, where the corners
+            of polygon i start at sum(counts[:i])
+
+    Returns
+    ----------
+    triangles: (m,3) int, index of corners for each triangle
+    owner:     (m,) int, index of polygon for each triangle
+    '''
+    counts    = np.asanyarray(counts, dtype=np.int64)
+    fan_count = np.maximum(counts - 2, 0)
+    first = np.cumsum(counts) - counts
+    owner = np.repeat(np.arange(len(counts)), fan_count)
+    fan   = np.arange(len(owner)) - np.repeat(np.cumsum(fan_count) - fan_count, 
+                                              fan_count)
+    triangles = first[owner].reshape((-1,1)) + np.column_stack((np.zeros(len(fan), dtype=np.int64),
+                                                                fan + 1,
+                                                                fan + 2))
+    return triangles, owner
     
 def mean_vertex_normals(vertex_count, faces, face_normals, **kwargs):
     '''
@@ -4,16 +4,24 @@ import networkx as nx
 from collections import deque
 
 from .constants import log, tol
-from .grouping  import group, group_rows, boolean_rows
+from .grouping  import group_rows, boolean_rows
 from .geometry  import faces_to_edges
 
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+    _has_scipy = True
+except ImportError:
+    _has_scipy = False
+
 try: 
     from graph_tool import Graph as GTGraph
     from graph_tool.topology import label_components
     _has_gt = True
 except: 
     _has_gt = False
-    log.warning('graph-tool unavailable, some operations will be much slower')
+    if not _has_scipy:
+        log.warning('graph-tool and scipy unavailable, some operations will be much slower')
 
 def face_adjacency(faces, return_edges=False):
     '''
@@ -95,6 +103,98 @@ def connected_edges(G, nodes):
     edges = G.subgraph(nodes_in_G).edges()
     return edges
  
+def connected_component_labels(edges, node_count=None, engine=None):
+    '''
+    Label every node with the index of the connected component it is in.
+
+    Arguments
+    ---------
+    edges:      (n,2) int, pairs of connected node indices
+    node_count: int, number of nodes, if None the largest node in edges
+    engine:     str, which library to label components with:
+                'scipy' uses scipy.sparse.csgraph
+                'graphtool' uses graph-tool
+                'networkx' uses networkx
+                if None the first available of those is used
+
+    Returns
+    ---------
+    labels: (node_count,) int, component index of each node
+    '''
+    edges = np.asanyarray(edges, dtype=np.int64).reshape((-1,2))
+    if node_count is None:
+        node_count = int(edges.max()) + 1 if len(edges) > 0 else 0
+    if engine is None:
+        if _has_scipy:
+            engine = 'scipy'
+        elif _has_gt:
+            engine = 'graphtool'
+        else:
+            engine = 'networkx'
+
+    if engine == 'scipy':
+        matrix = sparse.csr_matrix((np.ones(len(edges), dtype=bool),
+                                    (edges[:,0], edges[:,1])),
+                                   shape = (node_count, node_count))
+        # weakly connected components of a directed graph are the
+        # components of the undirected one, without symmetrizing it
+        labels = csgraph.connected_components(matrix, 
+                                              directed   = True, 
+                                              connection = 'weak')[1]
+    elif engine == 'graphtool':
+        graph = GTGraph()
+        graph.add_vertex(node_count)
+        graph.add_edge_list(edges)
+        labels = label_components(graph, directed=False)[0].a
+    elif engine == 'networkx':
+        graph = nx.from_edgelist(edges)
+        graph.add_nodes_from(np.arange(node_count))
+        labels = np.zeros(node_count, dtype=np.int64)
+        for index, component in enumerate(nx.connected_components(graph)):
+            labels[list(component)] = index
+    else:
+        raise ValueError('graph engine {} is not available!'.format(engine))
+    return np.asanyarray(labels, dtype=np.int64)
+
+def connected_components(edges, nodes=None, min_len=1, engine=None):
+    '''
+    Find groups of nodes connected by edges.
+
+    Arguments
+    ---------
+    edges:   (n,2) int, pairs of connected node indices
+    nodes:   int, number of nodes, so nodes without edges are returned 
+             as their own component. If None only nodes in edges are.
+    min_len: int, the smallest component returned
+    engine:  str, which library to label components with, 
+             see connected_component_labels
+
+    Returns
+    ---------
+    components: list of (m,) int, node indices of each component
+    '''
+    edges  = np.asanyarray(edges, dtype=np.int64).reshape((-1,2))
+    labels = connected_component_labels(edges, 
+                                        node_count = nodes, 
+                                        engine     = engine)
+    index  = np.arange(len(labels))
+    if nodes is None:
+        # only return nodes which are included in an edge
+        included = np.zeros(len(labels), dtype=bool)
+        included[edges.ravel()] = True
+        index  = index[included]
+        labels = labels[included]
+    if len(labels) == 0:
+        return []
+
+    # group node indices by label without a per- node loop
+    order  = np.argsort(labels, kind='mergesort')
+    start  = np.nonzero(np.diff(labels[order]))[0] + 1
+    groups = np.split(index[order], start)
+    if min_len > 1:
+        groups = [i for i in groups if len(i) >= min_len]
+    return groups
+
 def facets(mesh):
     '''
     Find the list of parallel adjacent faces.
@@ -108,23 +208,11 @@ def facets(mesh):
     facets: list of groups of face indexes (in mesh.faces) of parallel 
             adjacent faces. 
     '''
-    def facets_nx():
-        graph_parallel = nx.from_edgelist(face_idx[parallel])
-        facets_idx = np.array([list(i) for i in nx.connected_components(graph_parallel)])
-        return facets_idx
-        
-    def facets_gt():
-        graph_parallel = GTGraph()
-        graph_parallel.add_edge_list(face_idx[parallel])
-        connected  = label_components(graph_parallel, directed=False)[0].a
-        facets_idx = group(connected, min_len=2)
-        return facets_idx
-
     # (n,2) list of adjacent face indices
     face_idx    = mesh.face_adjacency
 
     # test adjacent faces for angle
-    normal_pairs = mesh.face_normals[[face_idx]]
+    normal_pairs = mesh.face_normals[face_idx]
     normal_dot   = (np.sum(normal_pairs[:,0,:] * normal_pairs[:,1,:], axis=1) - 1)**2
 
     # if normals are actually equal, they are parallel with a high degree of confidence
@@ -145,11 +233,10 @@ def facets(mesh):
     radius_sq = center_sq[non_parallel] / normal_dot[non_parallel]
     parallel[non_parallel] = radius_sq > tol.facet_rsq
 
-    # graph-tool is ~6x faster than networkx but is more difficult to install
-    if _has_gt: return facets_gt()
-    else:       return facets_nx()
+    facets_idx = connected_components(face_idx[parallel], min_len=2)
+    return facets_idx
 
-def split(mesh, only_watertight=True, adjacency=None):
+def split(mesh, only_watertight=True, adjacency=None, packed=False):
     '''
     Given a mesh, will split it up into a list of meshes based on face connectivity
     If only_watertight is true, it will only return meshes where each face has
@@ -161,33 +248,21 @@ def split(mesh, only_watertight=True, adjacency=None):
     only_watertight: if True, only return watertight components
     adjacency: (n,2) list of face adjacency to override using the plain
                adjacency calculated automatically. 
+    packed: if True return a util.PackedMeshes object rather than a list
 
     Returns
     ----------
-    meshes: list of Trimesh objects
+    meshes: list of Trimesh objects, or util.PackedMeshes
     '''
 
-    def split_nx():
-        adjacency_graph = nx.from_edgelist(adjacency)
-        components = nx.connected_components(adjacency_graph)
-        result = mesh.submesh(components, only_watertight=only_watertight)
-        return result
-
-    def split_gt():
-        g = GTGraph()
-        g.add_edge_list(adjacency)
-        component_labels = label_components(g, directed=False)[0].a
-        components = group(component_labels)
-        result = mesh.submesh(components, only_watertight=only_watertight)
-        return result
-
     if adjacency is None:
         adjacency = mesh.face_adjacency
-    
-    if _has_gt: 
-        return split_gt()
-    else:       
-        return split_nx()
+
+    components = connected_components(adjacency)
+    result = mesh.submesh(components, 
+                          only_watertight = only_watertight,
+                          packed          = packed)
+    return result
 
 def smoothed(mesh, angle):
     '''
@@ -206,9 +281,8 @@ def smoothed(mesh, angle):
     '''
     angle_ok  = mesh.face_adjacency_angles <= angle
     adjacency = mesh.face_adjacency[angle_ok]
-    graph = nx.from_edgelist(adjacency)
-    graph.add_nodes_from(np.arange(len(mesh.faces)))
-    smooth = mesh.submesh(nx.connected_components(graph),
+    components = connected_components(adjacency, nodes=len(mesh.faces))
+    smooth = mesh.submesh(components,
                           only_watertight = False,
                           append = True)
     return smooth
@@ -4,19 +4,231 @@ from collections import deque
 from networkx      import from_edgelist, connected_components
 
 from .util      import decimal_to_digits, vector_to_spherical, spherical_to_vector, unitize
-from .constants import log, tol
+from .constants import log, tol, _log_time
 
 try: from scipy.spatial import cKDTree as KDTree
 except ImportError: log.warning('Scipy unavailable')
     
+@_log_time
 def merge_vertices_hash(mesh):
     '''
     Removes duplicate vertices, based on integer hashes.
     This is roughly 20x faster than querying a KD tree in a loop
     '''
-    unique, inverse = unique_rows(mesh.vertices)
+    unique, inverse = weld_vertices(mesh.vertices)
+    log.debug('merged %d vertices into %d', 
+              len(mesh.vertices), 
+              len(unique))
     mesh.update_vertices(unique, inverse)
-   
+
+def weld_vertices(vertices, digits=None):
+    '''
+    Find unique vertices of a triangle soup.
+
+    Vertices are quantized to integers and each row is hashed into a 
+    single 64 bit key, which is much faster to sort than rows. Hash
+    collisions are detected by comparing rows, and resolved by hashing
+    again with a different seed, so the result is exact.
+
+    Arguments
+    ---------
+    vertices: (n,3) float, vertex positions
+    digits:   int, number of digits to consider for the purposes of 
+              uniqueness, if None derived from tol.merge
+
+    Returns
+    --------
+    unique:  (j) int, index of the first occurrence of each unique vertex, 
+             in the order they first appear
+    inverse: (n) int, index of unique for every vertex
+             example: vertices[unique][inverse] == vertices
+    '''
+    as_int = _quantize_rows(vertices, digits)
+    if len(as_int) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty
+
+    for seed in range(_hash_attempts):
+        first, inverse = _unique_keys(_hash_rows(as_int, seed))
+        if (as_int[first][inverse] == as_int).all():
+            break
+    else:
+        log.warning('vertex hashes collided, falling back to row sort')
+        first, inverse = unique_rows(as_int)
+
+    # order unique vertices by their first appearance
+    order = np.argsort(first)
+    rank  = np.empty(len(first), dtype=np.int64)
+    rank[order] = np.arange(len(first))
+    return first[order], rank[inverse]
+
+class VertexWelder(object):
+    '''
+    Weld vertices incrementally, so a triangle soup can be merged
+    while streaming it chunk by chunk.
+    '''
+    def __init__(self, digits=None):
+        '''
+        Arguments
+        ---------
+        digits: int, number of digits to consider for the purposes of 
+                uniqueness, if None derived from tol.merge
+        '''
+        self.digits = digits
+        # how many vertices have been added in total
+        self.count  = 0
+
+        self._seed = 0
+        # sorted hash keys of unique vertices, and the index of each
+        self._keys = np.array([], dtype=np.uint64)
+        self._ids  = np.array([], dtype=np.int64)
+        # quantized and original unique vertices, in order of appearance
+        self._rows     = np.zeros((0,3), dtype=np.int64)
+        self._vertices = deque()
+
+    @property
+    def vertices(self):
+        '''
+        The unique vertices added so far, in order of first appearance.
+
+        Returns
+        ---------
+        vertices: (j,3) float
+        '''
+        if len(self._vertices) > 1:
+            self._vertices = deque([np.vstack(self._vertices)])
+        if len(self._vertices) == 0:
+            return np.zeros((0,3))
+        return self._vertices[0]
+
+    @property
+    def merged(self):
+        '''
+        The number of vertices which were merged into an existing vertex.
+        '''
+        return self.count - len(self._rows)
+
+    @_log_time
+    def add(self, vertices):
+        '''
+        Add a chunk of vertices.
+
+        Arguments
+        ---------
+        vertices: (n,3) float, vertex positions
+
+        Returns
+        ---------
+        index: (n) int, index of self.vertices for each vertex
+        '''
+        vertices = np.asanyarray(vertices, dtype=np.float64).reshape((-1,3))
+        as_int   = _quantize_rows(vertices, self.digits)
+        if len(as_int) == 0:
+            return np.array([], dtype=np.int64)
+
+        for attempt in range(_hash_attempts):
+            result = self._match(as_int)
+            if result is not None:
+                break
+            # a hash collision happened, so rehash everything with a new seed
+            self._seed += 1
+            keys       = _hash_rows(self._rows, self._seed)
+            self._ids  = np.argsort(keys)
+            self._keys = keys[self._ids]
+        else:
+            raise ValueError('vertex hashes collided repeatedly!')
+
+        first, inverse, index, ids, new = result
+        # unique vertices in this chunk which haven't been seen before
+        # get the next indices, in order of appearance
+        order   = np.argsort(first[new])
+        created = np.empty(len(order), dtype=np.int64)
+        created[order] = np.arange(len(self._rows), len(self._rows) + len(order))
+        ids[new] = created
+
+        keys = _hash_rows(as_int[first[new]], self._seed)
+        self._keys = np.insert(self._keys, index[new], keys)
+        self._ids  = np.insert(self._ids,  index[new], created)
+        self._rows = np.vstack((self._rows, as_int[first[new]][order]))
+        self._vertices.append(vertices[first[new]][order])
+
+        self.count += len(vertices)
+        log.debug('welded %d vertices, %d merged so far', 
+                  len(vertices), 
+                  self.merged)
+        return ids[inverse]
+
+    def _match(self, as_int):
+        '''
+        Match quantized rows against existing unique vertices.
+
+        Returns None if a hash collision is detected.
+        '''
+        keys = _hash_rows(as_int, self._seed)
+        first, inverse = _unique_keys(keys)
+        if not (as_int[first][inverse] == as_int).all():
+            return None
+
+        keys  = keys[first]
+        index = np.searchsorted(self._keys, keys)
+        found = np.zeros(len(keys), dtype=bool)
+        if len(self._keys) > 0:
+            clipped = np.minimum(index, len(self._keys) - 1)
+            found = self._keys[clipped] == keys
+        ids = np.zeros(len(keys), dtype=np.int64)
+        ids[found] = self._ids[index[found]]
+        if not (self._rows[ids[found]] == as_int[first[found]]).all():
+            return None
+        return first, inverse, index, ids, np.logical_not(found)
+
+# how many seeds to try before giving up on hashing
+_hash_attempts = 4
+
+def _quantize_rows(data, digits=None):
+    '''
+    Quantize (n,3) float data into int64 rows.
+    '''
+    if digits is None:
+        digits = decimal_to_digits(tol.merge)
+    elif isinstance(digits, float):
+        digits = decimal_to_digits(digits)
+    data = np.asanyarray(data, dtype=np.float64).reshape((-1,3))
+    as_int = np.multiply(data, 10**digits)
+    np.rint(as_int, out=as_int)
+    return as_int.astype(np.int64)
+
+def _hash_rows(as_int, seed=0):
+    '''
+    Hash (n,3) int64 rows into (n) uint64 keys.
+    '''
+    as_int = np.ascontiguousarray(as_int, dtype=np.int64).view(np.uint64)
+    # multipliers are large odd constants, overflow wraps
+    primes = np.array([0x9E3779B97F4A7C15,
+                       0xC2B2AE3D27D4EB4F,
+                       0x165667B19E3779F9], dtype=np.uint64)
+    key = np.uint64(seed) * np.uint64(0xD6E8FEB86659FD93)
+    for i in range(3):
+        key = (key ^ as_int[:,i]) * primes[i]
+        key ^= key >> np.uint64(29)
+    return key
+
+def _unique_keys(keys):
+    '''
+    Find the first occurrence of each unique key.
+
+    Returns
+    --------
+    first:   (j) int, index of the first occurrence of each key, sorted by key
+    inverse: (n) int, index of first for every key
+    '''
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    start = np.append(True, ordered[1:] != ordered[:-1])
+    first = order[start]
+    inverse = np.empty(len(keys), dtype=np.int64)
+    inverse[order] = np.cumsum(start) - 1
+    return first, inverse
+
 def replace_references(data, reference_dict):
     '''
     Replace elements in an array as per a dictionary of replacement values. 
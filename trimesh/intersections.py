@@ -1,5 +1,7 @@
 import numpy as np
 
+from collections import deque
+
 from .constants import log, tol
 from .grouping  import unique_value_in_row
 from .util      import unitize
@@ -22,130 +24,208 @@ def mesh_plane(mesh,
     (m, 2, 3) float, list of 3D line segments
     '''
 
-    def triangle_cases(signs):
-        '''
-        Figure out which faces correspond to which intersection case from 
-        the signs of the dot product of each vertex.
-        Does this by bitbang each row of signs into an 8 bit integer.
-
-        code : signs      : intersects
-        0    : [-1 -1 -1] : No
-        2    : [-1 -1  0] : No
-        4    : [-1 -1  1] : Yes; 2 on one side, 1 on the other
-        6    : [-1  0  0] : Yes; one edge fully on plane
-        8    : [-1  0  1] : Yes; one vertex on plane, 2 on different sides
-        12   : [-1  1  1] : Yes; 2 on one side, 1 on the other
-        14   : [0 0 0]    : No (on plane fully)
-        16   : [0 0 1]    : Yes; one edge fully on plane
-        20   : [0 1 1]    : No
-        28   : [1 1 1]    : No
-
-        Arguments
-        ----------
-        signs: (n,3) int, all values are -1,0, or 1
-               Each row contains the dot product of all three vertices
-               in a face with respect to the plane
-        
-        Returns
-        ---------
-        basic:      (n,) bool, which faces are in the basic intersection case
-        one_vertex: (n,) bool, which faces are in the one vertex case
-        one_edge:   (n,) bool, which faces are in the one edge case
-        '''
-
-        signs_sorted = np.sort(signs, axis=1)
-        coded = np.zeros(len(signs_sorted), dtype=np.int8) + 14
-        for i in range(3):
-            coded += signs_sorted[:,i] << 3-i
-
-        # one edge fully on the plane
-        # note that we are only accepting *one* of the on- edge cases,
-        # where the other vertex has a positive dot product (16) instead
-        # of both on- edge cases ([6,16])
-        # this is so that for regions that are co-planar with the the section plane
-        # we don't end up with an invalid boundary
-        key = np.zeros(29, dtype=np.bool)
-        key[16] = True
-        one_edge = key[coded]
-
-        # one vertex on plane, other two on different sides
-        key[:] = False
-        key[8] = True
-        one_vertex = key[coded]
-
-        # one vertex on one side of the plane, two on the other
-        key[:]      = False
-        key[[4,12]] = True
-        basic = key[coded]
-
-        return basic, one_vertex, one_edge
-
-    def handle_on_vertex(signs, faces, vertices):
-        # case where one vertex is on plane, two are on different sides
-        vertex_plane = faces[signs == 0]
-        edge_thru    = faces[signs != 0].reshape((-1,2))
-        point_intersect, valid  = plane_lines(plane_origin, 
-                                              plane_normal, 
-                                              vertices[edge_thru.T],
-                                              line_segments = False)
-        lines = np.column_stack((vertices[vertex_plane[valid]],
-                                 point_intersect)).reshape((-1,2,3))
-        return lines
-
-    def handle_on_edge(signs, faces, vertices):
-        # case where two vertices are on the plane and one is off
-        edges  = faces[signs == 0].reshape((-1,2))
-        points = vertices[edges]
-        return points
-
-    def handle_basic(signs, faces, vertices):
-        #case where one vertex is on one side and two are on the other
-        unique_element = unique_value_in_row(signs, unique = [-1,1])
-        edges = np.column_stack((faces[unique_element],
-                                 faces[np.roll(unique_element, 1, axis=1)],
-                                 faces[unique_element],
-                                 faces[np.roll(unique_element, 2, axis=1)])).reshape((-1,2))
-        intersections, valid  = plane_lines(plane_origin, 
-                                            plane_normal, 
-                                            vertices[edges.T],
-                                            line_segments = False)
-        # since the data has been pre- culled, any invalid intersections at all
-        # means the culling was done incorrectly and thus things are mega-fucked
-        assert valid.all()
-        return intersections.reshape((-1,2,3))
-
-    plane_normal = np.asanyarray(plane_normal)
-    plane_origin = np.asanyarray(plane_origin)
+    plane_normal = np.asanyarray(plane_normal, dtype=np.float64)
+    plane_origin = np.asanyarray(plane_origin, dtype=np.float64)
     if plane_origin.shape != (3,) or plane_normal.shape != (3,):
         raise ValueError('Plane origin and normal must be (3,)!')
-        
-    # dot product of each vertex with the plane normal, indexed by face
-    # so for each face the dot product of each vertex is a row
-    # shape is the same as mesh.faces (n,3)
-    dots = np.dot(plane_normal, (mesh.vertices-plane_origin).T)[mesh.faces]
-
-    # sign of the dot product is -1, 0, or 1
-    # shape is the same as mesh.faces (n,3)
-    signs = np.zeros(mesh.faces.shape, dtype=np.int8)
-    signs[dots < -tol.merge] = -1
-    signs[dots >  tol.merge] =  1
-
-    # figure out which triangles are in the cross section,
-    # and which of the three intersection cases they are in
-    cases = triangle_cases(signs)
-    # handlers for each case
-    handlers = (handle_basic, 
-                handle_on_vertex, 
-                handle_on_edge)    
-
-    lines = np.vstack([h(signs[c],
-                         mesh.faces[c],
-                         mesh.vertices) for c, h in zip(cases, handlers)])
+
+    # a single plane is the multiplane case with one height, 
+    # so both use the same intersection case code
+    lines = mesh_multiplane(mesh, 
+                            plane_normal = plane_normal,
+                            plane_origin = plane_origin,
+                            heights      = [0.0])[0]
 
     log.debug('mesh_cross_section found %i intersections', len(lines))
 
     return lines
 
+def triangle_cases(signs):
+    '''
+    Figure out which faces correspond to which intersection case from 
+    the signs of the dot product of each vertex.
+    Does this by bitbang each row of signs into an 8 bit integer.
+
+    code : signs      : intersects
+    0    : [-1 -1 -1] : No
+    2    : [-1 -1  0] : No
+    4    : [-1 -1  1] : Yes; 2 on one side, 1 on the other
+    6    : [-1  0  0] : Yes; one edge fully on plane
+    8    : [-1  0  1] : Yes; one vertex on plane, 2 on different sides
+    12   : [-1  1  1] : Yes; 2 on one side, 1 on the other
+    14   : [0 0 0]    : No (on plane fully)
+    16   : [0 0 1]    : Yes; one edge fully on plane
+    20   : [0 1 1]    : No
+    28   : [1 1 1]    : No
+
+    Arguments
+    ----------
+    signs: (n,3) int, all values are -1,0, or 1
+           Each row contains the dot product of all three vertices
+           in a face with respect to the plane
+
+    Returns
+    ---------
+    basic:      (n,) bool, which faces are in the basic intersection case
+    one_vertex: (n,) bool, which faces are in the one vertex case
+    one_edge:   (n,) bool, which faces are in the one edge case
+    '''
+
+    signs_sorted = np.sort(signs, axis=1)
+    coded = np.zeros(len(signs_sorted), dtype=np.int8) + 14
+    for i in range(3):
+        coded += signs_sorted[:,i] << 3-i
+
+    # one edge fully on the plane
+    # note that we are only accepting *one* of the on- edge cases,
+    # where the other vertex has a positive dot product (16) instead
+    # of both on- edge cases ([6,16])
+    # this is so that for regions that are co-planar with the the section plane
+    # we don't end up with an invalid boundary
+    key = np.zeros(29, dtype=np.bool)
+    key[16] = True
+    one_edge = key[coded]
+
+    # one vertex on plane, other two on different sides
+    key[:] = False
+    key[8] = True
+    one_vertex = key[coded]
+
+    # one vertex on one side of the plane, two on the other
+    key[:]      = False
+    key[[4,12]] = True
+    basic = key[coded]
+
+    return basic, one_vertex, one_edge
+
+def mesh_multiplane(mesh,
+                    plane_normal,
+                    plane_origin,
+                    heights,
+                    chunk_size = 2**20):
+    '''
+    Find the intersections between a mesh and many parallel planes.
+
+    The distance of every vertex from the plane is computed once, and 
+    each face is only tested against the planes which fall inside 
+    the range of distances of its vertices, so the cost scales with
+    the number of segments produced rather than faces times planes.
+
+    Arguments
+    ---------
+    mesh:          Trimesh object
+    plane_normal:  (3,) float, normal of the planes
+    plane_origin:  (3,) float, point on the plane at height 0.0
+    heights:       (p,) float, distance of each plane from plane_origin
+                   along plane_normal
+    chunk_size:    int, maximum number of (face, plane) pairs 
+                   evaluated at once
+
+    Returns
+    ----------
+    lines: (p,) list of (m, 2, 3) float, 3D line segments for each height
+    '''
+    plane_normal = unitize(np.asanyarray(plane_normal, dtype=np.float64))
+    plane_origin = np.asanyarray(plane_origin, dtype=np.float64)
+    heights      = np.asanyarray(heights, dtype=np.float64).reshape(-1)
+    if plane_origin.shape != (3,) or plane_normal.shape != (3,):
+        raise ValueError('Plane origin and normal must be (3,)!')
+
+    # distance of each vertex from the plane at height zero,
+    # indexed by face so the shape is the same as mesh.faces
+    dots = np.dot(mesh.vertices - plane_origin, plane_normal)[mesh.faces]
+    triangles = mesh.triangles
+
+    # the range of sorted planes each face could intersect
+    order  = np.argsort(heights)
+    levels = heights[order]
+    low    = np.searchsorted(levels, dots.min(axis=1) - tol.merge, side='left')
+    high   = np.searchsorted(levels, dots.max(axis=1) + tol.merge, side='right')
+    count  = high - low
+
+    plane_id = deque()
+    segments = deque()
+    handlers = (_multiplane_basic,
+                _multiplane_on_vertex,
+                _multiplane_on_edge)
+    # split faces into groups with roughly chunk_size pairs each
+    cumulative = np.cumsum(count)
+    total      = cumulative[-1] if len(cumulative) > 0 else 0
+    bounds     = np.searchsorted(cumulative,
+                                 np.arange(max(int(chunk_size), 1), 
+                                           total, 
+                                           max(int(chunk_size), 1)),
+                                 side='right')
+    for face_chunk in np.split(np.arange(len(count)), bounds):
+        chunk_count = count[face_chunk]
+        if chunk_count.sum() == 0:
+            continue
+        # expand into every (face, plane) pair of the chunk
+        face   = np.repeat(face_chunk, chunk_count)
+        offset = np.cumsum(chunk_count) - chunk_count
+        plane  = (np.repeat(low[face_chunk] - offset, chunk_count) + 
+                  np.arange(len(face)))
+
+        distance = dots[face] - levels[plane].reshape((-1,1))
+        signs = np.zeros(distance.shape, dtype=np.int8)
+        signs[distance < -tol.merge] = -1
+        signs[distance >  tol.merge] =  1
+
+        cases = triangle_cases(signs)
+        for case, handler in zip(cases, handlers):
+            if not case.any():
+                continue
+            segments.append(handler(signs[case], 
+                                    distance[case], 
+                                    triangles[face[case]]))
+            plane_id.append(plane[case])
+
+    if len(segments) == 0:
+        return [np.zeros((0,2,3)) for i in heights]
+    plane_id = np.hstack(plane_id)
+    segments = np.vstack(segments)
+
+    # group segments by plane, returned in the order heights were passed
+    grouped = np.argsort(plane_id, kind='stable')
+    split   = np.searchsorted(plane_id[grouped], np.arange(1, len(levels)))
+    lines   = [None] * len(heights)
+    for index, group in zip(order, np.split(grouped, split)):
+        lines[index] = segments[group]
+    log.debug('mesh_multiplane found %i intersections on %i planes', 
+              len(segments),
+              len(heights))
+    return lines
+
+def _interpolate(triangles, distance, a, b):
+    '''
+    Find the point on edge (a,b) of each triangle with zero distance.
+    '''
+    row = np.arange(len(triangles))
+    da  = distance[row, a].reshape((-1,1))
+    db  = distance[row, b].reshape((-1,1))
+    return triangles[row, a] + ((triangles[row, b] - triangles[row, a]) * 
+                                (da / (da - db)))
+
+def _multiplane_basic(signs, distance, triangles):
+    # case where one vertex is on one side and two are on the other
+    unique = unique_value_in_row(signs, unique = [-1,1]).argmax(axis=1)
+    return np.column_stack((_interpolate(triangles, distance, unique, (unique + 1) % 3),
+                            _interpolate(triangles, distance, unique, (unique + 2) % 3))).reshape((-1,2,3))
+
+def _multiplane_on_vertex(signs, distance, triangles):
+    # case where one vertex is on plane, two are on different sides
+    on_plane = (signs == 0).argmax(axis=1)
+    row = np.arange(len(triangles))
+    return np.column_stack((triangles[row, on_plane],
+                            _interpolate(triangles, 
+                                         distance, 
+                                         (on_plane + 1) % 3, 
+                                         (on_plane + 2) % 3))).reshape((-1,2,3))
+
+def _multiplane_on_edge(signs, distance, triangles):
+    # case where two vertices are on the plane and one is off
+    return triangles[signs == 0].reshape((-1,2,3))
+
 def plane_lines(plane_origin, 
                 plane_normal, 
                 endpoints,                            
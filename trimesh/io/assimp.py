@@ -2,7 +2,7 @@ import numpy as np
 
 from ..constants import log
 
-def load_assimp(file_obj, file_type=None):
+def load_assimp(file_obj, file_type=None, **kwargs):
     '''
     Use the assimp library to load a mesh, from a file object and type,
     or filename (if file_obj is a string)
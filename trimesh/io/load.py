@@ -12,6 +12,7 @@ from .stl    import _stl_loaders
 from .misc   import _misc_loaders
 from .step   import _step_loaders
 from .ply    import _ply_loaders
+from .wavefront import _wavefront_loaders
 
 try:
     from ..path.io.load import load_path, path_formats
@@ -63,7 +64,7 @@ def load(file_obj, file_type=None, **kwargs):
     return loaded
 
 @_log_time
-def load_mesh(file_obj, file_type=None):
+def load_mesh(file_obj, file_type=None, **kwargs):
     '''
     Load a mesh file into a Trimesh object
 
@@ -71,6 +72,8 @@ def load_mesh(file_obj, file_type=None):
     ---------
     file_obj: a filename string or a file-like object
     file_type: str representing file type (eg: 'stl')
+    kwargs:    passed to the loader for the file type (eg: mmap=True for 'stl'),
+               which ignores any it doesn't use
  
     Returns:
     ----------
@@ -80,7 +83,8 @@ def load_mesh(file_obj, file_type=None):
     '''
     file_obj, file_type = _parse_file_args(file_obj, file_type)
     loaded = _mesh_loaders[file_type](file_obj, 
-                                      file_type)
+                                      file_type,
+                                      **kwargs)
     if is_file(file_obj): 
         file_obj.close()
     
@@ -169,3 +173,4 @@ _mesh_loaders.update(_stl_loaders)
 _mesh_loaders.update(_misc_loaders)
 _mesh_loaders.update(_step_loaders)
 _mesh_loaders.update(_ply_loaders)
+_mesh_loaders.update(_wavefront_loaders)
@@ -3,7 +3,7 @@ import json
 
 from .. import util
 
-def load_off(file_obj, file_type=None):
+def load_off(file_obj, file_type=None, **kwargs):
     '''
     Load an OFF file into the kwargs for a Trimesh constructor
 
@@ -37,40 +37,7 @@ def load_off(file_obj, file_type=None):
     return {'vertices' : vertices,
             'faces'    : faces}
 
-def load_wavefront(file_obj, file_type=None):
-    '''
-    Loads an ascii Wavefront OBJ file_obj into kwargs for the Trimesh constructor.
-
-    Discards texture normals and vertex color information.
-
-
-    Arguments
-    ----------
-    file_obj: file object containing a wavefront file
-    file_type: not used
-    
-    Returns
-    ----------
-    loaded: dict with kwargs for Trimesh constructor (vertices, faces)
-    '''
-    data     = np.array(file_obj.read().split())
-    data_str = data.astype(str)
-    
-    # find the locations of keys, then find the proceeding values
-    vid = np.nonzero(data_str == 'v')[0].reshape((-1,1))  + np.arange(3) + 1
-    nid = np.nonzero(data_str == 'vn')[0].reshape((-1,1)) + np.arange(3) + 1
-    fid = np.nonzero(data_str == 'f')[0].reshape((-1,1))  + np.arange(3) + 1
-    
-    # if we wanted to use the texture/vertex normals, we could slice this differently.
-    faces = np.array([i.split(b'/') for i in data[fid].reshape(-1)])[:,0].reshape((-1,3))
-    # wavefront has 1- indexed faces, as opposed to 0- indexed
-    faces = faces.astype(int) - 1
-    loaded = {'vertices'       : data[vid].astype(float),
-              'vertex_normals' : data[nid].astype(float),
-              'faces'          : faces}
-    return loaded
-
-def load_msgpack(blob, file_type=None):
+def load_msgpack(blob, file_type=None, **kwargs):
     '''
     Load a dict packed with msgpack into kwargs for Trimesh constructor
 
@@ -92,7 +59,7 @@ def load_msgpack(blob, file_type=None):
     loaded = load_dict(data)
     return loaded
 
-def load_dict(data, file_type=None):
+def load_dict(data, file_type=None, **kwargs):
     '''
     Load multiple input types into kwargs for a Trimesh constructor.
     Tries to extract keys ['faces', 'vertices', 'face_normals', 'vertex_normals'].
@@ -148,8 +115,7 @@ def load_dict(data, file_type=None):
         raise ValueError('%s object passed to dict loader!',
                          data.__class__.__name__)
 
-_misc_loaders = {'obj'     : load_wavefront,
-                 'off'     : load_off,
+_misc_loaders = {'off'     : load_off,
                  'dict'    : load_dict,
                  'dict64'  : load_dict,
                  'json'    : load_dict,
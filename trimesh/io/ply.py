@@ -1,182 +1,383 @@
 import numpy as np
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from string import Template
 
 from ..resources import get_resource
+from ..geometry  import triangulate_fans
 
-def load_ply(file_obj, *args, **kwargs):
+# from ply specification
+_dtypes = {'char'   : 'i1',
+           'uchar'  : 'u1',
+           'short'  : 'i2',
+           'ushort' : 'u2',
+           'int'    : 'i4',
+           'uint'   : 'u4',
+           'float'  : 'f4',
+           'double' : 'f8',
+           'int8'   : 'i1',
+           'uint8'  : 'u1',
+           'int16'  : 'i2',
+           'uint16' : 'u2',
+           'int32'  : 'i4',
+           'uint32' : 'u4',
+           'float32': 'f4',
+           'float64': 'f8'}
+
+def load_ply(file_obj, file_type=None, mmap=False, **kwargs):
     '''
     Load a PLY file from an open file object.
+
+    Elements with fixed size records, including faces where every face
+    has the same number of vertices, are read as a single structured 
+    array with no per- record work. Faces with mixed lengths are located
+    by following the chain of record positions through blocks of bytes
+    with pointer doubling, gathered at once, and fan triangulated.
     
     Arguments
     ---------
     file_obj: an open file- like object
+    mmap:     bool, if True and file_obj is a real file, memory map
+              the file rather than reading it
 
     Returns
     ---------
     mesh_kwargs: dictionary of mesh info which can be passed to 
                  Trimesh constructor, eg: a = Trimesh(**mesh_kwargs)
     '''
-    def ply_element_colors(element):
-        '''
-        Given an element, try to extract RGBA color from its properties
-        and return them as an (n,3|4) array.
-        '''
-        color_keys = ['red', 'green', 'blue', 'alpha']
-        candidate_colors = [element['data'][i] for i in color_keys if i in element['properties']]
-
-        if len(candidate_colors) >= 3:
-            return np.column_stack(candidate_colors)
-        return None
-
-    def ply_read_header(file_obj):
-        '''
-        Read the ASCII header of a PLY file, and leave the file object 
-        at the position of the start of data. 
-        '''
-        # from ply specification
-        dtypes = {'char'  : 'i1',
-                  'uchar' : 'u1',
-                  'short' : 'i2',
-                  'ushort': 'u2',
-                  'int'   : 'i4',
-                  'uint'  : 'u4',
-                  'float' : 'f4',
-                  'double': 'f8'}
-
-        if not 'ply' in str(file_obj.readline()):
-            raise ValueError('This aint a ply file')
-        encoding = str(file_obj.readline()).strip().split()[1]
-
-        if 'ascii' in encoding:
-            raise ValueError('ASCII PLY not supported!')
-
-        endian   = ['<', '>']['big' in encoding]
-        elements = OrderedDict()
-
-        while True:
-            line = file_obj.readline()
-            if line is None:
-                raise ValueError('Header wasn\'t terminated properly!')
-            line = line.decode('utf-8').strip().split()
-            
-            if 'end_header' in line:
-                break
-
-            if 'element' in line[0]:
-                name, length = line[1:]
-                elements[name] = {'length'     : int(length), 
-                                  'properties' : OrderedDict()}
-            elif 'property' in line[0]:
-                if len(line) == 3:
-                    dtype, field = line[1:]
-                    elements[name]['properties'][str(field)] = endian + dtypes[dtype]
-                elif 'list' in line[1]:
-                    dtype_count, dtype, field = line[2:]
-                    elements[name]['properties'][str(field)] = (endian +
-                                                                dtypes[dtype_count] + 
-                                                                ', ($LIST,)'+
-                                                                endian + 
-                                                                dtypes[dtype])
-        return elements
-
-    def ply_populate_listsize(file_obj, elements):
-        '''
-        Given a set of elements populated from the header if there are any
-        list properties seek in the file the length of the list. 
-
-        Note that if you have a list where each instance is different length
-        (if for example you mixed triangles and quads) this won't work at all
-        '''
-        p_start = file_obj.tell()
-        p_current = file_obj.tell()
-        for element_key, element in elements.items():
-            props = element['properties']
-            prior_data = ''
-            for k, dtype in props.items():
-                if '$LIST' in dtype:
-                    # every list field has two data types: 
-                    # the list length (single value), and the list data (multiple)
-                    # here we are only reading the single value for list length
-                    field_dtype = np.dtype(dtype.split(',')[0])
-                    if len(prior_data) == 0: 
-                        offset = 0
-                    else: 
-                        offset = np.dtype(prior_data).itemsize()
-                    file_obj.seek(p_current+offset)
-                    size = np.fromstring(file_obj.read(field_dtype.itemsize), 
-                                         dtype=field_dtype)[0]
-                    props[k] = props[k].replace('$LIST', str(size))
-                prior_data += props[k] +','
-            itemsize = np.dtype(', '.join(props.values())).itemsize
-            p_current += element['length'] * itemsize
-        file_obj.seek(p_start)
-        
-    def ply_populate_data(file_obj, elements):
-        '''
-        Given the data type and field information from the header,
-        read the data and add it to a 'data' field in the element.
-        '''
-        for key in elements.keys():
-            items = list(elements[key]['properties'].items())
-            dtype = np.dtype(items)
-            data  = file_obj.read(elements[key]['length'] * dtype.itemsize)
-            elements[key]['data'] = np.fromstring(data, dtype=dtype)
-        return elements
-
-    def ply_elements_kwargs(elements):
-        '''
-        Given an elements data structure, extract the keyword
-        arguments that a Trimesh object constructor will expect.
-        '''
-        vertices = np.column_stack([elements['vertex']['data'][i] for i in 'xyz'])
-        faces    = elements['face']['data']['vertex_indices']['f1']
-        face_colors   = ply_element_colors(elements['face'])
-        vertex_colors = ply_element_colors(elements['vertex'])
-        result = {'vertices' : vertices,
-                  'faces'    : faces,
-                  'face_colors'   : face_colors,
-                  'vertex_colors' : vertex_colors}
-        return result
-
-    def ply_elements_size(elements):
-        '''
-        Given an elements data structure populated from the header, 
-        calculate how long the file should be if it is intact.
-        '''
-        size = 0
-        for element in elements.values():
-            dtype = np.dtype(','.join(element['properties'].values()))
-            size += element['length'] * dtype.itemsize
-        return size
-    
     # OrderedDict which is populated from the header
     elements = ply_read_header(file_obj)
-    # some elements are passed where the list dimensions
-    # are not included in the header, so this function goes 
-    # into the meat of the file and grabs the list dimensions 
-    # before we to the main data read as a single operation
-    ply_populate_listsize(file_obj, elements)
-
-    # how many bytes are left in the file
-    size_file = size_to_end(file_obj)
-    # how many bytes should the data structure described by
-    # the header take up
-    size_elements = ply_elements_size(elements)
+
+    data = ply_data_buffer(file_obj, mmap=mmap)
+    position = 0
+    for element in elements.values():
+        position = ply_populate_element(data, position, element)
     
     # if the number of bytes is not the same the file is probably corrupt
-    if size_file != size_elements:
+    if position != len(data):
         raise ValueError('File is unexpected length!')
 
-    # with everything populated and a reasonable confidence the file
-    # is intact, read the data fields described by the header
-    ply_populate_data(file_obj, elements)
     # all of the data is now stored in elements, but we need it as
     # a set of keyword arguments we can pass to the Trimesh constructor
     # will look something like {'vertices' : (data), 'faces' : (data)} 
     mesh_kwargs = ply_elements_kwargs(elements)
     return mesh_kwargs
 
+def ply_read_header(file_obj):
+    '''
+    Read the ASCII header of a PLY file, and leave the file object 
+    at the position of the start of data. 
+
+    Returns
+    ---------
+    elements: OrderedDict, keyed by element name with values:
+              length:     int, number of records
+              properties: OrderedDict, keyed by field name with either
+                          a dtype string, or for list properties a tuple
+                          of (count dtype, item dtype)
+    '''
+    if not 'ply' in str(file_obj.readline()):
+        raise ValueError('This aint a ply file')
+    encoding = str(file_obj.readline()).strip().split()[1]
+
+    if 'ascii' in encoding:
+        raise ValueError('ASCII PLY not supported!')
+
+    endian   = ['<', '>']['big' in encoding]
+    elements = OrderedDict()
+
+    while True:
+        line = file_obj.readline()
+        if line is None or len(line) == 0:
+            raise ValueError('Header wasn\'t terminated properly!')
+        line = line.decode('utf-8').strip().split()
+        if len(line) == 0:
+            continue
+        
+        if 'end_header' in line:
+            break
+
+        if 'element' in line[0]:
+            name, length = line[1:]
+            elements[name] = {'length'     : int(length), 
+                              'properties' : OrderedDict()}
+        elif 'property' in line[0]:
+            if len(line) == 3:
+                dtype, field = line[1:]
+                elements[name]['properties'][str(field)] = endian + _dtypes[dtype]
+            elif 'list' in line[1]:
+                dtype_count, dtype, field = line[2:]
+                elements[name]['properties'][str(field)] = (endian + _dtypes[dtype_count],
+                                                            endian + _dtypes[dtype])
+    return elements
+
+def ply_data_buffer(file_obj, mmap=False):
+    '''
+    Get the bytes from the current position to the end of a file.
+
+    Arguments
+    ---------
+    file_obj: open file object in binary mode
+    mmap:     bool, if True and file_obj is a real file, return a 
+              copy- on- write memory map rather than reading the file
+
+    Returns
+    ---------
+    data: (n,) uint8, bytes of the file after the header
+    '''
+    if mmap:
+        try:
+            file_obj.fileno()
+            return np.memmap(file_obj, 
+                             dtype  = np.uint8, 
+                             mode   = 'c', 
+                             offset = file_obj.tell(),
+                             shape  = (size_to_end(file_obj),))
+        except Exception:
+            pass
+    return np.frombuffer(file_obj.read(), dtype=np.uint8)
+
+def ply_populate_element(data, position, element):
+    '''
+    Read the records of an element, and add them to a 'data' field.
+
+    Arguments
+    ---------
+    data:     (n,) uint8, bytes of the file after the header
+    position: int, position of the element in data
+    element:  dict, element from ply_read_header
+
+    Returns
+    ---------
+    position: int, position after the element in data
+    '''
+    properties = element['properties']
+    lists = [k for k, v in properties.items() if isinstance(v, tuple)]
+
+    if len(lists) > 0:
+        # check the first record to guess the length of every list
+        sizes = _ply_first_list_sizes(data, position, properties)
+        if sizes is not None:
+            dtype  = _ply_record_dtype(properties, sizes)
+            record = _ply_view(data, position, dtype, element['length'])
+            # if every list matches the first record it is constant length
+            if record is not None and all((record[k]['f0'] == sizes[k]).all() 
+                                          for k in lists):
+                element['data'] = record
+                return position + len(record) * dtype.itemsize
+        if len(lists) > 1:
+            raise ValueError('Elements with multiple variable length lists unsupported!')
+        element['data'], position = _ply_variable_element(data, position, element)
+        return position
+
+    dtype = _ply_record_dtype(properties)
+    record = _ply_view(data, position, dtype, element['length'])
+    if record is None:
+        raise ValueError('File is unexpected length!')
+    element['data'] = record
+    return position + len(record) * dtype.itemsize
+
+def ply_elements_kwargs(elements):
+    '''
+    Given an elements data structure, extract the keyword
+    arguments that a Trimesh object constructor will expect.
+    '''
+    vertices = np.column_stack([elements['vertex']['data'][i] for i in 'xyz'])
+    face_colors = None
+    faces = None
+    if 'face' in elements:
+        properties = elements['face']['properties']
+        data  = elements['face']['data']
+        index = [k for k, v in properties.items() if isinstance(v, tuple)][0]
+        face_colors = ply_element_colors(elements['face'])
+        if isinstance(data, dict):
+            # variable length faces are stored as (count, flat values)
+            counts, values = data[index]
+        else:
+            # constant length faces are stored as an (n, size) array
+            values = data[index]['f1']
+            counts = np.full(len(values), values.shape[1], dtype=np.int64)
+        if len(values.shape) == 2 and values.shape[1] == 3:
+            faces = values
+        else:
+            triangles, owner = triangulate_fans(counts)
+            faces = values.reshape(-1)[triangles]
+            if face_colors is not None:
+                face_colors = face_colors[owner]
+    vertex_colors = ply_element_colors(elements['vertex'])
+    result = {'vertices' : vertices,
+              'faces'    : faces,
+              'face_colors'   : face_colors,
+              'vertex_colors' : vertex_colors}
+    return result
+
+def ply_element_colors(element):
+    '''
+    Given an element, try to extract RGBA color from its properties
+    and return them as an (n,3|4) array.
+    '''
+    color_keys = ['red', 'green', 'blue', 'alpha']
+    candidate_colors = [element['data'][i] for i in color_keys if i in element['properties']]
+
+    if len(candidate_colors) >= 3:
+        return np.column_stack(candidate_colors)
+    return None
+
+def _ply_record_dtype(properties, sizes=None):
+    '''
+    Find the numpy dtype of a record, with list properties 
+    stored as a sub- array with fields 'f0' (count) and 'f1' (values).
+    '''
+    fields = []
+    for key, dtype in properties.items():
+        if isinstance(dtype, tuple):
+            fields.append((str(key), [('f0', dtype[0]),
+                                      ('f1', dtype[1], (int(sizes[key]),))]))
+        else:
+            fields.append((str(key), dtype))
+    return np.dtype(fields)
+
+def _ply_view(data, position, dtype, count):
+    '''
+    View bytes of data as records, or return None if there aren't enough.
+    '''
+    end = position + (count * dtype.itemsize)
+    if end > len(data):
+        return None
+    return data[position:end].view(dtype)
+
+def _ply_first_list_sizes(data, position, properties):
+    '''
+    Read the length of every list property in the record at position.
+    '''
+    sizes = {}
+    for key, dtype in properties.items():
+        if not isinstance(dtype, tuple):
+            position += np.dtype(dtype).itemsize
+            continue
+        count_dtype = np.dtype(dtype[0])
+        if position + count_dtype.itemsize > len(data):
+            return None
+        size = int(data[position:position + count_dtype.itemsize].view(count_dtype)[0])
+        sizes[key] = size
+        position += count_dtype.itemsize + (size * np.dtype(dtype[1]).itemsize)
+    return sizes
+
+def _ply_variable_element(data, position, element, chunk_size=2**16):
+    '''
+    Read an element with one list property of varying length.
+
+    The position of every record depends on the length of every record
+    before it, so for each block of bytes the position of the next record
+    is found for every byte, and the chain of records through the block
+    is followed by repeatedly doubling the jumps.
+
+    Arguments
+    ---------
+    data:       (n,) uint8, bytes of the file after the header
+    position:   int, position of the element in data
+    element:    dict, element from ply_read_header
+    chunk_size: int, number of bytes to examine at once
+
+    Returns
+    ---------
+    result:   dict, keyed by field, with arrays for scalar properties
+              and (counts, flat values) for the list property
+    position: int, position after the element in data
+    '''
+    properties = element['properties']
+    key = [k for k, v in properties.items() if isinstance(v, tuple)][0]
+    count_dtype = np.dtype(properties[key][0])
+    item_dtype  = np.dtype(properties[key][1])
+
+    # byte offset of each scalar field from the start of the record,
+    # and whether it comes after the list
+    offsets = OrderedDict()
+    offset  = 0
+    after   = False
+    for k, dtype in properties.items():
+        if k == key:
+            prefix = offset
+            offset = count_dtype.itemsize
+            after  = True
+            continue
+        offsets[k] = (offset, after)
+        offset += np.dtype(dtype).itemsize
+    # size of a record without any list items
+    fixed = prefix + offset
+
+    starts    = deque()
+    counts    = deque()
+    remaining = element['length']
+    while remaining > 0:
+        if position + fixed > len(data):
+            raise ValueError('File is unexpected length!')
+        # the list length if a record started at every byte in the block
+        block  = min(chunk_size, len(data) - position)
+        padded = np.zeros(block + count_dtype.itemsize, dtype=np.uint8)
+        window = data[position + prefix:position + prefix + len(padded)]
+        padded[:len(window)] = window
+        size = np.ndarray(shape   = (block,), 
+                          dtype   = count_dtype, 
+                          buffer  = padded, 
+                          strides = (1,)).astype(np.int64)
+        jump = np.arange(block) + fixed + (size * item_dtype.itemsize)
+        # jumps which leave the block go to a sentinel at the end
+        step = np.append(np.minimum(jump, block), block)
+
+        # tables of jumps by 1, 2, 4, ... records
+        tables = [step]
+        while tables[-1][0] != block and len(tables) < 64:
+            tables.append(tables[-1][tables[-1]])
+        # find the number of records in the block with binary lifting
+        length  = 0
+        current = 0
+        for level in reversed(range(len(tables))):
+            if tables[level][current] != block:
+                current  = tables[level][current]
+                length  += 2 ** level
+        length = min(length + 1, remaining)
+
+        # position of every record in the chain from the block start
+        index = np.arange(length)
+        local = np.zeros(length, dtype=np.int64)
+        for level in range(len(tables)):
+            move = ((index >> level) & 1) == 1
+            local[move] = tables[level][local[move]]
+
+        starts.append(position + local)
+        counts.append(size[local])
+        position  += int(jump[local[-1]])
+        remaining -= length
+        if position > len(data):
+            raise ValueError('File is unexpected length!')
+
+    starts = np.concatenate(starts)
+    counts = np.concatenate(counts)
+
+    result = {}
+    # list items follow the count in every record
+    item_count  = counts.sum()
+    item_record = np.repeat(np.arange(len(starts)), counts)
+    item_index  = np.arange(item_count) - np.repeat(np.cumsum(counts) - counts, counts)
+    values = _ply_gather(data,
+                         (starts[item_record] + prefix + count_dtype.itemsize + 
+                          item_index * item_dtype.itemsize),
+                         item_dtype)
+    result[key] = (counts, values)
+    for k, (offset, after) in offsets.items():
+        field = starts + offset
+        if after:
+            field += prefix + counts * item_dtype.itemsize
+        result[k] = _ply_gather(data, field, np.dtype(properties[k]))
+    return result, position
+
+def _ply_gather(data, offsets, dtype):
+    '''
+    Read a value of dtype at every offset in data.
+    '''
+    index = offsets.reshape((-1,1)) + np.arange(dtype.itemsize)
+    return np.ascontiguousarray(data[index]).view(dtype).reshape(-1)
+
 def export_ply(mesh):
     '''
     Export a mesh in the PLY format.
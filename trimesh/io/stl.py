@@ -9,18 +9,112 @@ _stl_dtype = np.dtype([('normals',    np.float32, (3)),
 _stl_dtype_header = np.dtype([('header', np.void, 80),
                              ('face_count', np.int32)])
 
-def load_stl(file_obj, file_type=None):
-    if is_binary_file(file_obj): return load_stl_binary(file_obj)
+def load_stl(file_obj, file_type=None, mmap=False, **kwargs):
+    if is_binary_file(file_obj): return load_stl_binary(file_obj, mmap=mmap)
     else:                        return load_stl_ascii(file_obj)
         
-def load_stl_binary(file_obj):
+def load_stl_binary(file_obj, mmap=False):
     '''
     Load a binary STL file into a trimesh object. 
-    Uses a single main struct.unpack call, and is significantly faster
-    than looping methods or ASCII STL. 
+    Uses a single structured numpy view of the file, and is significantly 
+    faster than looping methods or ASCII STL. 
+
+    Arguments
+    ---------
+    file_obj: open file object in binary mode
+    mmap:     bool, if True memory map the file rather than reading it,
+              which keeps peak memory close to the size of the final mesh
+
+    Returns
+    ---------
+    loaded: dict, with keys 'vertices', 'face_normals', 'faces'
+    '''
+    blob = stl_blob(file_obj, mmap=mmap)
+    
+    # all of our vertices will be loaded in order due to the STL format, 
+    # so faces are just sequential indices reshaped. 
+    faces = np.arange(len(blob) * 3).reshape((-1,3))
+    
+    # face normals are a strided view into the file data, vertices are copied
+    # once by the reshape as faces are not contiguous in the file
+    result =  {'vertices'     : blob['vertices'].reshape((-1,3)),
+               'face_normals' : blob['normals'],
+               'faces'        : faces}
+    return result
+
+def stl_blob(file_obj, mmap=False):
     '''
+    Get the face records of a binary STL file as a structured array.
+
+    Arguments
+    ---------
+    file_obj: open file object in binary mode, positioned at the header
+    mmap:     bool, if True and file_obj is a real file return a 
+              copy- on- write memory map rather than reading the file 
 
-    header = np.fromstring(file_obj.read(84), dtype=_stl_dtype_header)
+    Returns
+    ---------
+    blob: (n,) structured array of _stl_dtype with fields
+          'normals' (3) float32, 'vertices' (3,3) float32, 'attributes' uint16
+    '''
+    face_count = _stl_header(file_obj)
+    if mmap and _has_fileno(file_obj):
+        # pages are only read when accessed, and only copied if modified
+        return np.memmap(file_obj, 
+                         dtype  = _stl_dtype, 
+                         mode   = 'c', 
+                         offset = file_obj.tell(),
+                         shape  = (face_count,))
+    return np.frombuffer(file_obj.read(face_count * _stl_dtype.itemsize), 
+                         dtype = _stl_dtype)
+
+def stl_chunks(file_obj, chunk_size=2**20, mmap=True):
+    '''
+    Iterate through the faces of a binary STL file in chunks, so files
+    larger than memory can be processed.
+
+    Arguments
+    ---------
+    file_obj:   open file object in binary mode, positioned at the header
+    chunk_size: int, maximum number of faces per chunk
+    mmap:       bool, if True and file_obj is a real file, chunks are views 
+                of a memory map, otherwise they are read sequentially
+
+    Returns
+    ---------
+    chunks: generator of (k,) structured arrays of _stl_dtype
+    '''
+    chunk_size = max(int(chunk_size), 1)
+    if mmap and _has_fileno(file_obj):
+        blob = stl_blob(file_obj, mmap=True)
+        for start in range(0, len(blob), chunk_size):
+            yield blob[start:start + chunk_size]
+        return
+
+    face_count = _stl_header(file_obj)
+    for start in range(0, face_count, chunk_size):
+        count = min(chunk_size, face_count - start)
+        yield np.frombuffer(file_obj.read(count * _stl_dtype.itemsize),
+                            dtype = _stl_dtype)
+
+def _stl_header(file_obj):
+    '''
+    Read the header of a binary STL file and check that the face count
+    matches the length of the file.
+
+    Arguments
+    ---------
+    file_obj: open file object in binary mode, positioned at the header
+
+    Returns
+    ---------
+    face_count: int, number of faces in the file, with file_obj
+                positioned at the start of the face data
+    '''
+    header = np.frombuffer(file_obj.read(84), dtype=_stl_dtype_header)
+    if len(header) != 1:
+        raise ValueError('Binary STL is missing header!')
+    face_count = int(header['face_count'][0])
 
     # now we check the length from the header versus the length of the file
     # data_start should always be position 84, but hard coding that felt ugly
@@ -34,24 +128,25 @@ def load_stl_binary(file_obj):
     # the binary format has a rigidly defined structure, and if the length
     # of the file doesn't match the header, the loaded version is almost
     # certainly going to be garbage. 
-    data_ok = (data_end - data_start) == (header['face_count'] * _stl_dtype.itemsize)
+    data_ok = (data_end - data_start) == (face_count * _stl_dtype.itemsize)
    
     # this check is to see if this really is a binary STL file. 
     # if we don't do this and try to load a file that isn't structured properly 
-    # the struct.unpack call uses 100% memory until the whole thing crashes, 
+    # the read can use 100% memory until the whole thing crashes, 
     # so it's much better to raise an exception here. 
     if not data_ok:
         raise ValueError('Binary STL has incorrect length in header!')
-    
-    # all of our vertices will be loaded in order due to the STL format, 
-    # so faces are just sequential indices reshaped. 
-    faces = np.arange(header['face_count'] * 3).reshape((-1,3))
-    blob  = np.fromstring(file_obj.read(), dtype=_stl_dtype)
-    
-    result =  {'vertices'     : blob['vertices'].reshape((-1,3)),
-               'face_normals' : blob['normals'].reshape((-1,3)),
-               'faces'        : faces}
-    return result
+    return face_count
+
+def _has_fileno(file_obj):
+    '''
+    Check if a file object is backed by a real file which can be memory mapped.
+    '''
+    try:
+        file_obj.fileno()
+        return True
+    except Exception:
+        return False
     
 def load_stl_ascii(file_obj):
     '''
@@ -0,0 +1,355 @@
+import numpy as np
+
+from collections import deque
+
+from ..constants import log
+from ..geometry  import triangulate_fans
+
+# lookup table for bytes which separate values in a wavefront file
+_whitespace = np.zeros(256, dtype=bool)
+_whitespace[[ord(i) for i in ' \t\r\n\x0b\x0c']] = True
+
+def load_wavefront(file_obj, file_type=None, block_size=2**24, **kwargs):
+    '''
+    Loads an ascii Wavefront OBJ file_obj into kwargs for the Trimesh constructor.
+
+    The file is read in large blocks of whole lines, and each block is
+    parsed with vectorized byte operations and a single numeric conversion
+    per element type, so memory stays close to the size of the output.
+
+    Faces may be any mix of triangles and polygons, which are fan
+    triangulated, and may reference texture coordinates and normals
+    with v/vt/vn, v//vn, or v/vt syntax, which may differ between lines.
+    Negative (relative) indices are supported.
+
+    Arguments
+    ----------
+    file_obj:   file object containing a wavefront file
+    file_type:  not used
+    block_size: int, approximate number of bytes to parse at once
+
+    Returns
+    ----------
+    loaded: dict with kwargs for Trimesh constructor, with keys:
+            vertices:       (n,3) float
+            faces:          (m,3) int
+            vertex_normals: (n,3) float, if the file has normals
+            metadata:       dict, with 'vertex_texture' (n,2) float
+                            if the file has texture coordinates
+    '''
+    parsed = parse_wavefront(_blocks(file_obj, block_size))
+    vertices = parsed['v']
+    faces    = parsed['f']
+
+    loaded = {'vertices' : vertices,
+              'faces'    : faces[:,:,0]}
+
+    # normals and texture coordinates are referenced per face corner,
+    # but the mesh stores them per vertex, so the last reference wins
+    vertex  = faces[:,:,0].reshape(-1)
+    texture = faces[:,:,1].reshape(-1)
+    normal  = faces[:,:,2].reshape(-1)
+    if len(parsed['vn']) > 0 and (normal >= 0).any():
+        normals = np.zeros((len(vertices), 3))
+        normals[vertex[normal >= 0]] = parsed['vn'][normal[normal >= 0]]
+        loaded['vertex_normals'] = normals
+    if len(parsed['vt']) > 0 and (texture >= 0).any():
+        uv = np.zeros((len(vertices), 2))
+        uv[vertex[texture >= 0]] = parsed['vt'][texture[texture >= 0]]
+        loaded['metadata'] = {'vertex_texture' : uv}
+    return loaded
+
+def parse_wavefront(blocks):
+    '''
+    Parse the geometry of a wavefront file from blocks of whole lines.
+
+    Arguments
+    ----------
+    blocks: iterable of bytes, each ending at the end of a line
+
+    Returns
+    ----------
+    parsed: dict, with keys:
+            v:      (n,3) float, vertices
+            vt:     (p,2) float, texture coordinates
+            vn:     (q,3) float, normals
+            f:      (m,3,3) int, zero indexed triangles, where the last
+                    axis is (v, vt, vn) index and -1 if not referenced
+    '''
+    # keyword for each element and the number of values to keep
+    elements = {'v'  : (b'v',  3),
+                'vt' : (b'vt', 2),
+                'vn' : (b'vn', 3)}
+    collected = {k: deque() for k in elements.keys()}
+    collected['f'] = deque()
+    # number of each element seen so far, for relative indices
+    count  = np.zeros(3, dtype=np.int64)
+
+    for block in blocks:
+        data = np.frombuffer(block, dtype=np.uint8)
+        if len(data) == 0:
+            continue
+        end  = np.nonzero(data == ord('\n'))[0]
+        data = _strip_comments(data, end)
+        # lines start at their first character which isn't whitespace
+        solid = np.nonzero(np.logical_not(_whitespace[data]))[0]
+        start = np.append(0, end[:-1] + 1)
+        start = np.append(solid, len(data))[np.searchsorted(solid, start)]
+        start = np.minimum(start, end)
+
+        # the first three characters of each line, padded with spaces
+        padded = np.append(data, np.zeros(3, dtype=np.uint8) + ord(' '))
+        head   = padded[start.reshape((-1,1)) + np.arange(3)]
+        head[(start.reshape((-1,1)) + np.arange(3)) >= end.reshape((-1,1))] = ord(' ')
+        # keywords may be followed by any whitespace
+        head[_whitespace[head]] = ord(' ')
+
+        # which lines are which element
+        masks = {}
+        for key, (keyword, columns) in elements.items():
+            keyword = np.frombuffer(keyword + b' ', dtype=np.uint8)
+            masks[key] = (head[:,:len(keyword)] == keyword).all(axis=1)
+        masks['f'] = (head[:,:2] == np.frombuffer(b'f ', dtype=np.uint8)).all(axis=1)
+
+        # the number of each element before each line
+        before = np.column_stack([np.cumsum(masks[k]) - masks[k]
+                                  for k in ['v', 'vt', 'vn']]) + count
+
+        for key, (keyword, columns) in elements.items():
+            if not masks[key].any():
+                continue
+            values, tokens = _parse_lines(data,
+                                          start[masks[key]],
+                                          end[masks[key]],
+                                          skip = len(keyword))
+            collected[key].append(_take_columns(values, tokens, columns))
+
+        if masks['f'].any():
+            faces = _parse_faces(data,
+                                 start[masks['f']],
+                                 end[masks['f']],
+                                 before[masks['f']])
+            collected['f'].append(faces)
+
+        count += [masks['v'].sum(), masks['vt'].sum(), masks['vn'].sum()]
+
+    parsed = {}
+    for key, (keyword, columns) in elements.items():
+        if len(collected[key]) == 0:
+            parsed[key] = np.zeros((0, columns))
+        else:
+            parsed[key] = np.vstack(collected[key])
+    if len(collected['f']) == 0:
+        parsed['f'] = np.zeros((0, 3, 3), dtype=np.int64)
+    else:
+        parsed['f'] = np.vstack(collected['f'])
+    return parsed
+
+def _blocks(file_obj, block_size):
+    '''
+    Read a file object in blocks which end at the end of a line.
+    '''
+    block_size = max(int(block_size), 1)
+    remainder  = b''
+    while True:
+        block = file_obj.read(block_size)
+        if hasattr(block, 'encode'):
+            block = block.encode('utf-8')
+        if len(block) == 0:
+            break
+        block = remainder + block
+        split = block.rfind(b'\n') + 1
+        remainder = block[split:]
+        if split > 0:
+            yield block[:split]
+    if len(remainder) > 0:
+        yield remainder + b'\n'
+
+def _strip_comments(data, end):
+    '''
+    Replace everything from a '#' to the end of its line with spaces.
+
+    Arguments
+    ----------
+    data: (n,) uint8, bytes of whole lines
+    end:  (m,) int, position of the newline ending each line
+
+    Returns
+    ----------
+    data: (n,) uint8, bytes without comments
+    '''
+    comment = np.nonzero(data == ord('#'))[0]
+    if len(comment) == 0:
+        return data
+    # the first comment character at or after the start of each line
+    start = np.append(0, end[:-1] + 1)
+    first = np.append(comment, len(data))[np.searchsorted(comment, start)]
+    cut   = first < end
+    # mark every byte from a cut to its newline
+    delta = np.zeros(len(data) + 1, dtype=np.int64)
+    np.add.at(delta, first[cut], 1)
+    np.add.at(delta, end[cut], -1)
+    data = data.copy()
+    data[np.cumsum(delta)[:-1] > 0] = ord(' ')
+    return data
+
+def _select(data, start, end, skip=0):
+    '''
+    Concatenate lines of data, replacing the first bytes of every
+    line with spaces.
+
+    Arguments
+    ----------
+    data:  (n,) uint8, bytes
+    start: (m,) int, first byte of each line to select
+    end:   (m,) int, position of the newline ending each line
+    skip:  int, number of bytes at the start of each line to blank
+
+    Returns
+    ----------
+    selected: (p,) uint8, selected bytes including newlines
+    offset:   (m,) int, position of each line in selected
+    '''
+    # elements of one type are usually on consecutive lines, so
+    # build the mask from runs of consecutive lines
+    broken = np.nonzero(start[1:] != end[:-1] + 1)[0] + 1
+    first  = start[np.append(0, broken)]
+    last   = end[np.append(broken - 1, len(end) - 1)] + 1
+    bounds = np.column_stack((first, last)).reshape(-1)
+    length = np.diff(np.concatenate(([0], bounds, [len(data)])))
+    flags  = np.arange(len(length)) % 2 == 1
+    selected = data[np.repeat(flags, length)]
+
+    length = end - start + 1
+    offset = np.cumsum(length) - length
+    if skip > 0:
+        selected[(offset.reshape((-1,1)) + np.arange(skip)).reshape(-1)] = ord(' ')
+    return selected, offset
+
+def _count_tokens(selected, offset):
+    '''
+    Count the whitespace separated tokens in every line of selected bytes.
+    '''
+    space  = _whitespace[selected]
+    starts = np.logical_and(np.logical_not(space),
+                            np.append(True, space[:-1]))
+    return np.add.reduceat(starts, offset, dtype=np.int64)
+
+def _parse_lines(data, start, end, skip=0, dtype=np.float64):
+    '''
+    Parse whitespace separated numbers on a set of lines.
+
+    Returns
+    ----------
+    values: (p,) dtype, every value on every line
+    tokens: (m,) int, number of values on each line
+    '''
+    selected, offset = _select(data, start, end, skip)
+    tokens = _count_tokens(selected, offset)
+    values = np.fromstring(selected.tobytes(), dtype=dtype, sep=' ')
+    if len(values) != tokens.sum():
+        raise ValueError('Unable to parse values in OBJ file!')
+    return values, tokens
+
+def _take_columns(values, tokens, columns):
+    '''
+    Take the first columns values from each line.
+    '''
+    if (tokens < columns).any():
+        raise ValueError('OBJ element has fewer than {} values!'.format(columns))
+    if (tokens == columns).all():
+        return values.reshape((-1, columns))
+    # lines have extra values (eg: vertex colors) which are dropped
+    offset = np.cumsum(tokens) - tokens
+    return values[offset.reshape((-1,1)) + np.arange(columns)]
+
+# the element (v, vt, vn) of each index in a face corner, for 
+# the corner formats v, v/vt, v//vn and v/vt/vn
+_face_layout = np.array([[0, -1, -1],
+                         [0,  1, -1],
+                         [0,  2, -1],
+                         [0,  1,  2]])
+
+def _face_formats(selected, offset, corners):
+    '''
+    Find the format of the face vertices on every line from the
+    slashes in the line.
+
+    Arguments
+    ----------
+    selected: (p,) uint8, bytes of face lines
+    offset:   (m,) int, position of each line in selected
+    corners:  (m,) int, number of corners on each line
+
+    Returns
+    ----------
+    formats: (m,) int, index of _face_layout for each line
+    '''
+    slash   = selected == ord('/')
+    doubled = np.logical_and(slash, np.append(slash[1:], False))
+    slashes = np.add.reduceat(slash,   offset, dtype=np.int64)
+    doubles = np.add.reduceat(doubled, offset, dtype=np.int64)
+
+    # every corner on a line must have the same number of slashes
+    per_corner = slashes // np.maximum(corners, 1)
+    ok = np.logical_and.reduce((per_corner * corners == slashes,
+                                per_corner <= 2,
+                                np.logical_or(doubles == 0, 
+                                              doubles == corners)))
+    if not ok.all():
+        raise ValueError('OBJ faces have inconsistent format!')
+
+    # v//vn has two slashes per corner but only two indices
+    formats = per_corner.copy()
+    formats[per_corner == 2] = 3
+    formats[doubles > 0]     = 2
+    return formats
+
+def _parse_faces(data, start, end, before):
+    '''
+    Parse face lines into fan triangulated, zero indexed triangles.
+
+    Arguments
+    ----------
+    data:   (n,) uint8, bytes of the block
+    start:  (m,) int, first byte of each face line
+    end:    (m,) int, byte after each face line
+    before: (m,3) int, count of v, vt, vn before each face
+
+    Returns
+    ----------
+    triangles: (p, 3, 3) int, zero indexed triangles, where the last
+               axis is (v, vt, vn) index and -1 if not referenced
+    '''
+    selected, offset = _select(data, start, end, skip=2)
+    # count polygon corners before splitting them into indices
+    corners = _count_tokens(selected, offset)
+    formats = np.repeat(_face_formats(selected, offset, corners), corners)
+    width   = (_face_layout >= 0).sum(axis=1)[formats]
+
+    selected[selected == ord('/')] = ord(' ')
+    values = np.fromstring(selected.tobytes(), dtype=np.int64, sep=' ')
+    if len(values) != width.sum():
+        raise ValueError('OBJ faces have inconsistent format!')
+
+    # the corner and element each value belongs to
+    corner = np.repeat(np.arange(len(width)), width)
+    column = np.arange(len(values)) - np.repeat(np.cumsum(width) - width, width)
+    column = _face_layout[formats[corner], column]
+
+    # wavefront is one indexed, and negative indices are relative
+    owner  = np.repeat(np.arange(len(start)), corners)[corner]
+    values = values - 1
+    negative = values < -1
+    values[negative] += before[owner[negative], column[negative]] + 1
+
+    indices = np.zeros((len(width), 3), dtype=np.int64) - 1
+    indices[corner, column] = values
+
+    if (corners < 3).any():
+        log.warning('OBJ file has %d faces with less than 3 vertices!',
+                    (corners < 3).sum())
+    # fan triangulate polygons around their first vertex
+    return indices[triangulate_fans(corners)[0]]
+
+_wavefront_loaders = {'obj' : load_wavefront}
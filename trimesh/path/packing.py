@@ -7,110 +7,233 @@ from ..constants import tol_path as tol
 
 from .polygons  import polygons_obb, transform_polygon
 
-class RectangleBin:
+class Packer:
     '''
-    2D BSP tree node. 
-    http://www.blackpawn.com/texts/lightmaps/
+    Pack rectangles onto sheets one at a time, starting a new sheet
+    when a rectangle doesn't fit on any existing sheet.
+
+    The empty space of each sheet is kept as a flat (n,4) array of 
+    maximal free rectangles, which may overlap each other. A rectangle
+    is put in the lowest free rectangle it fits in, and then
+    every free rectangle it overlaps is split around it.
     '''
-    def __init__(self, bounds=None, size=None):
-        self.child  = [None] * 2
-
-        #bounds: (minx, miny, maxx, maxy)
-        self.bounds   = bounds
-        self.occupied = False
-        
-        if size != None:  
-            self.bounds = np.append([0,0], size)
-        
-    def insert(self, rectangle_size):
-        for child in self.child:
-            if child != None: 
-                attempt = child.insert(rectangle_size)
-                if attempt: return attempt
-                
-        if self.occupied:
-            return None
-
-        # compare the bin size to the insertion candidate size
-        size_test = bounds_to_size(self.bounds) - rectangle_size
-
-        # this means the inserted rectangle is too big for the cell
-        if np.any(size_test < -tol.zero):
-            return None
-        
-        # since the cell is big enough for the current rectangle, either it
-        # is going to be inserted here, or the cell is going to be split
-        # either way, the cell is now occupied. 
-        self.occupied = True    
-        
-        # this means the inserted rectangle fits perfectly
-        # since we already checked to see if it was negative, no abs is needed
-        if np.all(size_test < tol.zero): 
-            return self.bounds[0:2]
-        
-        # since the rectangle fits but the empty space is too big, 
-        # we need to create some children to insert into
-        # first, we decide which way to split
-        vertical      = size_test[0] > size_test[1]
-        length        = rectangle_size[not vertical]
-        child_bounds  = self.split(length, vertical)
-
-        self.child[0] = RectangleBin(bounds=child_bounds[0])
-        self.child[1] = RectangleBin(bounds=child_bounds[1])
-        
-        return self.child[0].insert(rectangle_size)
-   
-    def split(self, length=None, vertical=True):
+    def __init__(self, sheet_size, max_sheets=None):
         '''
-        returns two bounding boxes representing the current
-        bounds split into two smaller boxes
+        Arguments
+        ----------
+        sheet_size: (2) float, width and height of sheets
+        max_sheets: int, maximum number of sheets, or None for no limit
+        '''
+        self.sheet_size = np.array(sheet_size, dtype=np.float64).reshape(2)
+        self.max_sheets = max_sheets
+        # (n,4) free rectangles of each sheet, [minx, miny, maxx, maxy]
+        self.free       = deque()
+        # the sheet index and offset of every rectangle added
+        self.sheet      = deque()
+        self.offset     = deque()
+        self.sizes      = deque()
+
+    @property
+    def sheet_count(self):
         '''
-        #also know as [minx, miny, maxx, maxy]
-        [left, bottom, right, top] = self.bounds
-        if vertical:
-            box = [[left,        bottom, left+length, top],
-                   [left+length, bottom, right,       top]]
-        else: 
-            box = [[left, bottom,          right, bottom + length],
-                   [left, bottom + length, right, top]]
-        return box
+        Number of sheets used.
+
+        Returns
+        ----------
+        count: int
+        '''
+        return len(self.free)
+
+    def add(self, size):
+        '''
+        Add a rectangle to the first sheet it fits on.
+
+        Arguments
+        ----------
+        size: (2) float, width and height of rectangle
+
+        Returns
+        ----------
+        sheet:  int, index of sheet, or None if the rectangle 
+                didn't fit on any sheet
+        offset: (2) float, position of lower left corner of 
+                rectangle on sheet, or None
+        '''
+        size = np.array(size, dtype=np.float64).reshape(2)
+        sheet, offset = None, None
+        for index, free in enumerate(self.free):
+            offset, self.free[index] = insert_rectangle(free, size)
+            if offset is not None:
+                sheet = index
+                break
+        if (sheet is None and 
+            (self.max_sheets is None or len(self.free) < self.max_sheets)):
+            free = np.append([0.0, 0.0], self.sheet_size).reshape((1,4))
+            offset, free = insert_rectangle(free, size)
+            if offset is not None:
+                self.free.append(free)
+                sheet = len(self.free) - 1
+
+        self.sheet.append(sheet)
+        self.offset.append(offset)
+        self.sizes.append(size)
+        return sheet, offset
+
+    def add_many(self, sizes):
+        '''
+        Add rectangles in order.
+
+        Arguments
+        ----------
+        sizes: (n,2) float, width and height of rectangles
+
+        Returns
+        ----------
+        sheets:  (n) int, index of sheet for each rectangle, -1 if 
+                 a rectangle didn't fit
+        offsets: (n,2) float, position of rectangles on sheets
+        '''
+        sizes   = np.asanyarray(sizes, dtype=np.float64).reshape((-1,2))
+        sheets  = np.full(len(sizes), -1, dtype=np.int64)
+        offsets = np.zeros((len(sizes), 2))
+        for i, size in enumerate(sizes):
+            sheet, offset = self.add(size)
+            if sheet is not None:
+                sheets[i]  = sheet
+                offsets[i] = offset
+        return sheets, offsets
+
+    def density(self):
+        '''
+        Area of rectangles on each sheet divided by the area of 
+        the box containing them.
+
+        Returns
+        ----------
+        density: (sheet_count) float
+        '''
+        density = np.zeros(self.sheet_count)
+        for index in range(self.sheet_count):
+            placed = [(o, s) for i, o, s in zip(self.sheet, self.offset, self.sizes)
+                      if i == index]
+            offsets, sizes = np.array(placed).transpose((1,0,2))
+            consumed = (offsets + sizes).max(axis=0)
+            density[index] = np.prod(sizes, axis=1).sum() / np.prod(consumed)
+        return density
+
+def insert_rectangle(free, size):
+    '''
+    Insert a rectangle into the free space of a sheet.
+
+    Arguments
+    ----------
+    free: (n,4) float, maximal free rectangles [minx, miny, maxx, maxy]
+    size: (2) float, width and height of rectangle to insert
+
+    Returns
+    ----------
+    offset: (2) float, lower left corner of the inserted rectangle,
+            or None if it doesn't fit
+    free:   (m,4) float, free rectangles after insertion
+    '''
+    fits = np.nonzero((free[:,2] - free[:,0] - size[0] > -tol.zero) &
+                      (free[:,3] - free[:,1] - size[1] > -tol.zero))[0]
+    if len(fits) == 0:
+        return None, free
+
+    # the lowest position, then the furthest left
+    choice = fits[np.lexsort((free[fits,0], free[fits,1]))[0]]
+    offset = free[choice,:2].copy()
+    placed = np.append(offset, offset + size)
+
+    # split every free rectangle which overlaps the inserted one
+    hit = ((free[:,0] < placed[2] - tol.zero) & 
+           (free[:,2] > placed[0] + tol.zero) &
+           (free[:,1] < placed[3] - tol.zero) & 
+           (free[:,3] > placed[1] + tol.zero))
+    kept = free[~hit]
+    cut  = free[hit]
+    # the parts to the left, right, below and above the rectangle
+    count  = len(cut)
+    pieces = np.tile(cut, (4,1))
+    pieces[:count,2]          = placed[0]
+    pieces[count:count*2,0]   = placed[2]
+    pieces[count*2:count*3,3] = placed[1]
+    pieces[count*3:,1]        = placed[3]
+    pieces = pieces[((pieces[:,2] - pieces[:,0]) > tol.zero) &
+                    ((pieces[:,3] - pieces[:,1]) > tol.zero)]
+
+    # pieces are inside the rectangle they were cut from, so 
+    # kept rectangles are never inside a piece, but pieces may be
+    # inside kept rectangles or other pieces
+    others   = np.vstack((kept, pieces))
+    contains = ((others[:,0] <= pieces[:,0,None] + tol.zero) & 
+                (others[:,1] <= pieces[:,1,None] + tol.zero) &
+                (others[:,2] >= pieces[:,2,None] - tol.zero) & 
+                (others[:,3] >= pieces[:,3,None] - tol.zero))
+    # a piece doesn't remove itself, and of equal pieces only the first is kept
+    index = np.arange(len(pieces))
+    contains[index, index + len(kept)] = False
+    equal = (contains[:,len(kept):] & contains[:,len(kept):].T)
+    contains[:,len(kept):] &= ~(equal & (index > index.reshape((-1,1))))
+    free = np.vstack((kept, pieces[~contains.any(axis=1)]))
+    return offset, free
 
 def bounds_to_size(bounds):
     return np.diff(np.reshape(bounds, (2,2)), axis=0)[0]    
 
-def pack_rectangles(rectangles, sheet_size, shuffle=False):
+def pack_rectangles(rectangles, sheet_size, shuffle=False, order=None):
     '''
-    Pack smaller rectangles onto a larger rectangle, using a binary space partition tree.
+    Pack smaller rectangles onto a larger rectangle, using maximal free rectangles.
 
     Parameters
     ----------
     rectangles: (n,2) array of (width, height) pairs representing the smaller rectangles to be packed.
     sheet_size: (2) array of (width, height) pair representing the sheet size the smaller rectangles will be packed onto.
     shuffle: boolean, whether or not to shuffle the insert order of the smaller rectangles, as the final packing density depends on the order of which rectangles are inserted onto the larger sheet. 
-    density_escape: float, at what density should the loop exit early and return. A value of zero will return immediately after a single rectangle is placed, and a value of >= 1.0 will always traverse the entire list of smaller rectangles.
+    order: (n) int, order to insert rectangles in, if None largest first
+
+    Returns
+    ----------
+    density:  float, area of inserted rectangles over area of consumed_box
+    offset:   (m,2) float, offsets of inserted rectangles
+    inserted: (n) bool, which rectangles were inserted
+    consumed_box: (2) float, size of box containing inserted rectangles
     '''
-    offset    = np.zeros((len(rectangles), 2))
-    inserted  = np.zeros( len(rectangles), dtype=np.bool)
-    box_order = np.argsort(np.sum(rectangles**2, axis=1))[::-1]
-    area      = 0.0
-    density   = 0.0
-    
-    if shuffle: 
-        shuffle_len = int(np.random.random()* len(rectangles)) - 1  
-        box_order[0:shuffle_len] = np.random.permutation(box_order[0:shuffle_len])
-
-    sheet = RectangleBin(size=sheet_size)
-    for index in box_order: 
-        insert_location = sheet.insert(rectangles[index])
-        if insert_location != None:
-            area           += np.prod(rectangles[index])
-            offset[index]  += insert_location
+    rectangles = np.asanyarray(rectangles, dtype=np.float64)
+    if order is None:
+        order = _insert_order(rectangles, shuffle=shuffle)
+
+    offset   = np.zeros((len(rectangles), 2))
+    inserted = np.zeros(len(rectangles), dtype=bool)
+    free     = np.append([0.0, 0.0], sheet_size).reshape((1,4))
+    for index in order:
+        insert_location, free = insert_rectangle(free, rectangles[index])
+        if insert_location is not None:
+            offset[index]   = insert_location
             inserted[index] = True
-    
+
+    if not inserted.any():
+        return 0.0, offset[inserted], inserted, np.zeros(2)
+    area         = np.prod(rectangles[inserted], axis=1).sum()
     consumed_box = np.max((offset + rectangles)[inserted], axis=0)
-    density      = area / np.product(consumed_box) 
+    density      = area / np.prod(consumed_box) 
             
     return density, offset[inserted], inserted, consumed_box
+
+def _insert_order(rectangles, shuffle=False):
+    '''
+    Order to insert rectangles in, largest first with an optionally
+    shuffled section at the start.
+    '''
+    order = np.argsort(np.sum(rectangles**2, axis=1))[::-1]
+    if shuffle: 
+        shuffle_len = int(np.random.random()* len(rectangles)) - 1  
+        order[0:shuffle_len] = np.random.permutation(order[0:shuffle_len])
+    return order
+
+def _pack_job(args):
+    return pack_rectangles(*args)
   
 def pack_paths(paths, show=False):
     paths_full = deque()
@@ -136,11 +259,15 @@ def multipack(polygons,
               density_escape = .985,
               buffer_dist    = 0.09,
               plot           = False,
-              return_all     = False):
+              return_all     = False,
+              processes      = None):
     '''
     Run multiple iterations of rectangle packing, by randomly permutating the insertion order
 
     If sheet size isn't specified, it creates a large sheet that can fit all of the polygons
+
+    Iterations are run in a pool of processes, of size processes, or the number
+    of CPUs if None. If processes is 1 iterations are run in this process.
     '''
     transforms_obb, rectangles = polygons_obb(polygons)
     rectangles                += 2.0*buffer_dist
@@ -150,29 +277,42 @@ def multipack(polygons,
     tic             = time_function()  
     overall_density = 0
     
-    if sheet_size==None:
+    if sheet_size is None:
         max_dim    = np.max(rectangles, axis=0)
         sum_dim    = np.sum(rectangles, axis=0)
         sheet_size = [sum_dim[0], max_dim[1]*2]
 
     log.info('Packing %d polygons', len(polygons))
-    for i in range(iterations):
-        density, offset, inserted, sheet = pack_rectangles(rectangles, 
-                                                           sheet_size = sheet_size, 
-                                                           shuffle    = (i != 0))
-        if density > overall_density:
-            overall_density  = density
-            overall_offset   = offset
-            overall_inserted = inserted
-            overall_sheet    = sheet
-            if density > density_escape: break
+    jobs = ((rectangles, sheet_size, False, _insert_order(rectangles, i != 0))
+            for i in range(iterations))
+    pool = None
+    if processes != 1 and iterations > 1:
+        from multiprocessing import Pool
+        pool    = Pool(processes=processes)
+        results = pool.imap(_pack_job, jobs)
+    else:
+        results = map(_pack_job, jobs)
+
+    try:
+        for i, result in enumerate(results):
+            density, offset, inserted, sheet = result
+            if density > overall_density:
+                overall_density  = density
+                overall_offset   = offset
+                overall_inserted = inserted
+                overall_sheet    = sheet
+                if density > density_escape: break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
             
     toc = time_function()       
     log.info('Packing finished %i iterations in %f seconds', i+1, toc-tic)
     log.info('%i/%i parts were packed successfully', np.sum(overall_inserted), len(polygons))
     log.info('Final rectangular density is %f.', overall_density)
     
-    polygon_density = np.sum(polygon_area[overall_inserted])/np.product(overall_sheet)
+    polygon_density = np.sum(polygon_area[overall_inserted])/np.prod(overall_sheet)
     log.info('Final polygonal density is %f.', polygon_density)
 
     transforms_obb    = transforms_obb[overall_inserted]
@@ -193,10 +333,3 @@ def multipack(polygons,
                 rectangles[overall_inserted])
 
     return overall_inserted, transforms_packed
-
-class Packer:
-    def __init__(self, sheet_size=None):
-        pass
-
-    def add(self):
-        pass
@@ -0,0 +1,188 @@
+'''
+trimesh.proximity: closest point and distance queries against a mesh
+'''
+import numpy as np
+
+from .util      import Cache
+from .constants import tol
+from .triangles import closest_point, nondegenerate
+
+def nearest_vertex(mesh, points):
+    '''
+    Find the closest vertex of a mesh to each point.
+
+    Arguments
+    ----------
+    mesh:   Trimesh object
+    points: (n, 3) float, points in space
+
+    Returns
+    ----------
+    distance: (n,) float, distance from each point to the closest vertex
+    vertex_id: (n,) int, index of mesh.vertices of the closest vertex
+    '''
+    points = np.asanyarray(points, dtype=np.float64).reshape((-1, 3))
+    tree   = mesh.kdtree()
+    distance, vertex_id = tree.query(points)
+    return distance, vertex_id
+
+def closest_point_mesh(mesh,
+                       points,
+                       tree       = None,
+                       chunk_size = 2**16):
+    '''
+    Find the closest point on the surface of a mesh to a set of points.
+
+    The triangle tree is descended for every point at once with a search
+    radius that shrinks as closer triangles are found, so only triangles
+    near the surface point are ever evaluated, even for points deep inside
+    the mesh (see trimesh.bvh.BVH.query_nearest). Degenerate triangles 
+    have no well defined closest point so they are skipped, and 
+    (point, triangle) pairs are evaluated in chunks so memory is bounded
+    for large queries and for points equidistant from many triangles.
+
+    Arguments
+    ----------
+    mesh:       Trimesh object
+    points:     (n, 3) float, points in space
+    tree:       trimesh.bvh.BVH of mesh triangles, created if not passed
+    chunk_size: int, maximum number of (point, triangle) pairs 
+                to evaluate at once
+
+    Returns
+    ----------
+    closest:     (n, 3) float, closest point on the surface of mesh
+    distance:    (n,) float, distance from each point to closest
+    triangle_id: (n,) int, index of mesh.faces containing closest point
+    '''
+    points = np.asanyarray(points, dtype=np.float64).reshape((-1, 3))
+    if tree is None:
+        tree = mesh.triangles_tree(engine='bvh')
+    triangles = mesh.triangles
+    valid = nondegenerate(triangles)
+
+    closest     = np.zeros((len(points), 3), dtype=np.float64)
+    distance    = np.zeros(len(points),      dtype=np.float64)
+    triangle_id = np.zeros(len(points),      dtype=np.int64)
+
+    chunk_size = max(int(chunk_size), 1)
+    # every point reaches at least one leaf of candidate triangles
+    point_count = max(chunk_size // tree.leaf_size, 1)
+    for start in range(0, len(points), point_count):
+        chunk = points[start:start + point_count]
+
+        def triangle_distance(query, triangle):
+            result = np.zeros(len(query), dtype=np.float64)
+            for i in range(0, len(query), chunk_size):
+                pair = slice(i, i + chunk_size)
+                on_triangle = closest_point(triangles[triangle[pair]], 
+                                            chunk[query[pair]])
+                result[pair] = np.linalg.norm(on_triangle - chunk[query[pair]], 
+                                              axis=1)
+            return result
+
+        nearest, dist = tree.query_nearest(chunk, 
+                                           triangle_distance, 
+                                           mask = valid)
+        index = slice(start, start + len(chunk))
+        closest[index]     = closest_point(triangles[nearest], chunk)
+        # if every triangle is degenerate there is no closest point
+        closest[index][nearest < 0] = np.nan
+        distance[index]    = dist
+        triangle_id[index] = nearest
+
+    return closest, distance, triangle_id
+
+def signed_distance(mesh, points):
+    '''
+    Find the signed distance from a mesh to a set of points.
+
+    Points inside the mesh have a positive distance, and points
+    outside the mesh have a negative distance. The sign is only
+    meaningful for watertight meshes.
+
+    Arguments
+    ----------
+    mesh:   Trimesh object
+    points: (n, 3) float, points in space
+
+    Returns
+    ----------
+    signed_distance: (n,) float, signed distance from points to mesh
+    '''
+    points   = np.asanyarray(points, dtype=np.float64).reshape((-1, 3))
+    distance = mesh.nearest.on_surface(points)[1]
+
+    # points on the surface have no well defined inside or outside
+    # so only check containment for points off the surface
+    nonzero = distance > tol.merge
+    if nonzero.any():
+        inside = mesh.contains(points[nonzero])
+        distance[nonzero] *= (inside.astype(np.float64) * 2.0) - 1.0
+    return distance
+
+class ProximityQuery:
+    '''
+    Proximity queries for the current mesh.
+    '''
+    def __init__(self, mesh):
+        self._mesh  = mesh
+        self._cache = Cache(self._mesh.md5)
+
+    @property
+    def tree(self):
+        '''
+        A BVH of the triangles of the mesh, shared with the other queries.
+        '''
+        return self._mesh.triangles_bvh()
+
+    def on_surface(self, points):
+        '''
+        Given list of points, for each point find the closest point
+        on any triangle of the mesh.
+
+        Arguments
+        ----------
+        points: (n, 3) float, points in space
+
+        Returns
+        ----------
+        closest:     (n, 3) float, closest point on triangles for each point
+        distance:    (n,) float, distance
+        triangle_id: (n,) int, index of triangle containing closest point
+        '''
+        return closest_point_mesh(mesh   = self._mesh,
+                                  points = points,
+                                  tree   = self.tree)
+
+    def vertex(self, points):
+        '''
+        Given a set of points, return the closest vertex index to each point
+
+        Arguments
+        ----------
+        points: (n, 3) float, points in space
+
+        Returns
+        ----------
+        distance:  (n,) float, distance from source point to vertex
+        vertex_id: (n,) int, index of mesh.vertices which is closest
+        '''
+        return nearest_vertex(self._mesh, points)
+
+    def signed_distance(self, points):
+        '''
+        Find the signed distance from the mesh to a list of points.
+
+        Points inside the mesh have a positive distance, and points
+        outside the mesh have a negative distance.
+
+        Arguments
+        ----------
+        points: (n, 3) float, points in space
+
+        Returns
+        ----------
+        signed_distance: (n,) float, signed distance from points to mesh
+        '''
+        return signed_distance(self._mesh, points)
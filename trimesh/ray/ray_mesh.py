@@ -2,16 +2,23 @@ import numpy as np
 
 from ..util            import Cache, unitize
 from ..grouping        import unique_rows
-from ..intersections   import plane_lines
-from .ray_triangle_cpu import rays_triangles_id
+from .ray_triangle_cpu import rays_triangles_batch, candidates_to_pairs, offsets_to_sequence
 
 class RayMeshIntersector:
     '''
     An object to query a mesh for ray intersections. 
-    Precomputes an r-tree for each triangle on the mesh.
+    Precomputes a bounding box tree for each triangle on the mesh.
     '''
-    def __init__(self, mesh):
+    def __init__(self, mesh, engine=None):
+        '''
+        Arguments
+        ---------
+        mesh:   Trimesh object to query
+        engine: str, which tree to use for the broad phase,
+                'bvh' (or None) or 'rtree'
+        '''
         self.mesh   = mesh
+        self.engine = engine
         self._cache = Cache(self.mesh.md5)
 
     @property
@@ -20,7 +27,43 @@ class RayMeshIntersector:
             return self._cache.get('tree')
         else:
             return self._cache.set('tree',
-                                   self.mesh.triangles_tree())
+                                   self.mesh.triangles_tree(engine=self.engine),
+                                   evictable = True)
+
+    def intersects_batch(self, rays, return_any=False):
+        '''
+        Find every intersection between a set of rays and the mesh, 
+        returned as flat CSR- style arrays.
+
+        Arguments
+        ---------
+        rays:       (n, 2, 3) array of ray origins and directions
+        return_any: bool, stop evaluating after the first hit is found
+
+        Returns
+        ---------
+        offsets:      (n + 1,) int, hits of ray i are in 
+                      triangle_ids[offsets[i]:offsets[i+1]]
+        triangle_ids: (m,) int, index of faces hit, grouped by ray
+        t:            (m,) float, parametric distance along ray direction
+        barycentric:  (m, 3) float, barycentric coordinates of hits
+        '''
+        rays = np.array(rays, dtype=np.float64)
+        tree = self.tree
+        if hasattr(tree, 'query_rays'):
+            # the BVH can do the broad phase for every ray at once
+            ray_index, tri_index = tree.query_rays(origins    = rays[:,0,:],
+                                                   directions = rays[:,1,:])
+        else:
+            candidates = ray_triangle_candidates(rays = rays, 
+                                                 tree = tree)
+            ray_index, tri_index = candidates_to_pairs(candidates)
+        result = rays_triangles_batch(triangles      = self.mesh.triangles,
+                                      rays           = rays,
+                                      ray_index      = ray_index,
+                                      triangle_index = tri_index,
+                                      return_any     = return_any)
+        return result
 
     def intersects_id(self, rays, return_any=False):
         '''
@@ -34,13 +77,10 @@ class RayMeshIntersector:
         ---------        
         hits: (n) sequence of triangle indexes which hit the ray
         '''
-        rays       = np.array(rays, dtype=np.float)
-        candidates = ray_triangle_candidates(rays = rays, 
-                                             tree = self.tree)
-        hits  = rays_triangles_id(triangles      = self.mesh.triangles, 
-                                  rays           = rays, 
-                                  ray_candidates = candidates,
-                                  return_any     = return_any)
+        offsets, hit_id = self.intersects_batch(rays, return_any=return_any)[:2]
+        if return_any:
+            return len(hit_id) > 0
+        hits = offsets_to_sequence(hit_id, offsets)
         return hits
             
     def intersects_location(self, rays, return_id=False):
@@ -59,14 +99,13 @@ class RayMeshIntersector:
         locations: (n) sequence of (m,3) intersection points
         hits:      (n) list of face ids 
         '''
-        rays      = np.array(rays, dtype=np.float)
-        hits      = self.intersects_id(rays)
-        locations = ray_triangle_locations(triangles     = self.mesh.triangles,
-                                                  rays          = rays,
-                                                  intersections = hits,
-                                                  tri_normals   = self.mesh.face_normals)
+        rays = np.array(rays, dtype=np.float64)
+        offsets, hit_id, t = self.intersects_batch(rays)[:3]
+        locations = ray_triangle_locations(rays    = rays,
+                                           offsets = offsets,
+                                           t       = t)
         if return_id:
-            return locations, hits
+            return locations, offsets_to_sequence(hit_id, offsets)
         return locations
 
     def intersects_any_triangle(self, rays):
@@ -81,8 +120,8 @@ class RayMeshIntersector:
         ---------
         hits_any: (n) boolean array of whether or not each ray hit any triangle
         '''
-        hits     = self.intersects_id(rays)
-        hits_any = np.array([len(i) > 0 for i in hits])
+        offsets  = self.intersects_batch(rays)[0]
+        hits_any = np.diff(offsets) > 0
         return hits_any
 
     def intersects_any(self, rays):
@@ -143,8 +182,8 @@ def ray_bounds(rays, bounds, buffer_dist = 1e-5):
     # find the primary axis of the vector
     axis       = np.abs(ray_dir).argmax(axis=1)
     axis_bound = bounds.reshape((2,-1)).T[axis]
-    axis_ori   = np.array([ray_ori[i][a] for i, a in enumerate(axis)]).reshape((-1,1))
-    axis_dir   = np.array([ray_dir[i][a] for i, a in enumerate(axis)]).reshape((-1,1))
+    axis_ori   = ray_ori[np.arange(len(rays)), axis].reshape((-1,1))
+    axis_dir   = ray_dir[np.arange(len(rays)), axis].reshape((-1,1))
 
     # parametric equation of a line
     # point = direction*t + origin
@@ -176,50 +215,38 @@ def ray_bounds(rays, bounds, buffer_dist = 1e-5):
 
     return ray_bounding
 
-def ray_triangle_locations(triangles, 
-                           rays, 
-                           intersections, 
-                           tri_normals):
+def ray_triangle_locations(rays, 
+                           offsets,
+                           t):
     '''
-    Given a set of triangles, rays, and intersections between the two,
-    find the cartesian locations of the intersections points. 
+    Given a set of rays and CSR- style intersections between rays 
+    and triangles, find the unique cartesian locations of the 
+    intersection points for each ray. 
 
     Arguments
     ----------
-    triangles:     (n, 3, 3) set of triangle vertices
-    rays:          (m, 2, 3) set of ray origins/ray direction pairs
-    intersections: (m) sequence of intersection indidices which triangles
-                    each ray hits. 
+    rays:    (m, 2, 3) set of ray origins/ray direction pairs
+    offsets: (m + 1,) int, hits of ray i are t[offsets[i]:offsets[i+1]]
+    t:       (p,) float, parametric distance along ray of each hit
 
     Returns
     ----------
-    locations: (m) sequence of (p,3) cartesian points
+    locations: (m) sequence of (q,3) cartesian points
     '''
-    
-    ray_origin   = rays[:,0,:]
-    ray_vector   = rays[:,1,:]
-    ray_segments = np.array([ray_origin,
-                             ray_origin + ray_vector])
-    locations = [[]] * len(rays)
-
-    for r, tri_group in enumerate(intersections):
-        group_locations = np.zeros((len(tri_group), 3))
-        valid = np.zeros(len(tri_group), dtype=np.bool)
-        for i, tri_index in enumerate(tri_group):
-            origin  = triangles[tri_index][0]
-            normal  = tri_normals[tri_index]
-            segment = ray_segments[:,r,:].reshape((2,-1,3))
-            point, ok = plane_lines(plane_origin  = origin,
-                                   plane_normal  = normal,
-                                   endpoints     = segment,
-                                   line_segments = False)
-            if ok:
-                valid[i] = True
-                group_locations[i] = point
-        group_locations = group_locations[valid]
-        unique = unique_rows(group_locations)[0]
-        locations[r] = group_locations[unique]
-    return np.array(locations)
+    rays      = np.asanyarray(rays, dtype=np.float64)
+    ray_index = np.repeat(np.arange(len(rays)), np.diff(offsets))
+    points    = rays[:,0,:][ray_index] + (rays[:,1,:][ray_index] * 
+                                          np.reshape(t, (-1,1)))
+    if len(points) > 0:
+        # if a ray hits exactly on an edge it will have hit both triangles
+        # so remove duplicate locations on a per- ray basis
+        unique    = np.sort(unique_rows(np.column_stack((ray_index, points)))[0])
+        ray_index = ray_index[unique]
+        points    = points[unique]
+    counts  = np.bincount(ray_index, minlength=len(rays))
+    offsets = np.append(0, np.cumsum(counts))
+    locations = offsets_to_sequence(points, offsets)
+    return locations
 
 def contains_points(mesh, points):
     '''
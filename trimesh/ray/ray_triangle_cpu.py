@@ -29,24 +29,164 @@ def rays_triangles_id(triangles,
     else:
         intersections: (m) sequence of triangle indexes hit by rays
     '''
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    rays      = np.asanyarray(rays,      dtype=np.float64)
 
     # default set of candidate triangles to be queried 
     # is every triangle. this is very slow
-    candidates = np.ones(len(triangles), dtype=np.bool)
-    hits       = [None] * len(rays)
-
-    for ray_index, ray in enumerate(rays):
-        if not (ray_candidates is None):
-            candidates = ray_candidates[ray_index]
-        # query the triangle candidates
-        hit = ray_triangles(triangles[candidates], *ray)
+    if ray_candidates is None:
+        ray_index, tri_index = candidates_all(len(rays), len(triangles))
+    else:
+        ray_index, tri_index = candidates_to_pairs(ray_candidates)
+
+    offsets, hit_id, t, barycentric = rays_triangles_batch(triangles      = triangles,
+                                                            rays           = rays,
+                                                            ray_index      = ray_index,
+                                                            triangle_index = tri_index,
+                                                            return_any     = return_any)
+    if return_any:
+        return len(hit_id) > 0
+    return offsets_to_sequence(hit_id, offsets)
+
+def rays_triangles_batch(triangles,
+                         rays,
+                         ray_index,
+                         triangle_index,
+                         chunk_size = 2**16,
+                         return_any = False):
+    '''
+    Intersect rays and triangles for a flat list of candidate pairs.
+
+    Every (ray, triangle) pair is evaluated with the Moller-Trumbore 
+    algorithm in chunked vectorized operations, so there is no python 
+    loop over rays and memory use is bounded by chunk_size.
+
+    Arguments
+    ---------
+    triangles:      (n, 3, 3) float array of triangle vertices
+    rays:           (m, 2, 3) float array of ray origins, ray directions
+    ray_index:      (p,) int, which ray each candidate pair refers to
+    triangle_index: (p,) int, which triangle each candidate pair refers to
+    chunk_size:     int, maximum number of pairs evaluated at once
+    return_any:     bool, stop after the first chunk containing a hit
+
+    Returns
+    ---------
+    offsets:      (m + 1,) int, CSR offsets: the hits of ray i are 
+                  triangle_ids[offsets[i]:offsets[i+1]]
+    triangle_ids: (q,) int, index of triangles hit, grouped by ray
+    t:            (q,) float, distance along the ray direction vector
+                  where the hit occurred: location = origin + t * direction
+    barycentric:  (q, 3) float, barycentric coordinates of the hit
+    '''
+    triangles      = np.asanyarray(triangles, dtype=np.float64)
+    rays           = np.asanyarray(rays,      dtype=np.float64)
+    ray_index      = np.asanyarray(ray_index,      dtype=np.int64).reshape(-1)
+    triangle_index = np.asanyarray(triangle_index, dtype=np.int64).reshape(-1)
+
+    if len(ray_index) != len(triangle_index):
+        raise ValueError('Candidate pair arrays must be the same length!')
+
+    # the CSR output relies on pairs being grouped by ray
+    if len(ray_index) > 1 and (np.diff(ray_index) < 0).any():
+        order          = np.argsort(ray_index, kind='mergesort')
+        ray_index      = ray_index[order]
+        triangle_index = triangle_index[order]
+
+    hit_ray = []
+    hit_tri = []
+    hit_t   = []
+    hit_uv  = []
+
+    chunk_size = max(int(chunk_size), 1)
+    for start in range(0, len(ray_index), chunk_size):
+        chunk_ray = ray_index[start:start + chunk_size]
+        chunk_tri = triangle_index[start:start + chunk_size]
+
+        hit, t, u, v = ray_triangle_pairs(triangles     = triangles[chunk_tri],
+                                          ray_origins    = rays[:,0,:][chunk_ray],
+                                          ray_directions = rays[:,1,:][chunk_ray])
+        if not hit.any():
+            continue
+
+        hit_ray.append(chunk_ray[hit])
+        hit_tri.append(chunk_tri[hit])
+        hit_t.append(t)
+        hit_uv.append(np.column_stack((u, v)))
+
         if return_any:
-            if hit.any(): return True
-        else: 
-            hits[ray_index] = np.array(candidates)[hit]
+            break
+
+    if len(hit_ray) == 0:
+        return (np.zeros(len(rays) + 1, dtype=np.int64),
+                np.array([], dtype=np.int64),
+                np.array([], dtype=np.float64),
+                np.zeros((0,3), dtype=np.float64))
+
+    hit_ray = np.hstack(hit_ray)
+    hit_tri = np.hstack(hit_tri)
+    hit_t   = np.hstack(hit_t)
+    hit_uv  = np.vstack(hit_uv)
+
+    barycentric = np.column_stack((1.0 - hit_uv.sum(axis=1), hit_uv))
+
+    offsets = np.zeros(len(rays) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(hit_ray, minlength=len(rays)))
 
-    if return_any: return False
-    return np.array(hits)
+    return offsets, hit_tri, hit_t, barycentric
+
+def ray_triangle_pairs(triangles,
+                       ray_origins,
+                       ray_directions):
+    '''
+    Intersection of n triangles with n rays, pairwise.
+
+    Moller-Trumbore intersection algorithm, evaluated for 
+    every row at once.
+
+    Arguments
+    ---------
+    triangles:      (n, 3, 3) float, triangle vertices
+    ray_origins:    (n, 3) float, ray origin for each triangle
+    ray_directions: (n, 3) float, ray direction for each triangle
+
+    Returns
+    ---------
+    hit: (n,) bool, whether ray i hit triangle i
+    t:   (hit.sum(),) float, parametric distance along ray direction
+    u:   (hit.sum(),) float, barycentric coordinate of the second vertex
+    v:   (hit.sum(),) float, barycentric coordinate of the third vertex
+    '''
+    vert0 = triangles[:,0,:]
+    edge0 = triangles[:,1,:] - vert0
+    edge1 = triangles[:,2,:] - vert0
+
+    # P is a vector perpendicular to the ray direction and one
+    # triangle edge. 
+    P   = np.cross(ray_directions, edge1)
+    det = diagonal_dot(edge0, P)
+
+    # if determinant is near zero, ray lies in plane of triangle
+    valid = np.abs(det) > tol.zero
+    # avoid divide by zero warnings on rejected pairs
+    det[np.logical_not(valid)] = 1.0
+    inv_det = 1.0 / det
+
+    T = ray_origins - vert0
+    u = diagonal_dot(T, P) * inv_det
+
+    Q = np.cross(T, edge0)
+    v = diagonal_dot(ray_directions, Q) * inv_det
+    t = diagonal_dot(edge1, Q) * inv_det
+
+    hit = np.logical_and.reduce((valid,
+                                 u     >= -tol.zero,
+                                 u     <= (1 + tol.zero),
+                                 v     >= -tol.zero,
+                                 u + v <= (1 + tol.zero),
+                                 t     >  tol.zero))
+
+    return hit, t[hit], u[hit], v[hit]
 
 def ray_triangles(triangles, 
                   ray_origin, 
@@ -55,54 +195,78 @@ def ray_triangles(triangles,
     Intersection of multiple triangles and a single ray.
 
     Moller-Trumbore intersection algorithm.
+    
+    Arguments
+    ---------
+    triangles:     (n, 3, 3) float, triangle vertices
+    ray_origin:    (3,) float, origin of ray
+    ray_direction: (3,) float, direction of ray
+
+    Returns
+    ---------
+    hit: (n,) bool, whether ray hit each triangle
     '''
-    candidates = np.ones(len(triangles), dtype=np.bool)
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    shape     = (len(triangles), 3)
+    hit = ray_triangle_pairs(triangles      = triangles,
+                             ray_origins    = np.broadcast_to(ray_origin,    shape),
+                             ray_directions = np.broadcast_to(ray_direction, shape))[0]
+    return hit
 
-    # edge vectors and vertex locations in (n,3) format
-    vert0 = triangles[:,0,:]
-    vert1 = triangles[:,1,:]
-    vert2 = triangles[:,2,:]
-    edge0 = vert1 - vert0
-    edge1 = vert2 - vert0
+def candidates_to_pairs(ray_candidates):
+    '''
+    Convert a per- ray sequence of candidate triangles into 
+    flat (ray, triangle) pair arrays.
 
-    #P is a vector perpendicular to the ray direction and one
-    # triangle edge. 
-    P = np.cross(ray_direction, edge1)
+    Arguments
+    ---------
+    ray_candidates: (m) sequence of int triangle indexes
 
-    #if determinant is near zero, ray lies in plane of triangle
-    det = diagonal_dot(edge0, P)
-    candidates[np.abs(det) < tol.zero] = False
-
-    if not candidates.any(): 
-        return candidates
-    # remove previously calculated terms which are no longer candidates
-    inv_det = 1.0 / det[candidates]
-    T       = ray_origin - vert0[candidates]
-    u       = diagonal_dot(T, P[candidates]) * inv_det
-
-    new_candidates = np.logical_not(np.logical_or(u < -tol.zero,
-                                                  u > (1+tol.zero)))
-    candidates[candidates] = new_candidates
-    if not candidates.any(): 
-        return candidates    
-    inv_det = inv_det[new_candidates]
-    T       = T[new_candidates]
-    u       = u[new_candidates]
-
-    Q = np.cross(T, edge0[candidates])
-    v = np.dot(ray_direction, Q.T) * inv_det
-
-    new_candidates = np.logical_not(np.logical_or((v     <  -tol.zero),
-                                                  (u + v > (1+tol.zero))))
-
-    candidates[candidates] = new_candidates
-    if not candidates.any(): 
-        return candidates
-
-    Q = Q[new_candidates]
-    inv_det = inv_det[new_candidates]
-    
-    t = diagonal_dot(edge1[candidates], Q) * inv_det
-    candidates[candidates] = t > tol.zero
+    Returns
+    ---------
+    ray_index:      (p,) int, ray index of each pair
+    triangle_index: (p,) int, triangle index of each pair
+    '''
+    counts = np.array([len(i) for i in ray_candidates], dtype=np.int64)
+    ray_index = np.repeat(np.arange(len(counts)), counts)
+    if counts.sum() == 0:
+        return ray_index, np.array([], dtype=np.int64)
+    triangle_index = np.hstack([np.asanyarray(i, dtype=np.int64).reshape(-1) 
+                                for i in ray_candidates])
+    return ray_index, triangle_index
+
+def candidates_all(ray_count, triangle_count):
+    '''
+    Every ray paired with every triangle.
+
+    Arguments
+    ---------
+    ray_count:      int, number of rays
+    triangle_count: int, number of triangles
 
-    return candidates
+    Returns
+    ---------
+    ray_index:      (ray_count * triangle_count,) int
+    triangle_index: (ray_count * triangle_count,) int
+    '''
+    ray_index      = np.repeat(np.arange(ray_count), triangle_count)
+    triangle_index = np.tile(np.arange(triangle_count), ray_count)
+    return ray_index, triangle_index
+
+def offsets_to_sequence(values, offsets):
+    '''
+    Split a flat array into a sequence using CSR offsets.
+
+    Arguments
+    ---------
+    values:  (q, *) array
+    offsets: (m + 1,) int, start of each group in values
+
+    Returns
+    ---------
+    sequence: (m,) object array, where each element is an array
+    '''
+    sequence = np.empty(len(offsets) - 1, dtype=object)
+    for i, group in enumerate(np.split(values, offsets[1:-1])):
+        sequence[i] = group
+    return sequence
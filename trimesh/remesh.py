@@ -54,3 +54,140 @@ def subdivide(mesh, face_index=None):
     mesh.faces = new_faces
  
  
+
+def subdivide_to_size(vertices, faces, max_edge, max_iter=10):
+    '''
+    Subdivide a mesh until every edge is shorter than max_edge.
+
+    Every pass splits each edge longer than max_edge at its midpoint, 
+    and replaces the faces including split edges with 2, 3 or 4 faces. 
+    As edges are split rather than faces, a midpoint is shared by both 
+    faces including the edge and the mesh stays watertight.
+
+    Arguments
+    ----------
+    vertices: (n,3) float, vertices of mesh
+    faces:    (m,3) int, faces of mesh
+    max_edge: float, maximum length of any edge in the result
+    max_iter: int, maximum number of passes 
+
+    Returns
+    ----------
+    vertices: (p,3) float, vertices of subdivided mesh, starting 
+              with the original vertices
+    faces:    (q,3) int, faces of subdivided mesh
+    '''
+    vertices = np.array(vertices, dtype=np.float64)
+    faces    = np.array(faces, dtype=np.int64)
+
+    for iteration in range(max_iter):
+        # the index of every face edge in a set of unique edges, 
+        # where face edge j runs from vertex j to vertex j+1
+        edges = np.sort(faces[:,[0,1,1,2,2,0]].reshape((-1,2)), axis=1)
+        keys  = edges[:,0] * len(vertices) + edges[:,1]
+        unique, index, inverse = np.unique(keys, 
+                                           return_index   = True, 
+                                           return_inverse = True)
+        edges_unique = edges[index]
+        faces_edges  = inverse.reshape((-1,3))
+
+        length = ((vertices[edges_unique[:,0]] - 
+                   vertices[edges_unique[:,1]]) ** 2).sum(axis=1)
+        split  = length > max_edge ** 2
+        if not split.any():
+            break
+
+        # every split edge gets exactly one new vertex at its midpoint
+        midpoint = np.zeros(len(edges_unique), dtype=np.int64)
+        midpoint[split] = np.arange(split.sum()) + len(vertices)
+        vertices = np.vstack((vertices, 
+                              vertices[edges_unique[split]].mean(axis=1)))
+
+        face_split = split[faces_edges]
+        case = np.dot(face_split, [1, 2, 4])
+        faces_new = [faces[case == 0]]
+
+        for count in [1, 2, 3]:
+            mask = face_split.sum(axis=1) == count
+            if not mask.any():
+                continue
+            # rotate faces so the split edges are in the same position:
+            # one split edge is edge 0, two split edges are edges 0 and 1
+            roll = _ROLL[case[mask]]
+            order = (np.arange(3) + roll.reshape((-1,1))) % 3
+            v = np.take_along_axis(faces[mask], order, axis=1)
+            m = np.take_along_axis(midpoint[faces_edges[mask]], order, axis=1)
+
+            if count == 1:
+                faces_new.append(np.column_stack((v[:,0], m[:,0], v[:,2],
+                                                  m[:,0], v[:,1], v[:,2])))
+            elif count == 2:
+                # the corner triangle, and the remaining quad split 
+                # along its shorter diagonal
+                diagonal = (((vertices[v[:,0]] - vertices[m[:,1]]) ** 2).sum(axis=1) < 
+                            ((vertices[m[:,0]] - vertices[v[:,2]]) ** 2).sum(axis=1))
+                a = np.column_stack((v[:,0], m[:,0], m[:,1], 
+                                     v[:,0], m[:,1], v[:,2]))
+                b = np.column_stack((v[:,0], m[:,0], v[:,2],
+                                     m[:,0], m[:,1], v[:,2]))
+                faces_new.append(np.column_stack((m[:,0], v[:,1], m[:,1])))
+                faces_new.append(np.where(diagonal.reshape((-1,1)), a, b))
+            else:
+                faces_new.append(np.column_stack((v[:,0], m[:,0], m[:,2],
+                                                  m[:,0], v[:,1], m[:,1],
+                                                  m[:,2], m[:,1], v[:,2],
+                                                  m[:,0], m[:,1], m[:,2])))
+        faces = np.vstack([i.reshape((-1,3)) for i in faces_new])
+    return vertices, faces
+
+# for every combination of split edges (bit j set if edge j is split)
+# how far to rotate a face to put its split edges in a known position
+_ROLL = np.array([0, 0, 1, 0, 2, 2, 1, 0], dtype=np.int64)
+
+def decimate_clustering(vertices, faces, pitch):
+    '''
+    Reduce the number of faces of a mesh by merging all vertices 
+    in each cube of a grid into one vertex at their mean.
+
+    Faces which collapse to a line or point, or which duplicate 
+    another face, are removed. This is fast but doesn't preserve 
+    topology, so it is mostly useful for displaying large meshes.
+
+    Arguments
+    ----------
+    vertices: (n,3) float, vertices of mesh
+    faces:    (m,3) int, faces of mesh
+    pitch:    float, edge length of grid cubes
+
+    Returns
+    ----------
+    vertices:   (p,3) float, vertices of decimated mesh
+    faces:      (q,3) int, faces of decimated mesh
+    face_index: (q) int, index of original face for every face
+    '''
+    vertices = np.asanyarray(vertices, dtype=np.float64)
+    faces    = np.asanyarray(faces, dtype=np.int64)
+
+    cells = np.floor((vertices - vertices.min(axis=0)) / pitch).astype(np.int64)
+    unique, inverse = unique_rows(cells)
+
+    # the mean of the vertices in each cell
+    counts  = np.bincount(inverse, minlength=len(unique)).astype(np.float64)
+    merged  = np.column_stack([np.bincount(inverse, 
+                                           weights   = vertices[:,i], 
+                                           minlength = len(unique)) 
+                               for i in range(3)]) / counts.reshape((-1,1))
+
+    faces = inverse[faces]
+    face_index = np.nonzero((faces[:,0] != faces[:,1]) & 
+                            (faces[:,1] != faces[:,2]) & 
+                            (faces[:,2] != faces[:,0]))[0]
+    # faces with the same vertices in any order are duplicates
+    face_index = face_index[unique_rows(np.sort(faces[face_index], axis=1))[0]]
+    face_index.sort()
+
+    # remove vertices which aren't used by a face
+    used = np.zeros(len(merged), dtype=bool)
+    used[faces[face_index]] = True
+    mask = np.cumsum(used) - 1
+    return merged[used], mask[faces[face_index]], face_index
@@ -2,7 +2,8 @@ import numpy as np
 import networkx as nx
 from collections import deque
 
-from .geometry  import faces_to_edges
+from . import graph
+
 from .grouping  import group_rows
 from .triangles import normals
 from .util      import is_sequence
@@ -17,39 +18,41 @@ def fix_face_winding(mesh):
     if mesh.is_winding_consistent:
         log.info('mesh has consistent winding, exiting winding repair')
         return
-    
-    # we create the face adjacency graph: 
-    # every node in g is an index of mesh.faces
-    # every edge in g represents two faces which are connected
-    graph_all = nx.from_edgelist(mesh.face_adjacency)
-    flipped   = 0
-    faces = mesh.faces.view(np.ndarray).copy()
-
-    # we are going to traverse the graph using BFS, so we have to start
-    # a traversal for every connected component
-    for graph in nx.connected_component_subgraphs(graph_all):
-        start = graph.nodes()[0]
-        # we traverse every pair of faces in the graph
-        # we modify mesh.faces and mesh.face_normals in place 
-        for face_pair in nx.bfs_edges(graph, start):
-            # for each pair of faces, we convert them into edges,
-            # find the edge that both faces share, and then see if the edges
-            # are reversed in order as you would expect in a well constructed mesh
-            face_pair = np.ravel(face_pair)
-            pair    = faces[face_pair]
-            edges   = faces_to_edges(pair)
-            overlap = group_rows(np.sort(edges,axis=1), require_count=2)
-            if len(overlap) == 0:
-                # only happens on non-watertight meshes
-                continue
-            edge_pair = edges[[overlap[0]]]
-            if edge_pair[0][0] == edge_pair[1][0]:
-                # if the edges aren't reversed, invert the order of one of the faces
-                flipped += 1
-                faces[face_pair[1]] = faces[face_pair[1]][::-1]
-    if flipped > 0: 
+
+    faces     = mesh.faces.view(np.ndarray).copy()
+    adjacency = mesh.face_adjacency
+    shared    = mesh.face_adjacency_edges
+
+    # adjacent faces which traverse their shared edge in the same direction
+    # need to be wound in opposite directions to be coherent
+    rolled  = np.roll(faces, -1, axis=1)
+    forward = [((faces[pair] == shared[:,:1]) & 
+                (rolled[pair] == shared[:,1:])).any(axis=1) 
+               for pair in adjacency.T]
+    same    = (forward[0] == forward[1]).astype(np.int64)
+
+    # rather than traversing the face adjacency graph, we find connected 
+    # components of a graph with two nodes per face, face + (count * flipped), 
+    # where adjacent faces are connected with the relative flip they need.
+    # every component of the mesh which can be wound coherently is then 
+    # two components, one for each of the two coherent windings
+    count = len(faces)
+    edges = np.vstack((np.column_stack((adjacency[:,0], 
+                                        adjacency[:,1] + count * same)),
+                       np.column_stack((adjacency[:,0] + count, 
+                                        adjacency[:,1] + count * (1 - same)))))
+    labels = graph.connected_component_labels(edges, node_count=count*2)
+    kept, flipped = labels[:count], labels[count:]
+
+    # pick the winding which flips fewer faces, 
+    # faces without a coherent winding are left alone
+    unchanged = np.bincount(kept, minlength=count*2)
+    flip = ((unchanged[flipped] > unchanged[kept]) | 
+            ((unchanged[flipped] == unchanged[kept]) & (flipped > kept)))
+    if flip.any():
+        faces[flip] = faces[flip][:,::-1]
         mesh.faces = faces
-    log.info('Flipped %d/%d edges', flipped, len(mesh.faces)*3)
+    log.info('Flipped %d/%d faces', flip.sum(), len(mesh.faces))
 
 def fix_normals_direction(mesh):
     '''
@@ -64,7 +67,9 @@ def fix_normals_direction(mesh):
     # test point
     origin  = mesh.triangles[0].mean(axis=0)
     origin += direction * tol.merge 
-    flipped = mesh.contains([origin])[0]
+    # ray tests are used as winding numbers are negative inside
+    # a mesh with backwards normals, which would never be contained
+    flipped = mesh.contains([origin], engine='ray')[0]
 
     if flipped:
         log.debug('Flipping face normals and winding')
@@ -97,44 +102,26 @@ def broken_faces(mesh, color=None):
         mesh.visual.face_colors[broken] = color
     return broken
 
-def fill_holes(mesh):
+def fill_holes(mesh, engine=None):
     '''
-    Fill single- triangle holes on triangular meshes by adding new triangles
-    to fill the holes. New triangles will have proper winding and normals, 
-    and if face colors exist the color of the last face will be assigned
-    to the new triangles. 
+    Fill holes on triangular meshes by adding new triangles to fill the 
+    holes. New triangles will have proper winding and normals, and if face 
+    colors exist the color of the last face will be assigned to the new 
+    triangles. 
     
     Arguments
     ---------
-    mesh: Trimesh object
-    '''
-
-    def hole_to_faces(hole):
-        '''
-        Given a loop of vertex indices  representing a hole, turn it into 
-        triangular faces.
-        If unable to do so, return None
-
-        Arguments
-        ---------
-        hole:     ordered loop of vertex indices
-
-        Returns
-        ---------
-        (n, 3) new faces 
-        (m, 3) new vertices
-        '''
-        hole = np.asanyarray(hole)
-        # the case where the hole is just a single missing triangle
-        if len(hole) == 3: 
-            return [hole], []
-        # the hole is a quad, which we fill with two triangles
-        if len(hole) == 4: 
-            face_A = hole[[0,1,2]]
-            face_B = hole[[2,3,0]]
-            return [face_A, face_B], []       
-        return [], []
+    mesh:   Trimesh object
+    engine: str, how to find and fill holes:
+            'loops' (or None) orders boundary edges into loops with 
+                    vectorized operations and fills holes of any size
+            'networkx' finds cycles of boundary edges with networkx 
+                    and only fills holes of 3 and 4 vertices
 
+    Returns
+    ---------
+    watertight: bool, is the mesh watertight after filling
+    '''
     if len(mesh.faces) < 3:
         return False
 
@@ -149,29 +136,17 @@ def fill_holes(mesh):
         watertight = len(boundary_groups) == 0
         return watertight
 
-    boundary_edges  = edges[boundary_groups]
-    index_as_dict   = [{'index': i} for i in boundary_groups]
-
-    # we create a graph of the boundary edges, and find cycles.
-    graph  = nx.from_edgelist(np.column_stack((boundary_edges, index_as_dict)))
-    cycles = np.array(nx.cycle_basis(graph))
-
-    new_faces  = deque()
-    new_vertex = deque()
-    for hole in cycles:
-        # convert the hole, which is a polygon of vertex indices
-        # to triangles and new vertices
-        faces, vertex = hole_to_faces(hole = hole)
-        if len(faces) == 0:
-            continue
-        # remeshing returns new vertices as negative indices, so change those
-        # to absolute indices which won't be screwed up by the later appends
-        faces = np.array(faces)
-        faces[faces < 0] += len(new_vertex) + len(mesh.vertices) + len(vertex) 
-        new_vertex.extend(vertex)
-        new_faces.extend(faces)
-    new_faces  = np.array(new_faces)
-    new_vertex = np.array(new_vertex)
+    if engine in [None, 'loops']:
+        # the faces filling a hole have the boundary edges reversed
+        loops, loop_id = boundary_loops(edges[boundary_groups][:,::-1])
+        new_faces = triangulate_loops(mesh.vertices.view(np.ndarray), 
+                                      loops, 
+                                      loop_id,
+                                      edges = edges)
+    elif engine == 'networkx':
+        new_faces = _hole_faces_networkx(edges, boundary_groups)
+    else:
+        raise ValueError('fill_holes engine {} is not available!'.format(engine))
 
     if len(new_faces) == 0: 
         # no new faces have been added, so nothing further to do
@@ -179,33 +154,12 @@ def fill_holes(mesh):
         # but we didn't add any new faces to fill them in
         return False
 
-    for face_index, face in enumerate(new_faces):
-        # we compare the edge from the new face with 
-        # the boundary edge from the source mesh
-        edge_test     = face[0:2]
-        edge_boundary = edges[graph.get_edge_data(*edge_test)['index']]
-        
-        # in a well construced mesh, the winding is such that adjacent triangles
-        # have reversed edges to each other. Here we check to make sure the 
-        # edges are reversed, and if they aren't we simply reverse the face
-        reversed = edge_test[0] == edge_boundary[1]
-        if not reversed:
-            new_faces[face_index] = face[::-1]
-
-
-
-    if len(new_vertex) != 0:
-        new_vertices = np.vstack((mesh.vertices, new_vertex))
-    else:
-        new_vertices = mesh.vertices
-
     # since the winding is now correct, we can get consistant normals
     # just by doing the cross products on the face edges 
     mesh._cache.clear(exclude=['face_normals'])
-    new_normals, valid = normals(new_vertices[new_faces])
+    new_normals, valid = normals(mesh.vertices[new_faces])
     mesh.face_normals = np.vstack((mesh.face_normals, new_normals))
     mesh.faces        = np.vstack((mesh._data['faces'], new_faces[valid]))
-    mesh.vertices     = new_vertices
     mesh._cache.id_set()
 
     # this is usually the case where two vertices of a triangle are just
@@ -226,4 +180,366 @@ def fill_holes(mesh):
     
     log.debug('Filled in mesh with %i triangles', np.sum(valid))
     return mesh.is_watertight
-    
+
+def boundary_loops(edges):
+    '''
+    Order directed edges into closed loops, without a per- edge loop.
+
+    Where a vertex has several edges leaving it (two holes touching at a
+    vertex) they are paired with the edges arriving at it arbitrarily.
+    Edges on vertices with a different number of edges arriving and 
+    leaving can't be part of a closed loop and are discarded.
+
+    Arguments
+    ---------
+    edges: (n,2) int, directed edges, each loop in a consistent direction
+
+    Returns
+    ---------
+    loops:   (m,) int, vertex indices of every loop, in order
+    loop_id: (m,) int, index of the loop each vertex belongs to, 
+             sorted so each loop is contiguous
+    '''
+    edges = np.asanyarray(edges, dtype=np.int64).reshape((-1,2))
+    if len(edges) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # discard edges until every vertex has as many edges leaving as arriving
+    count = edges.max() + 1
+    while len(edges) > 0:
+        balance = (np.bincount(edges[:,0], minlength=count) - 
+                   np.bincount(edges[:,1], minlength=count))
+        keep = (balance[edges] == 0).all(axis=1)
+        if keep.all():
+            break
+        edges = edges[keep]
+    if len(edges) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # the k-th edge arriving at a vertex is followed by the k-th leaving it
+    following = np.zeros(len(edges), dtype=np.int64)
+    following[np.argsort(edges[:,1], kind='mergesort')] = np.argsort(edges[:,0], 
+                                                                     kind='mergesort')
+
+    # label every edge with the smallest edge index in its loop by pointer
+    # jumping, which takes log2 of the longest loop iterations
+    index = np.arange(len(edges))
+    label = index.copy()
+    jump  = following.copy()
+    while True:
+        lower = np.minimum(label, label[jump])
+        if (lower == label).all():
+            break
+        label = lower
+        jump  = jump[jump]
+
+    # rank edges by their distance to the end of their loop, 
+    # where loops are broken before the smallest edge index
+    previous = np.zeros(len(edges), dtype=np.int64)
+    previous[following] = index
+    tail = previous[label]
+    distance = (index != tail).astype(np.int64)
+    jump = following.copy()
+    jump[tail] = tail
+    while True:
+        ahead = jump[jump]
+        if (ahead == jump).all():
+            break
+        distance += distance[jump]
+        jump = ahead
+
+    order   = np.lexsort((-distance, label))
+    loop_id = np.unique(label[order], return_inverse=True)[1].reshape(-1)
+    loops   = edges[order][:,0]
+
+    # loops which pass through a vertex more than once are split into
+    # loops which don't, which is rare enough to do one loop at a time
+    key = loop_id * count + loops
+    unique, inverse, counts = np.unique(key, 
+                                        return_inverse = True, 
+                                        return_counts  = True)
+    pinched = np.zeros(loop_id.max() + 1, dtype=bool)
+    pinched[loop_id[counts[inverse.reshape(-1)] > 1]] = True
+    if pinched.any():
+        split = deque()
+        for index in np.nonzero(pinched)[0]:
+            split.extend(_split_loop(loops[loop_id == index]))
+        keep    = ~pinched[loop_id]
+        lengths = np.append(np.bincount(loop_id[keep]), [len(i) for i in split])
+        lengths = lengths[lengths > 0]
+        loops   = np.concatenate([loops[keep]] + list(split))
+        loop_id = np.repeat(np.arange(len(lengths)), lengths)
+    return loops, loop_id
+
+def _split_loop(loop):
+    '''
+    Split a closed loop which visits vertices more than once 
+    into loops which visit every vertex once.
+
+    Arguments
+    ---------
+    loop: (n,) int, vertex indices
+
+    Returns
+    ---------
+    split: list of (m,) int, vertex indices of each loop
+    '''
+    split = deque()
+    stack = deque()
+    index = {}
+    for vertex in loop:
+        if vertex in index:
+            start = index[vertex]
+            split.append(np.array(list(stack)[start:], dtype=np.int64))
+            for i in range(len(stack) - start - 1):
+                del index[stack.pop()]
+        else:
+            index[vertex] = len(stack)
+            stack.append(vertex)
+    split.append(np.array(stack, dtype=np.int64))
+    return list(split)
+
+def triangulate_loops(vertices, loops, loop_id, edges=None):
+    '''
+    Triangulate closed loops of vertices by clipping ears.
+
+    Every loop is clipped at the same time: each round removes every 
+    other convex vertex whose ear contains no other vertex of its loop,
+    (or the most convex vertex if none are), so the number of rounds 
+    grows with the log of the longest loop for holes which are roughly
+    convex. Faces have the winding of the loops.
+
+    Arguments
+    ---------
+    vertices: (n,3) float, vertex positions
+    loops:    (m,) int, vertex indices of every loop, in order
+    loop_id:  (m,) int, index of loop for each vertex, contiguous
+    edges:    (p,2) int, existing edges which ears shouldn't close with,
+              so a face with two edges on a hole isn't duplicated
+
+    Returns
+    ---------
+    faces: (p,3) int, triangles filling the loops
+    '''
+    vertices = np.asanyarray(vertices, dtype=np.float64)
+    loops    = np.asanyarray(loops, dtype=np.int64)
+    loop_id  = np.asanyarray(loop_id, dtype=np.int64)
+
+    # the normal of every loop with Newell's method, which points 
+    # along the direction convex vertices wind around 
+    points  = vertices[loops]
+    cyclic  = _cyclic(loop_id)
+    normal  = np.zeros((loop_id.max() + 1 if len(loop_id) else 0, 3))
+    np.add.at(normal, loop_id, np.cross(points, points[cyclic[1]]))
+
+    # existing edges as sorted integer keys, and edges added by clipping
+    existing = np.zeros(0, dtype=np.int64)
+    if edges is not None:
+        existing = np.unique(_edge_keys(edges, len(vertices)))
+    added = np.zeros(0, dtype=np.int64)
+
+    faces = deque()
+    while len(loops) >= 3:
+        cyclic = _cyclic(loop_id)
+        length = cyclic[2]
+        # loops of 3 vertices are a single triangle
+        last = length == 3
+        if last.any():
+            first = np.nonzero(last & (cyclic[3] == 0))[0]
+            faces.append(loops[np.column_stack((first, first + 1, first + 2))])
+
+        points = vertices[loops]
+        score  = (np.cross(points - points[cyclic[0]], 
+                           points[cyclic[1]] - points) * 
+                  normal[loop_id]).sum(axis=1)
+        # ears containing another vertex of a concave loop would overlap 
+        score[_ears_blocked(points, loop_id, loops, cyclic, score, normal)] = -np.inf
+
+        # every other convex vertex can be clipped at once 
+        # ears closing with an existing edge are clipped last
+        closing = _edge_keys(np.column_stack((loops[cyclic[0]], 
+                                              loops[cyclic[1]])), 
+                             len(vertices))
+        score[_contains(existing, closing) | _contains(added, closing)] = -np.inf
+        clip = (score > 0.0) & (cyclic[3] % 2 == 1) & (length > 3)
+
+        # loops without one clip their most convex vertex 
+        stuck = np.ones(len(normal), dtype=bool)
+        stuck[loop_id[clip]] = False
+        stuck = stuck[loop_id] & (length > 3)
+        if stuck.any():
+            candidates = np.nonzero(stuck)[0]
+            best = candidates[np.lexsort((-score[candidates], 
+                                          loop_id[candidates]))]
+            best = best[np.concatenate(([True], 
+                                        np.diff(loop_id[best]) != 0))]
+            clip[best] = True
+
+        # two loops touching at two vertices can close the same edge
+        clipped = np.nonzero(clip)[0]
+        clip[clipped] = False
+        clip[clipped[np.unique(closing[clipped], return_index=True)[1]]] = True
+
+        faces.append(loops[np.column_stack((cyclic[0][clip], 
+                                            np.nonzero(clip)[0], 
+                                            cyclic[1][clip]))])
+        added = np.union1d(added, closing[clip])
+        # remove clipped vertices, and loops which are now triangulated
+        keep = ~clip & ~last
+        remain = np.bincount(loop_id[keep], minlength=len(normal))
+        keep &= remain[loop_id] >= 3
+        loops   = loops[keep]
+        loop_id = loop_id[keep]
+
+    if len(faces) == 0:
+        return np.zeros((0,3), dtype=np.int64)
+    return np.vstack(faces)
+
+def _ears_blocked(points, loop_id, loops, cyclic, score, normal):
+    '''
+    Find which convex vertices have an ear containing a vertex of 
+    their loop, which may only be a vertex that isn't convex.
+
+    Arguments
+    ---------
+    points:  (n,3) float, position of every loop vertex
+    loop_id: (n,) int, index of loop for each vertex
+    loops:   (n,) int, vertex index of every loop vertex
+    cyclic:  result of _cyclic(loop_id)
+    score:   (n,) float, convexity of every vertex, positive if convex
+    normal:  (m,3) float, normal of every loop
+
+    Returns
+    ---------
+    blocked: (n,) bool, convex vertices which can't be clipped
+    '''
+    blocked = np.zeros(len(loop_id), dtype=bool)
+    ear     = np.nonzero((score > 0.0) & (cyclic[2] > 3))[0]
+    reflex  = np.nonzero(score <= 0.0)[0]
+    if len(ear) == 0 or len(reflex) == 0:
+        return blocked
+
+    # pair every ear with every vertex that isn't convex in its loop
+    low   = np.searchsorted(loop_id[reflex], loop_id[ear], side='left')
+    count = np.searchsorted(loop_id[reflex], loop_id[ear], side='right') - low
+    owner = np.repeat(ear, count)
+    other = reflex[np.repeat(low - np.cumsum(count) + count, count) + 
+                   np.arange(count.sum())]
+
+    # the corners of every ear, and vertices shared with the ear
+    corners = np.column_stack((cyclic[0][owner], owner, cyclic[1][owner]))
+    shared  = (loops[corners] == loops[other].reshape((-1,1))).any(axis=1)
+
+    # a point is inside if it is on the inner side of every edge
+    # in the plane of the loop, including points on the edges 
+    inside = np.logical_not(shared)
+    for a, b in [(0, 1), (1, 2), (2, 0)]:
+        side = (np.cross(points[corners[:,b]] - points[corners[:,a]],
+                         points[other] - points[corners[:,a]]) * 
+                normal[loop_id[owner]]).sum(axis=1)
+        inside &= side >= 0.0
+    blocked[owner[inside]] = True
+    return blocked
+
+def _edge_keys(edges, count):
+    '''
+    A unique integer for every undirected edge.
+    '''
+    edges = np.sort(np.asanyarray(edges, dtype=np.int64), axis=1)
+    return edges[:,0] * count + edges[:,1]
+
+def _contains(keys, values):
+    '''
+    Which values are in a sorted array of keys.
+    '''
+    if len(keys) == 0:
+        return np.zeros(len(values), dtype=bool)
+    found = np.searchsorted(keys, values).clip(0, len(keys) - 1)
+    return keys[found] == values
+
+def _cyclic(loop_id):
+    '''
+    Neighbors of every element in flat, contiguous loops.
+
+    Returns
+    ---------
+    previous: (n,) int, index of previous element in the loop
+    following:(n,) int, index of next element in the loop
+    length:   (n,) int, length of the loop each element is in
+    position: (n,) int, position of each element in its loop
+    '''
+    index  = np.arange(len(loop_id))
+    start  = np.concatenate(([True], np.diff(loop_id) != 0))
+    first  = np.maximum.accumulate(np.where(start, index, 0))
+    counts = np.diff(np.append(np.nonzero(start)[0], len(loop_id)))
+    length = np.repeat(counts, counts)
+    position  = index - first
+    following = np.where(position == length - 1, first, index + 1)
+    previous  = np.where(position == 0, first + length - 1, index - 1)
+    return previous, following, length, position
+
+def _hole_faces_networkx(edges, boundary_groups):
+    '''
+    Find cycles of boundary edges with networkx and fill the ones 
+    with 3 or 4 vertices.
+
+    Arguments
+    ---------
+    edges:           (n,2) int, edges of every face
+    boundary_groups: (m,) int, index of edges which are only included once
+
+    Returns
+    ---------
+    new_faces: (p,3) int, faces filling holes
+    '''
+    def hole_to_faces(hole):
+        '''
+        Given a loop of vertex indices  representing a hole, turn it into 
+        triangular faces.
+        If unable to do so, return an empty list
+
+        Arguments
+        ---------
+        hole:     ordered loop of vertex indices
+
+        Returns
+        ---------
+        (n, 3) new faces 
+        '''
+        hole = np.asanyarray(hole)
+        # the case where the hole is just a single missing triangle
+        if len(hole) == 3: 
+            return [hole]
+        # the hole is a quad, which we fill with two triangles
+        if len(hole) == 4: 
+            face_A = hole[[0,1,2]]
+            face_B = hole[[2,3,0]]
+            return [face_A, face_B]
+        return []
+
+    boundary_edges  = edges[boundary_groups]
+    index_as_dict   = [{'index': i} for i in boundary_groups]
+
+    # we create a graph of the boundary edges, and find cycles.
+    graph  = nx.from_edgelist(np.column_stack((boundary_edges, index_as_dict)))
+    cycles = nx.cycle_basis(graph)
+
+    new_faces = deque()
+    for hole in cycles:
+        # convert the hole, which is a polygon of vertex indices to triangles
+        new_faces.extend(hole_to_faces(hole = hole))
+    new_faces = np.array(new_faces, dtype=np.int64).reshape((-1,3))
+
+    for face_index, face in enumerate(new_faces):
+        # we compare the edge from the new face with 
+        # the boundary edge from the source mesh
+        edge_test     = face[0:2]
+        edge_boundary = edges[graph.get_edge_data(*edge_test)['index']]
+        
+        # in a well construced mesh, the winding is such that adjacent triangles
+        # have reversed edges to each other. Here we check to make sure the 
+        # edges are reversed, and if they aren't we simply reverse the face
+        reversed = edge_test[0] == edge_boundary[1]
+        if not reversed:
+            new_faces[face_index] = face[::-1]
+    return new_faces
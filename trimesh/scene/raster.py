@@ -0,0 +1,486 @@
+'''
+trimesh.scene.raster: render scenes to images with numpy
+
+A z-buffered software rasterizer which doesn't need a display or OpenGL,
+so images of scenes can be saved on headless machines.
+
+Triangles are binned into square tiles of the image, and every pixel
+a triangle might cover in a tile is tested at once. Triangles which
+don't cover the center of any pixel are discarded before binning,
+so large meshes rendered at small sizes are cheap.
+'''
+import numpy as np
+
+import zlib
+import struct
+
+from collections import deque
+
+from .. import util
+from ..visual import rgba
+
+# smooth shade meshes with fewer faces than this, as in the viewer
+_SMOOTH_MAX_FACES = 100000
+
+# the background color of the viewer
+_BACKGROUND = [.93, .93, 1.0]
+
+# directions to lights in camera coordinates, and their intensity
+_LIGHTS = np.array([[.5, .5, 1.0],
+                    [1.0, 0.0, .5]])
+_LIGHTS_INTENSITY = np.array([.6, .3])
+_AMBIENT = .3
+
+# vertical field of view of the camera in degrees, as in the viewer
+_FOV = 60.0
+
+# maximum number of candidate pixels tested at once
+_CHUNK = 2**21
+
+def render_scene(scene,
+                 resolution = (640,480),
+                 smooth     = None,
+                 cull       = True,
+                 tile       = 64):
+    '''
+    Render a scene to an image from the scene camera.
+
+    Arguments
+    ----------
+    scene:      trimesh.scene.Scene object
+    resolution: (2) int, width and height of image in pixels
+    smooth:     bool, if True Gouraud shade from vertex normals, if False
+                flat shade from face normals, if None smooth shade meshes
+                with fewer faces than _SMOOTH_MAX_FACES
+    cull:       bool, if True don't draw triangles facing away from the camera
+    tile:       int, size of the square tiles triangles are binned into
+
+    Returns
+    ----------
+    image: (height, width, 4) uint8, RGBA colors
+    '''
+    geometry = scene_geometry(scene, smooth=smooth)
+    return rasterize(resolution = resolution,
+                     cull       = cull,
+                     tile       = tile,
+                     **geometry)
+
+def render_scenes(scenes,
+                  resolution = (640,480),
+                  processes  = None,
+                  **kwargs):
+    '''
+    Render many scenes to images using a pool of processes.
+
+    Shaded triangles are found in this process so only arrays are
+    sent to the pool rather than scenes.
+
+    Arguments
+    ----------
+    scenes:     sequence of trimesh.scene.Scene objects
+    resolution: (2) int, width and height of images in pixels
+    processes:  int, number of processes, if None the number of CPUs
+    **kwargs:   passed to render_scene
+
+    Returns
+    ----------
+    images: list of (height, width, 4) uint8 RGBA images
+    '''
+    smooth = kwargs.pop('smooth', None)
+    jobs = deque()
+    for scene in scenes:
+        geometry = scene_geometry(scene, smooth=smooth)
+        geometry['resolution'] = resolution
+        geometry.update(kwargs)
+        jobs.append(geometry)
+    if processes == 1 or len(jobs) < 2:
+        return [_rasterize_job(i) for i in jobs]
+
+    from multiprocessing import Pool
+    pool = Pool(processes=processes)
+    try:
+        images = pool.map(_rasterize_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    return images
+
+def save_image(scene,
+               file_obj,
+               resolution = (640,480),
+               **kwargs):
+    '''
+    Render a scene and save it as a PNG.
+
+    Arguments
+    ----------
+    scene:      trimesh.scene.Scene object
+    file_obj:   str file name, or file object open for writing bytes
+    resolution: (2) int, width and height of image in pixels
+    **kwargs:   passed to render_scene
+    '''
+    image = render_scene(scene, resolution=resolution, **kwargs)
+    png   = export_png(image)
+    if util.is_string(file_obj):
+        with open(file_obj, 'wb') as file_out:
+            file_out.write(png)
+    else:
+        file_obj.write(png)
+
+def scene_geometry(scene, smooth=None):
+    '''
+    Find every triangle of a scene in camera coordinates,
+    with colors shaded at its corners.
+
+    Arguments
+    ----------
+    scene:  trimesh.scene.Scene object
+    smooth: bool or None, see render_scene
+
+    Returns
+    ----------
+    geometry: dict with keys:
+              vertices: (n,3) float, in camera coordinates
+              faces:    (m,3) int, indexes of vertices
+              colors:   (m,3,3) uint8, RGB color at each corner of faces
+              far:      float, distance past which nothing is drawn
+    '''
+    if 'camera' not in scene.transforms.transforms:
+        scene.set_camera()
+    camera = scene.transforms['camera']
+
+    vertices = deque()
+    faces    = deque()
+    colors   = deque()
+    offset   = 0
+    for name, transforms in scene.instance_transforms().items():
+        mesh  = scene.meshes[name]
+        count = len(transforms)
+        if count == 0 or len(mesh.faces) == 0:
+            continue
+        # transforms from mesh to camera coordinates
+        transforms = np.matmul(camera, transforms)
+        rotation   = transforms[:,:3,:3]
+
+        mesh_smooth = smooth
+        if mesh_smooth is None:
+            mesh_smooth = len(mesh.faces) < _SMOOTH_MAX_FACES
+        if mesh_smooth:
+            display = mesh.smoothed()
+            # (count, vertex count, 3) normals
+            normals = np.einsum('nij,kj->nki', rotation, display.vertex_normals)
+            base    = rgba(display.visual.vertex_colors)[:,:3]
+            shade   = _shade(normals)[...,None] * base
+            # (count, face count, 3, 3) colors of corners
+            shade   = shade[:,display.faces]
+        else:
+            display = mesh
+            normals = np.einsum('nij,kj->nki', rotation, display.face_normals)
+            base    = rgba(display.visual.face_colors)[:,:3]
+            shade   = _shade(normals)[...,None] * base
+            shade   = np.repeat(shade[:,:,None,:], 3, axis=2)
+
+        vertices.append((np.einsum('nij,kj->nki', rotation, display.vertices) +
+                         transforms[:,None,:3,3]).reshape((-1,3)))
+        # reflections reverse the winding of faces, and so would
+        # be culled as back faces unless they are flipped back
+        flip = np.linalg.det(rotation) < 0.0
+        stacked = np.tile(display.faces, (count,1,1))
+        stacked[flip] = stacked[flip][:,:,::-1]
+        shade[flip]   = shade[flip][:,:,::-1]
+        stacked += (np.arange(count) * len(display.vertices) +
+                    offset).reshape((-1,1,1))
+        faces.append(stacked.reshape((-1,3)))
+        colors.append(np.clip(shade, 0, 255).astype(np.uint8).reshape((-1,3,3)))
+        offset += count * len(display.vertices)
+
+    if len(faces) == 0:
+        geometry = {'vertices' : np.zeros((0,3)),
+                    'faces'    : np.zeros((0,3), dtype=np.int64),
+                    'colors'   : np.zeros((0,3,3), dtype=np.uint8)}
+    else:
+        geometry = {'vertices' : np.vstack(vertices),
+                    'faces'    : np.vstack(faces),
+                    'colors'   : np.vstack(colors)}
+    geometry['far'] = scene.scale * 5.0
+    return geometry
+
+def rasterize(vertices,
+              faces,
+              colors,
+              resolution = (640,480),
+              far        = np.inf,
+              near       = .01,
+              cull       = True,
+              tile       = 64,
+              background = None):
+    '''
+    Draw triangles in camera coordinates with a perspective projection
+    and a depth buffer.
+
+    The camera looks down the -Z axis with +Y up, as in OpenGL.
+
+    Arguments
+    ----------
+    vertices:   (n,3) float, vertices in camera coordinates
+    faces:      (m,3) int, indexes of vertices
+    colors:     (m,3,3) RGB color at each corner of faces,
+                interpolated across the face
+    resolution: (2) int, width and height of image in pixels
+    far:        float, triangles further than this aren't drawn
+    near:       float, triangles closer than this aren't drawn
+    cull:       bool, if True triangles facing away aren't drawn
+    tile:       int, size of the square tiles triangles are binned into
+    background: (3) float, color of background from 0.0-1.0
+
+    Returns
+    ----------
+    image: (height, width, 4) uint8, RGBA colors
+    '''
+    width, height = int(resolution[0]), int(resolution[1])
+    if background is None:
+        background = _BACKGROUND
+    image = np.tile(np.round(np.array(background, dtype=np.float64) * 255),
+                    (height * width, 1))
+    # inverse of depth, so the closest triangle has the largest value
+    inverse_depth = np.zeros(height * width)
+
+    vertices = np.asanyarray(vertices, dtype=np.float64)
+    faces    = np.asanyarray(faces, dtype=np.int64)
+    colors   = np.asanyarray(colors)
+
+    # distance in front of the camera
+    depth = -vertices[:,2]
+    # project into pixel coordinates, with rows going down the image
+    focal = (height / 2.0) / np.tan(np.radians(_FOV / 2.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pixel_x = width  / 2.0 + focal * vertices[:,0] / depth
+        pixel_y = height / 2.0 - focal * vertices[:,1] / depth
+
+    # reductions along short axes are slow, so work with 
+    # the columns of the corners of every triangle
+    corner_depth = [depth[faces[:,i]] for i in range(3)]
+    corner_x     = [pixel_x[faces[:,i]] for i in range(3)]
+    corner_y     = [pixel_y[faces[:,i]] for i in range(3)]
+    closest      = np.minimum(np.minimum(*corner_depth[:2]), corner_depth[2])
+    keep = (closest > near) & (closest < far)
+
+    # twice the signed area, which is negative for triangles facing the
+    # camera as the image rows go down
+    area = ((corner_x[1] - corner_x[0]) * (corner_y[2] - corner_y[0]) -
+            (corner_y[1] - corner_y[0]) * (corner_x[2] - corner_x[0]))
+    if cull:
+        keep &= area < 0.0
+    else:
+        keep &= area != 0.0
+
+    # the range of pixel centers each triangle could cover
+    with np.errstate(invalid='ignore'):
+        low_x  = np.ceil(np.minimum(np.minimum(*corner_x[:2]), corner_x[2]) - .5)
+        low_y  = np.ceil(np.minimum(np.minimum(*corner_y[:2]), corner_y[2]) - .5)
+        high_x = np.floor(np.maximum(np.maximum(*corner_x[:2]), corner_x[2]) - .5)
+        high_y = np.floor(np.maximum(np.maximum(*corner_y[:2]), corner_y[2]) - .5)
+        np.maximum(low_x, 0, out=low_x)
+        np.maximum(low_y, 0, out=low_y)
+        np.minimum(high_x, width - 1, out=high_x)
+        np.minimum(high_y, height - 1, out=high_y)
+        keep &= (high_x >= low_x) & (high_y >= low_y)
+
+    low  = np.column_stack((low_x[keep], low_y[keep])).astype(np.int64)
+    high = np.column_stack((high_x[keep], high_y[keep])).astype(np.int64)
+    triangles = np.stack([np.column_stack((x[keep], y[keep])) 
+                          for x, y in zip(corner_x, corner_y)], axis=1)
+    triangle_depth = np.column_stack([i[keep] for i in corner_depth])
+    colors = colors[keep]
+    area   = area[keep]
+
+    if len(triangles) > 0:
+        # coefficients which give barycentric coordinates of a point
+        # from its pixel coordinates as a dot product with [x, y, 1]
+        coefficients = np.empty((len(triangles), 3, 3))
+        for i in range(3):
+            start = triangles[:,(i + 1) % 3]
+            end   = triangles[:,(i + 2) % 3]
+            coefficients[:,i,0] = start[:,1] - end[:,1]
+            coefficients[:,i,1] = end[:,0] - start[:,0]
+            coefficients[:,i,2] = start[:,0] * end[:,1] - end[:,0] * start[:,1]
+        coefficients /= area.reshape((-1,1,1))
+
+        for index in _tiles(low, high, width, height, tile):
+            _rasterize_tile(index        = index,
+                            low          = low,
+                            high         = high,
+                            coefficients = coefficients,
+                            depth        = triangle_depth,
+                            colors       = colors,
+                            width        = width,
+                            image        = image,
+                            buffer       = inverse_depth)
+
+    image = np.column_stack((image, np.full(len(image), 255.0)))
+    image = np.clip(np.round(image), 0, 255).astype(np.uint8)
+    return image.reshape((height, width, 4))
+
+def _tiles(low, high, width, height, tile):
+    '''
+    Bin triangles into the tiles of the image their pixels are in.
+
+    Arguments
+    ----------
+    low:    (n,2) int, minimum pixel of each triangle
+    high:   (n,2) int, maximum pixel of each triangle
+    width:  int, width of image
+    height: int, height of image
+    tile:   int, size of tiles
+
+    Yields
+    ----------
+    index: (x, y, size, (m) int), first pixel and size of a tile,
+           and the indexes of triangles in it
+    '''
+    columns = int(np.ceil(width / float(tile)))
+    first   = low  // tile
+    last    = high // tile
+    span    = last - first + 1
+    counts  = span[:,0] * span[:,1]
+
+    # a (triangle, tile) pair for every tile each triangle touches
+    triangle = np.repeat(np.arange(len(low)), counts)
+    offset   = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                   counts)
+    span_x   = span[:,0][triangle]
+    tile_x   = first[:,0][triangle] + offset % span_x
+    tile_y   = first[:,1][triangle] + offset // span_x
+    tile_id  = tile_y * columns + tile_x
+
+    order    = np.argsort(tile_id, kind='mergesort')
+    tile_id  = tile_id[order]
+    triangle = triangle[order]
+    unique, start = np.unique(tile_id, return_index=True)
+    for i, current in enumerate(unique):
+        stop = start[i + 1] if i + 1 < len(start) else len(tile_id)
+        yield (int(current % columns) * tile,
+               int(current // columns) * tile,
+               tile,
+               triangle[start[i]:stop])
+
+def _rasterize_tile(index,
+                    low,
+                    high,
+                    coefficients,
+                    depth,
+                    colors,
+                    width,
+                    image,
+                    buffer):
+    '''
+    Draw the triangles binned into one tile, into the image and depth buffer.
+    '''
+    x, y, size, triangles = index
+    # pixels of each triangle which are in this tile
+    tile_low  = np.maximum(low[triangles], [x, y])
+    tile_high = np.minimum(high[triangles], [x + size - 1, y + size - 1])
+    span      = tile_high - tile_low + 1
+    counts    = span[:,0] * span[:,1]
+
+    # split triangles into chunks with a bounded number of candidate pixels
+    cumulative = np.cumsum(counts)
+    splits = np.searchsorted(cumulative,
+                             np.arange(_CHUNK, cumulative[-1], _CHUNK))
+    for chunk in np.split(np.arange(len(triangles)), np.unique(splits)):
+        if len(chunk) == 0:
+            continue
+        chunk_counts = counts[chunk]
+        local  = np.repeat(np.arange(len(chunk)), chunk_counts)
+        offset = np.arange(chunk_counts.sum()) - np.repeat(np.cumsum(chunk_counts) -
+                                                           chunk_counts,
+                                                           chunk_counts)
+        span_x = span[chunk,0][local]
+        pixel_x = tile_low[chunk,0][local] + offset % span_x
+        pixel_y = tile_low[chunk,1][local] + offset // span_x
+        triangle = triangles[chunk][local]
+
+        # barycentric coordinates of pixel centers
+        barycentric = np.einsum('nij,nj->ni',
+                                coefficients[triangle],
+                                np.column_stack((pixel_x + .5,
+                                                 pixel_y + .5,
+                                                 np.ones(len(pixel_x)))))
+        inside = (barycentric >= 0.0).all(axis=1)
+        barycentric = barycentric[inside]
+        triangle    = triangle[inside]
+        pixel       = (pixel_y * width + pixel_x)[inside]
+        if len(pixel) == 0:
+            continue
+
+        # inverse depth is linear in screen space
+        weighted = barycentric / depth[triangle]
+        inverse  = weighted.sum(axis=1)
+
+        # closest candidate for every pixel
+        order = np.lexsort((-inverse, pixel))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pixel[order][1:] != pixel[order][:-1]
+        closest = order[first]
+        closest = closest[inverse[closest] > buffer[pixel[closest]]]
+        if len(closest) == 0:
+            continue
+
+        # perspective correct interpolation of colors
+        weights = weighted[closest] / inverse[closest].reshape((-1,1))
+        color   = np.einsum('ni,nij->nj',
+                            weights,
+                            colors[triangle[closest]].astype(np.float64))
+        buffer[pixel[closest]] = inverse[closest]
+        image[pixel[closest]]  = color
+
+def _shade(normals):
+    '''
+    Diffuse lighting of normals in camera coordinates.
+
+    Arguments
+    ----------
+    normals: (..., 3) float, normals in camera coordinates
+
+    Returns
+    ----------
+    intensity: (...) float, multiplier of color
+    '''
+    lights    = util.unitize(_LIGHTS)
+    normals   = util.unitize(normals.reshape((-1,3))).reshape(normals.shape)
+    diffuse   = np.clip(np.dot(normals, lights.T), 0.0, 1.0)
+    intensity = _AMBIENT + np.dot(diffuse, _LIGHTS_INTENSITY)
+    return np.clip(intensity, 0.0, 1.0)
+
+def _rasterize_job(geometry):
+    return rasterize(**geometry)
+
+def export_png(image):
+    '''
+    Encode an image as a PNG.
+
+    Arguments
+    ----------
+    image: (height, width, 4) uint8, RGBA colors
+
+    Returns
+    ----------
+    png: bytes, PNG file
+    '''
+    image  = np.asanyarray(image, dtype=np.uint8)
+    height, width, channels = image.shape
+    color_type = {3 : 2, 4 : 6}[channels]
+    # every row starts with a filter type of 0, for no filter
+    raw = np.column_stack((np.zeros(height, dtype=np.uint8),
+                           image.reshape((height, -1)))).tobytes()
+
+    def chunk(kind, data):
+        packed = struct.pack('>I', len(data)) + kind + data
+        return packed + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    png = (b'\x89PNG\r\n\x1a\n' +
+           chunk(b'IHDR', header) +
+           chunk(b'IDAT', zlib.compress(raw, 6)) +
+           chunk(b'IEND', b''))
+    return png
@@ -1,8 +1,8 @@
 import numpy as np
 
-from ..points          import transform_points
 from ..grouping        import group_rows
 from ..transformations import rotation_matrix
+from ..visual          import rgba
 from .transforms       import TransformForest
 
 from .. import util
@@ -29,6 +29,9 @@ class Scene:
 
         # mesh name : Trimesh object
         self.meshes     = {}
+        # mesh name : (n,4,4) transforms from the base frame of 
+        # instances which don't have nodes
+        self.instances  = {}
         self.flags      = {}
         self.transforms = TransformForest(base_frame = base_frame)
 
@@ -38,16 +41,24 @@ class Scene:
             
         self._cache.id_set()
 
-    def add_mesh(self, mesh):
+    def add_mesh(self, mesh, instanced=False):
         '''
         Add a mesh to the scene.
 
         If the mesh has multiple transforms defined in its metadata, 
         a new instance of the mesh will be created at each transform. 
+
+        Arguments
+        ----------
+        mesh:      Trimesh object, or sequence of them
+        instanced: bool, if True the transforms are stored in 
+                   self.instances as one (n,4,4) array rather than 
+                   creating a node for every instance, which is much 
+                   cheaper for meshes with many instances
         '''        
         if util.is_sequence(mesh):
             for i in mesh:
-                self.add_mesh(i)
+                self.add_mesh(i, instanced=instanced)
             return
 
         if 'name' in mesh.metadata: 
@@ -62,6 +73,13 @@ class Scene:
         else:
             transforms = np.eye(4).reshape((-1,4,4))
 
+        if instanced:
+            transforms = transforms.reshape((-1,4,4)).astype(np.float64)
+            if name_mesh in self.instances:
+                transforms = np.vstack((self.instances[name_mesh], transforms))
+            self.instances[name_mesh] = util.tracked_array(transforms)
+            return
+
         for i, transform in enumerate(transforms):
             name_node = name_mesh + '_' + str(i)
             self.nodes[name_node] = name_mesh
@@ -74,9 +92,35 @@ class Scene:
         MD5 of scene, which will change when meshes or transforms are changed
         '''
         mesh_hash = util.md5_object(np.sort([hash(i) for i in self.meshes.values()]))
-        result = mesh_hash + self.transforms.md5()
+        instance_hash = ''.join(k + _array_md5(self.instances[k]) 
+                                for k in sorted(self.instances.keys()))
+        result = mesh_hash + self.transforms.md5() + instance_hash
         return result
 
+    def instance_transforms(self):
+        '''
+        The transform of every instance of every mesh, from both
+        nodes and instance tables.
+
+        Returns
+        ----------
+        transforms: dict, mesh name : (n,4,4) transforms from the base frame
+        '''
+        transforms = {}
+        if len(self.nodes) > 0:
+            nodes = list(self.nodes.keys())
+            stack = self.transforms.get_many(nodes)
+            names, inverse = np.unique([self.nodes[i] for i in nodes], 
+                                       return_inverse=True)
+            for index, name in enumerate(names):
+                transforms[name] = stack[inverse == index]
+        for name, instances in self.instances.items():
+            instances = np.asanyarray(instances, dtype=np.float64).reshape((-1,4,4))
+            if name in transforms:
+                instances = np.vstack((transforms[name], instances))
+            transforms[name] = instances
+        return transforms
+
     @util.cache_decorator
     def bounds(self):
         '''
@@ -87,10 +131,18 @@ class Scene:
         bounds: (2,3) float points for min, max corner
         '''
         corners = deque()
-        for instance, mesh_name in self.nodes.items():
-            transform = self.transforms.get(instance)
-            corners.append(transform_points(self.meshes[mesh_name].bounds, 
-                                            transform))
+        for name, transforms in self.instance_transforms().items():
+            if len(transforms) == 0:
+                continue
+            # all 8 corners of the axis aligned bounding box of the mesh
+            box = self.meshes[name].bounds
+            box = np.array([[box[i,0], box[j,1], box[k,2]] 
+                            for i in range(2) 
+                            for j in range(2) 
+                            for k in range(2)])
+            # (n,8,3) corners of every instance
+            corners.append((np.einsum('nij,kj->nki', transforms[:,:3,:3], box) + 
+                            transforms[:,None,:3,3]).reshape((-1,3)))
         corners = np.vstack(corners)
         bounds  = np.array([corners.min(axis=0), 
                             corners.max(axis=0)])
@@ -151,18 +203,90 @@ class Scene:
                                frame_to   = self.transforms.base_frame,
                                matrix     = transform)
 
-    def dump(self):
+    def dump(self, concatenate=False):
         '''
         Append all meshes in scene to a list of meshes.
+
+        Arguments
+        ----------
+        concatenate: bool, if True return a single mesh of every 
+                     instance, which is created without copying 
+                     meshes for each instance
+
+        Returns
+        ----------
+        dumped: (n) array of Trimesh objects, one per instance, 
+                or a single Trimesh object if concatenate
         '''
+        if concatenate:
+            return self._dump_concatenated()
         result = deque()
-        for node_id, mesh_id in self.nodes.items():
-            transform = self.transforms.get(node_id)
-            current   = self.meshes[mesh_id].copy()
-            current.transform(transform)
+        nodes      = list(self.nodes.keys())
+        transforms = self.transforms.get_many(nodes)
+        for node_id, transform in zip(nodes, transforms):
+            current   = self.meshes[self.nodes[node_id]].copy()
+            current.apply_transform(transform)
             result.append(current)
+        for name, instances in self.instances.items():
+            for transform in instances:
+                current = self.meshes[name].copy()
+                current.apply_transform(transform)
+                result.append(current)
         return np.array(result)
 
+    def _dump_concatenated(self):
+        '''
+        Transform every instance of every mesh at once into one mesh.
+
+        Returns
+        ----------
+        merged: Trimesh object
+        '''
+        vertices = deque()
+        faces    = deque()
+        normals  = deque()
+        colors   = deque()
+        offset   = 0
+        trimesh_type = None
+        for name, transforms in self.instance_transforms().items():
+            mesh  = self.meshes[name]
+            count = len(transforms)
+            if count == 0:
+                continue
+            trimesh_type = type(mesh)
+            rotation = transforms[:,:3,:3]
+
+            # (count, len(vertices), 3) vertices of every instance
+            vertices.append((np.einsum('nij,kj->nki', rotation, mesh.vertices) + 
+                             transforms[:,None,:3,3]).reshape((-1,3)))
+
+            # reflections reverse the winding of faces
+            flip = np.linalg.det(rotation) < 0.0
+            stacked = np.tile(mesh.faces, (count,1,1))
+            stacked[flip] = stacked[flip][:,:,::-1]
+            stacked += (np.arange(count) * len(mesh.vertices) + 
+                        offset).reshape((-1,1,1))
+            faces.append(stacked.reshape((-1,3)))
+            offset += count * len(mesh.vertices)
+
+            normals.append(util.unitize(np.einsum('nij,kj->nki',
+                                                  rotation, 
+                                                  mesh.face_normals).reshape((-1,3))))
+            colors.append((mesh.visual.defined, 
+                           mesh.visual.face_colors, 
+                           count))
+
+        if trimesh_type is None:
+            raise ValueError('No meshes in scene!')
+        merged = trimesh_type(vertices     = np.vstack(vertices),
+                              faces        = np.vstack(faces),
+                              face_normals = np.vstack(normals),
+                              process      = False)
+        if any(i[0] for i in colors):
+            merged.visual.face_colors = np.vstack([np.tile(rgba(c), (n,1)) 
+                                                   for d, c, n in colors])
+        return merged
+
     def export(self, file_type='dict64'):
         '''
         Export a snapshot of the current scene.
@@ -181,6 +305,8 @@ class Scene:
         '''
         export = {'transforms' : self.transforms.export(),
                   'nodes'      : self.nodes,
+                  'instances'  : {k : np.asanyarray(v).tolist() 
+                                  for k, v in self.instances.items()},
                   'meshes'     : {},
                   'scene_cache' : self._cache.cache}
         # if the mesh has an export method use it, otherwise put the mesh
@@ -192,12 +318,45 @@ class Scene:
                 export['meshes'][node] = mesh
         return export
         
-    def save_image(self, file_obj, resolution=(1024,768), **kwargs):
-        from .viewer import SceneViewer
-        SceneViewer(self, 
-                    save_image = file_obj, 
-                    resolution = resolution, 
-                    **kwargs)
+    def save_image(self, 
+                   file_obj, 
+                   resolution = (1024,768), 
+                   engine     = None,
+                   **kwargs):
+        '''
+        Save an image of the scene from the current camera.
+
+        Arguments
+        ----------
+        file_obj:   str, file name to save image to, or for the 
+                    'software' engine a file object
+        resolution: (2) int, width and height of image in pixels
+        engine:     str, 'opengl' to render in a pyglet window, or 
+                    'software' to render with numpy without a display,
+                    if None 'opengl' if pyglet is installed
+        **kwargs:   passed to the SceneViewer or raster.render_scene
+        '''
+        if engine is None:
+            try:
+                import pyglet
+                engine = 'opengl'
+            except ImportError:
+                engine = 'software'
+
+        if engine == 'opengl':
+            from .viewer import SceneViewer
+            SceneViewer(self, 
+                        save_image = file_obj, 
+                        resolution = resolution, 
+                        **kwargs)
+        elif engine == 'software':
+            from .raster import save_image
+            save_image(self, 
+                       file_obj   = file_obj, 
+                       resolution = resolution, 
+                       **kwargs)
+        else:
+            raise ValueError('image engine {} is not available!'.format(engine))
 
     def explode(self, vector=[0.0,0.0,1.0], origin=None):
         '''
@@ -234,3 +393,11 @@ class Scene:
         else:
             from threading import Thread
             Thread(target = viewer, kwargs=kwargs).start()
+
+def _array_md5(array):
+    '''
+    MD5 of an array, using the cached value of tracked arrays.
+    '''
+    if hasattr(array, 'md5'):
+        return array.md5()
+    return util.md5_object(np.asanyarray(array))
@@ -7,12 +7,20 @@ from ..transformations import quaternion_matrix, rotation_matrix
 
 from .. import util
 
+# errors networkx raises when there is no path between nodes,
+# NodeNotFound was only added in later versions of networkx
+_no_path = tuple(getattr(nx, i) for i in ['NetworkXError', 
+                                          'NetworkXNoPath', 
+                                          'NodeNotFound'] 
+                 if hasattr(nx, i))
+
 class TransformForest:
     def __init__(self, base_frame='world'):
         self.transforms = EnforcedForest()
         self.base_frame = base_frame
         self._paths     = {}
         self._updated   = time.time()
+        self._clear_resolved()
 
     def update(self, 
                frame_to,
@@ -40,10 +48,13 @@ class TransformForest:
         matrix  = kwargs_to_matrix(**kwargs)
         changed = self.transforms.add_edge(frame_from, 
                                            frame_to,
-                                           attr_dict = {'matrix' : matrix,
-                                                        'time'   : time.time()})
+                                           **{'matrix' : matrix,
+                                              'time'   : time.time()})
         if changed:
             self._paths = {}
+            self._clear_resolved()
+        else:
+            self._edge_updated(frame_from, frame_to)
         self._updated = time.time()
 
     def md5(self):
@@ -64,6 +75,8 @@ class TransformForest:
     def load(self, edgelist):
         for edge in edgelist:
             self.transforms.add_edge(edge[0], edge[1], **edge[2])
+        self._paths = {}
+        self._clear_resolved()
 
     def get(self,
             frame_to,
@@ -74,6 +87,9 @@ class TransformForest:
 
         If the frames are not connected a NetworkXNoPath error will be raised.
 
+        Transforms from the base frame are cached, and only recomputed 
+        when a transform between them and the base frame is updated.
+
         Arguments
         ---------
         frame_from: hashable object, usually a string (eg 'world').
@@ -87,18 +103,43 @@ class TransformForest:
 
         if frame_from is None:
             frame_from = self.base_frame
+        if frame_from == self.base_frame:
+            self._resolve([frame_to])
+            return self._world[frame_to].copy()
+
         transform = np.eye(4)
         path = self._get_path(frame_from, frame_to)
 
         for i in range(len(path) - 1):
-            data, direction = self.transforms.get_edge_data_direction(path[i],
-                                                                      path[i+1])
-            matrix = data['matrix']
-            if direction < 0: 
-                matrix = np.linalg.inv(matrix)
-            transform = np.dot(transform, matrix)
+            transform = np.dot(transform, self._edge_matrix(path[i], path[i+1]))
         return transform
 
+    def get_many(self, frames, frame_from=None):
+        '''
+        Get the transforms to many frames at once.
+
+        Transforms from the base frame are resolved a level of the tree 
+        at a time, with every matrix product of a level done at once.
+
+        Arguments
+        ---------
+        frames:     (n) sequence of frame keys
+        frame_from: hashable object, if None self.base_frame
+
+        Returns
+        ---------
+        transforms: (n,4,4) homogenous transformation matrices
+        '''
+        frames = list(frames)
+        if frame_from is None:
+            frame_from = self.base_frame
+        if frame_from != self.base_frame:
+            transforms = [self.get(i, frame_from=frame_from) for i in frames]
+        else:
+            self._resolve(frames)
+            transforms = [self._world[i] for i in frames]
+        return np.array(transforms, dtype=np.float64).reshape((-1,4,4))
+
     def __getitem__(self, key):
         return self.get(key)
         
@@ -111,7 +152,136 @@ class TransformForest:
     def clear(self):
         self.transforms = EnforcedForest()
         self._paths     = {}
-        
+        self._clear_resolved()
+
+    def _clear_resolved(self):
+        '''
+        Clear every cached transform.
+        '''
+        # frame : transform from base frame
+        self._world    = {self.base_frame : np.eye(4)}
+        # (u, v) edge : inverse of edge matrix
+        self._inverses = {}
+        # frame : parent frame, on the path to the base frame
+        # which is None until it is needed
+        self._parents  = None
+        # parent frame : set of child frames
+        self._children = None
+        # frame : number of edges to the base frame
+        self._depth    = None
+
+    def _edge_updated(self, u, v):
+        '''
+        Clear cached transforms which depend on the transform 
+        of the edge between frames u and v.
+        '''
+        self._inverses.pop((u, v), None)
+        self._inverses.pop((v, u), None)
+        if self._parents is None:
+            # without parents the affected frames are unknown
+            self._world = {self.base_frame : np.eye(4)}
+        elif u in self._parents and self._parents[u] == v:
+            self._clear_subtree(u)
+        elif v in self._parents and self._parents[v] == u:
+            self._clear_subtree(v)
+        elif u in self._parents:
+            # a frame was connected to the tree
+            self._attach(u, v)
+        elif v in self._parents:
+            self._attach(v, u)
+
+    def _attach(self, parent, child):
+        '''
+        Add a frame which was just connected to the tree, or find parents 
+        again if the frame connected a tree of other frames.
+        '''
+        if self.transforms._undirected.degree(child) != 1:
+            self._find_parents()
+            return
+        self._parents[child] = parent
+        self._depth[child]   = self._depth[parent] + 1
+        self._children.setdefault(parent, set()).add(child)
+
+    def _clear_subtree(self, frame):
+        '''
+        Remove cached transforms of a frame and every frame below it.
+        '''
+        stack = [frame]
+        while len(stack) > 0:
+            current = stack.pop()
+            if self._world.pop(current, None) is None:
+                # frames below uncached frames are never cached
+                continue
+            stack.extend(self._children.get(current, []))
+
+    def _find_parents(self):
+        '''
+        Find the parent of every frame connected to the base frame 
+        with a single breadth first search.
+        '''
+        self._parents  = {self.base_frame : None}
+        self._children = {}
+        self._depth    = {self.base_frame : 0}
+        graph = self.transforms._undirected
+        if self.base_frame not in graph:
+            return
+        for parent, children in nx.bfs_successors(graph, self.base_frame):
+            children = list(children)
+            self._children[parent] = set(children)
+            for child in children:
+                self._parents[child] = parent
+                self._depth[child]   = self._depth[parent] + 1
+
+    def _edge_matrix(self, u, v):
+        '''
+        The transform from frame u to frame v, which are connected by an edge,
+        caching the inverse of edges which are traversed backwards.
+        '''
+        data, direction = self.transforms.get_edge_data_direction(u, v)
+        if direction > 0:
+            return data['matrix']
+        key = (v, u)
+        if key not in self._inverses:
+            self._inverses[key] = np.linalg.inv(data['matrix'])
+        return self._inverses[key]
+
+    def _resolve(self, frames):
+        '''
+        Make sure the transform from the base frame to every frame is cached.
+
+        Arguments
+        ---------
+        frames: sequence of frame keys
+        '''
+        missing = [i for i in frames if i not in self._world]
+        if len(missing) == 0:
+            return
+        if self._parents is None:
+            self._find_parents()
+
+        # find every frame between the requested frames and
+        # the closest frame with a cached transform
+        levels = {}
+        queued = set()
+        for frame in missing:
+            while frame not in self._world and frame not in queued:
+                if frame not in self._parents:
+                    raise nx.NetworkXNoPath('No path from {} to {}!'.format(
+                        self.base_frame, frame))
+                queued.add(frame)
+                levels.setdefault(self._depth[frame], []).append(frame)
+                frame = self._parents[frame]
+
+        # every frame in a level only depends on frames in earlier levels
+        for depth in sorted(levels.keys()):
+            level   = levels[depth]
+            parents = [self._parents[i] for i in level]
+            world   = np.array([self._world[i] for i in parents]).reshape((-1,4,4))
+            edges   = np.array([self._edge_matrix(p, c) 
+                                for p, c in zip(parents, level)]).reshape((-1,4,4))
+            for frame, transform in zip(level, np.matmul(world, edges)):
+                self._world[frame] = transform
+
     def _get_path(self, 
                   frame_from,
                   frame_to):
@@ -169,7 +339,7 @@ class EnforcedForest(nx.DiGraph):
                     raise ValueError('Multiple edge path exists between nodes!')
                 self.disconnect_path(path)
                 changed = True
-            except (nx.NetworkXError, nx.NetworkXNoPath):
+            except _no_path:
                 pass
         self._undirected.add_edge(u,v)
         super(self.__class__, self).add_edge(u, v, *args, **kwargs)
@@ -2,22 +2,42 @@ import pyglet
 import pyglet.gl as gl
 import numpy as np
 
-from collections import deque
+from collections import deque, OrderedDict
 
+from .. import remesh
 from ..transformations import Arcball
 
 #smooth only when fewer faces than this
 _SMOOTH_MAX_FACES = 100000
 
+# display arrays of recently displayed meshes, 
+# keyed by md5 of mesh and visual and display options
+_DISPLAY_CACHE      = OrderedDict()
+_DISPLAY_CACHE_SIZE = 8
+
 class SceneViewer(pyglet.window.Window):
     def __init__(self, 
                  scene, 
                  smooth = None,
                  save_image = None,
                  flags = None,
-                 resolution = (640,480)):
-
+                 resolution = (640,480),
+                 max_faces = None):
+        '''
+        Arguments
+        ----------
+        scene:      trimesh.scene.Scene object to display
+        smooth:     bool, smooth shade meshes, if None smooth meshes
+                    with fewer faces than _SMOOTH_MAX_FACES
+        save_image: str, if set save an image to this file and close
+        flags:      dict, initial view options, eg {'cull' : False}
+        resolution: (2) int, size of window in pixels
+        max_faces:  int, meshes with more faces than this are displayed 
+                    decimated to about this many faces, None to disable
+        '''
         self.scene = scene
+        self._smooth    = smooth
+        self._max_faces = max_faces
         self.scene._redraw = self._redraw
         
         self.reset_view(flags=flags)
@@ -64,17 +84,15 @@ class SceneViewer(pyglet.window.Window):
         for name, mesh in self.scene.meshes.items():
             md5 = mesh.md5() + mesh.visual.md5()
             if self.vertex_list_md5[name] != md5:
-                self._add_mesh(name, mesh)
+                self._add_mesh(name, mesh, self._smooth)
 
     def _add_mesh(self, name_mesh, mesh, smooth=None):    
-        if smooth is None:
-            smooth = len(mesh.faces) < _SMOOTH_MAX_FACES
-        if smooth:
-            display = mesh.smoothed()
-        else:
-            display = mesh.copy()
-            display.unmerge_vertices()
-        self.vertex_list[name_mesh] = self.batch.add_indexed(*mesh_to_vertex_list(display))
+        buffers = mesh_to_buffers(mesh, 
+                                  smooth    = smooth, 
+                                  max_faces = self._max_faces)
+        if name_mesh in self.vertex_list:
+            self.vertex_list[name_mesh].delete()
+        self.vertex_list[name_mesh] = VertexBuffers(**buffers)
         self.vertex_list_md5[name_mesh] = mesh.md5() + mesh.visual.md5()
 
     def reset_view(self, flags=None):
@@ -224,6 +242,14 @@ class SceneViewer(pyglet.window.Window):
             # pop the matrix stack as we drew what we needed to draw
             gl.glPopMatrix()
 
+        # meshes with instance tables rather than a node per instance
+        for name_mesh, transforms in getattr(self.scene, 'instances', {}).items():
+            for transform in transforms:
+                gl.glPushMatrix()
+                gl.glMultMatrixf(_gl_matrix(transform))
+                self.vertex_list[name_mesh].draw(mode=gl.GL_TRIANGLES)
+                gl.glPopMatrix()
+
     def node_flag(self, node, flag):
         if (hasattr(self.scene, 'flags') and
             node in self.scene.flags and
@@ -257,6 +283,147 @@ def _view_transform(view):
     transform[0:3,3] += view['translation'] * view['scale'] * 5.0
     return transform
 
+class VertexBuffers(object):
+    '''
+    Vertex buffer objects holding the display arrays of a mesh.
+
+    The arrays are passed to OpenGL by pointer rather than being 
+    converted to python lists as pyglet vertex lists require.
+    '''
+    def __init__(self, vertices, normals, colors, faces):
+        '''
+        Arguments
+        ----------
+        vertices: (n,3) float32, vertices
+        normals:  (n,3) float32, vertex normals
+        colors:   (n,3) or (n,4) uint8, vertex colors
+        faces:    (m,3) uint32, indexes of vertices
+        '''
+        self.count      = faces.size
+        self.color_size = colors.shape[1]
+        self.buffers    = (gl.GLuint * 4)()
+        gl.glGenBuffers(4, self.buffers)
+        targets = [gl.GL_ARRAY_BUFFER] * 3 + [gl.GL_ELEMENT_ARRAY_BUFFER]
+        arrays  = [vertices, normals, colors, faces]
+        for buffer, target, array in zip(self.buffers, targets, arrays):
+            array = np.ascontiguousarray(array)
+            gl.glBindBuffer(target, buffer)
+            gl.glBufferData(target, 
+                            array.nbytes, 
+                            array.ctypes.data, 
+                            gl.GL_STATIC_DRAW)
+            gl.glBindBuffer(target, 0)
+
+    def draw(self, mode=gl.GL_TRIANGLES):
+        gl.glPushClientAttrib(gl.GL_CLIENT_VERTEX_ARRAY_BIT)
+
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.buffers[0])
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(3, gl.GL_FLOAT, 0, 0)
+
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.buffers[1])
+        gl.glEnableClientState(gl.GL_NORMAL_ARRAY)
+        gl.glNormalPointer(gl.GL_FLOAT, 0, 0)
+
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.buffers[2])
+        gl.glEnableClientState(gl.GL_COLOR_ARRAY)
+        gl.glColorPointer(self.color_size, gl.GL_UNSIGNED_BYTE, 0, 0)
+
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.buffers[3])
+        gl.glDrawElements(mode, self.count, gl.GL_UNSIGNED_INT, 0)
+
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glPopClientAttrib()
+
+    def delete(self):
+        gl.glDeleteBuffers(4, self.buffers)
+
+def mesh_to_buffers(mesh, smooth=None, max_faces=None):
+    '''
+    Find the arrays to display a mesh, as contiguous arrays of the 
+    types OpenGL expects.
+
+    Results are cached by the md5 of the mesh and its visual, so 
+    meshes are only smoothed or decimated again when they change.
+
+    Arguments
+    ----------
+    mesh:      Trimesh object
+    smooth:    bool, if True smooth shade, if None smooth shade 
+               when mesh has fewer than _SMOOTH_MAX_FACES faces
+    max_faces: int, if mesh has more faces than this display a flat
+               shaded decimated version of it, None to disable
+
+    Returns
+    ----------
+    buffers: dict with keys:
+             vertices: (n,3) float32
+             normals:  (n,3) float32
+             colors:   (n,3) or (n,4) uint8
+             faces:    (m,3) uint32
+    '''
+    decimate = max_faces is not None and len(mesh.faces) > max_faces
+    if decimate or smooth is None:
+        smooth = len(mesh.faces) < _SMOOTH_MAX_FACES and not decimate
+
+    key = (mesh.md5() + mesh.visual.md5(), bool(smooth), max_faces)
+    if key in _DISPLAY_CACHE:
+        _DISPLAY_CACHE[key] = _DISPLAY_CACHE.pop(key)
+        return _DISPLAY_CACHE[key]
+
+    if smooth:
+        display  = mesh.smoothed()
+        vertices = display.vertices
+        normals  = display.vertex_normals
+        colors   = display.visual.vertex_colors
+        faces    = display.faces
+    else:
+        vertices, faces = mesh.vertices, mesh.faces
+        normals = mesh.face_normals
+        colors  = mesh.visual.face_colors
+        if decimate:
+            vertices, faces, face_index = _decimate(mesh, max_faces)
+            normals = normals[face_index]
+            colors  = colors[face_index]
+        # unmerge vertices so every face is flat shaded
+        vertices = vertices[faces].reshape((-1,3))
+        normals  = np.repeat(normals, 3, axis=0)
+        colors   = np.repeat(colors, 3, axis=0)
+        faces    = np.arange(len(vertices)).reshape((-1,3))
+
+    buffers = {'vertices' : np.ascontiguousarray(vertices, dtype=np.float32),
+               'normals'  : np.ascontiguousarray(normals,  dtype=np.float32),
+               'colors'   : np.ascontiguousarray(colors,   dtype=np.uint8),
+               'faces'    : np.ascontiguousarray(faces,    dtype=np.uint32)}
+    # default colors are stored when first accessed which changes the md5
+    key = (mesh.md5() + mesh.visual.md5(), bool(smooth), max_faces)
+    _DISPLAY_CACHE[key] = buffers
+    while len(_DISPLAY_CACHE) > _DISPLAY_CACHE_SIZE:
+        _DISPLAY_CACHE.popitem(last=False)
+    return buffers
+
+def _decimate(mesh, max_faces):
+    '''
+    Decimate a mesh by vertex clustering to about max_faces faces.
+
+    Returns
+    ----------
+    vertices:   (n,3) float
+    faces:      (m,3) int
+    face_index: (m) int, index of mesh.faces for every face
+    '''
+    # a grid cell on a surface has about two faces
+    pitch = np.sqrt(2.0 * mesh.area / max_faces)
+    for i in range(10):
+        decimated = remesh.decimate_clustering(mesh.vertices, 
+                                               mesh.faces, 
+                                               pitch)
+        if len(decimated[1]) <= max_faces:
+            break
+        pitch *= 1.5
+    return decimated
+
 def mesh_to_vertex_list(mesh, group=None):
     '''
     Convert a Trimesh object to arguments for an 
@@ -168,19 +168,31 @@ def windings_aligned(triangles, normals_compare):
     result[valid] = difference > 0.0
     return result 
 
-def bounds_tree(triangles):
+def bounds_tree(triangles, engine=None):
     '''
-    Given a set of triangles, create an r-tree for broad- phase 
+    Given a set of triangles, create a tree for broad- phase 
     collision detection
 
     Arguments
     ---------
     triangles: (n, 3, 3) list of vertices
+    engine:    str, which tree to build:
+               'bvh' (or None): trimesh.bvh.BVH, pure numpy 
+               'rtree': rtree.index.Index, requires rtree
 
     Returns
     ---------
-    tree: Rtree object 
+    tree: BVH or Rtree object 
     '''
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    if engine in [None, 'bvh']:
+        from .bvh import BVH
+        tree = BVH(np.stack((triangles.min(axis=1), 
+                             triangles.max(axis=1)), axis=1))
+        return tree
+    elif engine != 'rtree':
+        raise ValueError('tree engine {} is not available!'.format(engine))
+
     from rtree import index
 
     # the property object required to get a 3D r-tree index
@@ -195,6 +207,73 @@ def bounds_tree(triangles):
         tree.insert(i, bounds)    
     return tree
 
+def closest_point(triangles, points):
+    '''
+    Find the closest point on each triangle to each point, pairwise.
+
+    Implemented from "Real-Time Collision Detection" (Ericson) 5.1.5,
+    by classifying every point into a voronoi region of its triangle.
+
+    Arguments
+    ----------
+    triangles: (n, 3, 3) float, triangle vertices
+    points:    (n, 3) float, points in space
+
+    Returns
+    ----------
+    closest: (n, 3) float, point on triangles[i] closest to points[i]
+    '''
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    points    = np.asanyarray(points,    dtype=np.float64)
+
+    a = triangles[:,0]
+    b = triangles[:,1]
+    c = triangles[:,2]
+    ab = b - a
+    ac = c - a
+
+    ap = points - a
+    d1 = diagonal_dot(ab, ap)
+    d2 = diagonal_dot(ac, ap)
+
+    bp = points - b
+    d3 = diagonal_dot(ab, bp)
+    d4 = diagonal_dot(ac, bp)
+
+    cp = points - c
+    d5 = diagonal_dot(ab, cp)
+    d6 = diagonal_dot(ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    # the masks for each voronoi region, in order of precedence
+    region_a  = np.logical_and(d1 <= 0.0, d2 <= 0.0)
+    region_b  = np.logical_and(d3 >= 0.0, d4 <= d3)
+    region_ab = np.logical_and.reduce((vc <= 0.0, d1 >= 0.0, d3 <= 0.0))
+    region_c  = np.logical_and(d6 >= 0.0, d5 <= d6)
+    region_ac = np.logical_and.reduce((vb <= 0.0, d2 >= 0.0, d6 <= 0.0))
+    region_bc = np.logical_and.reduce((va <= 0.0, (d4 - d3) >= 0.0, (d5 - d6) >= 0.0))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # the default case is the projection onto the face
+        denom   = 1.0 / (va + vb + vc)
+        closest = a + (ab.T * (vb * denom)).T + (ac.T * (vc * denom)).T
+
+        # assign in reverse order so the first matching region wins
+        w = ((d4 - d3) / ((d4 - d3) + (d5 - d6)))[region_bc]
+        closest[region_bc] = b[region_bc] + ((c - b)[region_bc].T * w).T
+        w = (d2 / (d2 - d6))[region_ac]
+        closest[region_ac] = a[region_ac] + (ac[region_ac].T * w).T
+        closest[region_c]  = c[region_c]
+        v = (d1 / (d1 - d3))[region_ab]
+        closest[region_ab] = a[region_ab] + (ab[region_ab].T * v).T
+        closest[region_b]  = b[region_b]
+        closest[region_a]  = a[region_a]
+
+    return closest
+
 def nondegenerate(triangles):
     '''
     Find all triangles which have nonzero area.
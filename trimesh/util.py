@@ -12,8 +12,10 @@ import time
 import json
 
 from collections import defaultdict, deque
-from sys import version_info
+from sys import version_info, getsizeof
 from functools import wraps
+from itertools import count
+from weakref import WeakSet
 
 _PY3 = version_info.major >= 3
 if _PY3:
@@ -22,6 +24,33 @@ if _PY3:
 log = logging.getLogger('trimesh')
 log.addHandler(logging.NullHandler())   
     
+# monotonic counter shared by every TrackedArray so that a replaced
+# array never has the same version as the array it replaced
+_versions = count(1)
+
+# every live Cache, and counters summed over every Cache ever created
+_caches       = WeakSet()
+_cache_totals = {}
+# process- wide limit on bytes held by caches, and an estimate of
+# the bytes held which is recounted when it exceeds the limit
+_cache_limit = {'max_bytes' : None,
+                'policy'    : 'lru',
+                'held'      : 0}
+# ticks for least recently used eviction
+_ticks = count(1)
+
+# hash function used by md5_object and TrackedArray.md5, which is
+# md5 unless changed with set_hash_function
+_hash_config = {'name'        : 'md5',
+                'factory'     : hashlib.md5,
+                'incremental' : False,
+                # bumped on change so arrays don't reuse old hashes
+                'epoch'       : 0}
+# arrays are hashed in blocks of roughly this many bytes
+_HASH_BLOCK = 2**20
+# the trimesh.caching.DiskCache used by every Cache without its own
+_cache_disk = {'disk' : None}
+
 # included here so util has only standard library imports
 _TOL_ZERO = 1e-12
 
@@ -345,12 +374,75 @@ def decimal_to_digits(decimal, min_digits=None):
 def md5_object(obj):
     '''
     If an object is hashable, return the hex string of the MD5.
+
+    The hash function is md5 unless changed with set_hash_function.
+    Arrays which aren't contiguous are hashed in chunks of rows rather
+    than copied in one piece.
     '''
-    hasher = hashlib.md5()
-    hasher.update(obj)
+    hasher = _hash_config['factory']()
+    if isinstance(obj, np.ndarray) and not obj.flags['C_CONTIGUOUS']:
+        obj = obj.view(np.ndarray)
+        for start, stop in _hash_blocks(obj):
+            hasher.update(np.ascontiguousarray(obj[start:stop]))
+    else:
+        hasher.update(obj)
     hashed = hasher.hexdigest()
     return hashed
 
+def set_hash_function(hasher='md5', incremental=False):
+    '''
+    Set the hash function used by md5_object and TrackedArray.md5.
+
+    Arguments
+    ----------
+    hasher:      str, name of a hashlib function, eg 'md5' or 'blake2b',
+                 or a callable which returns a new hash object with
+                 update, digest and hexdigest methods, eg xxhash.xxh3_128
+    incremental: bool, if True TrackedArray.md5 only rehashes the blocks 
+                 of rows written through item assignment since it was 
+                 last hashed. This is much faster for small edits of
+                 large arrays, but like TrackedArray.version doesn't see
+                 writes made through a plain np.ndarray view or the out 
+                 argument of a ufunc.
+    '''
+    if is_string(hasher):
+        name = hasher
+        if hasattr(hashlib, name):
+            factory = getattr(hashlib, name)
+        else:
+            # raises ValueError for unknown names
+            hashlib.new(name)
+            factory = lambda: hashlib.new(name)
+    elif callable(hasher):
+        name    = getattr(hasher, '__name__', str(hasher))
+        factory = hasher
+    else:
+        raise ValueError('hasher must be a name or a callable!')
+    _hash_config.update({'name'        : name,
+                         'factory'     : factory,
+                         'incremental' : bool(incremental),
+                         'epoch'       : _hash_config['epoch'] + 1})
+
+def _hash_blocks(array):
+    '''
+    Split the rows of an array into ranges of roughly _HASH_BLOCK bytes.
+
+    Returns
+    ----------
+    blocks: list of (start, stop) row indices
+    '''
+    if array.ndim == 0 or len(array) == 0:
+        return [(None, None)]
+    rows = _hash_rows(array)
+    return [(i, min(i + rows, len(array))) for i in range(0, len(array), rows)]
+
+def _hash_rows(array):
+    '''
+    The number of rows of an array in each block hashed separately.
+    '''
+    per_row = array.itemsize * int(np.prod(array.shape[1:]))
+    return max(_HASH_BLOCK // max(per_row, 1), 1)
+
 def attach_to_log(log_level = logging.DEBUG, 
                   blacklist = ['TerminalIPythonApp','PYREADLINE']):
     '''
@@ -401,6 +493,11 @@ class TrackedArray(np.ndarray):
     Methods
     ----------
     md5: returns hexadecimal string of md5 of array
+
+    Attributes
+    ----------
+    version: int, increases every time the array is written through
+             item assignment or an in- place operator on it or its views
     '''
 
     def __array_finalize__(self, obj):
@@ -410,8 +507,18 @@ class TrackedArray(np.ndarray):
         and certain types of slicing. 
         '''
         self._modified = True
+        self._version  = next(_versions)
+        self._root     = self
+        # blocks of rows written since the last hash, None for all rows
+        self._dirty    = None
+        # hashes of blocks of rows, for incremental hashing
+        self._blocks   = None
         if isinstance(obj, type(self)):
             obj._modified = True
+            # views share memory with the array they were taken from
+            # so writes to them have to bump the version of the base
+            if self.base is not None:
+                self._root = getattr(obj, '_root', obj)
             
     def md5(self):
         '''
@@ -423,13 +530,148 @@ class TrackedArray(np.ndarray):
         This is only recomputed if a modified flag is set which may have false 
         positives (forcing an unnecessary recompute) but will not have false 
         negatives which would return an incorrect hash. 
-        '''
 
-        if self._modified or not hasattr(self, '_hashed'):
-            self._hashed = md5_object(self)
-        self._modified = False
+        The dtype and shape are included, and large arrays are hashed 
+        as the hash of the hashes of blocks of rows. With incremental
+        hashing (see set_hash_function) only blocks written to since the
+        last call are rehashed, and the result is the same either way.
+        '''
+        epoch = _hash_config['epoch']
+        if (getattr(self, '_hash_epoch', None) != epoch or 
+            not hasattr(self, '_hashed')):
+            self._blocks = None
+        elif _hash_config['incremental']:
+            if self._hash_version == self.version:
+                return self._hashed
+        elif not self._modified:
+            return self._hashed
+
+        self._hashed       = self._hash()
+        self._hash_epoch   = epoch
+        self._hash_version = self.version
+        self._dirty        = set()
+        self._modified     = False
         return self._hashed
 
+    def _hash(self):
+        '''
+        Hash the array, reusing the hashes of blocks of rows which 
+        haven't been written to if the array is hashed incrementally.
+        '''
+        factory = _hash_config['factory']
+        plain   = self.view(np.ndarray)
+        header  = (plain.dtype.str + str(plain.shape)).encode('utf-8')
+        blocks  = _hash_blocks(plain)
+
+        hasher = factory()
+        hasher.update(header)
+        if len(blocks) == 1:
+            hasher.update(np.ascontiguousarray(plain))
+            self._blocks = None
+            return hasher.hexdigest()
+
+        dirty = None
+        # views can be changed by writes to the array they are a view 
+        # of, which don't record rows, so only reuse blocks of the root
+        if (_hash_config['incremental'] and 
+            self._root is self and
+            self._blocks is not None and
+            len(self._blocks) == len(blocks)):
+            dirty = self._dirty
+        if dirty is None:
+            self._blocks = [None] * len(blocks)
+            dirty = range(len(blocks))
+        for index in dirty:
+            start, stop = blocks[index]
+            block = factory()
+            block.update(np.ascontiguousarray(plain[start:stop]))
+            self._blocks[index] = block.digest()
+        for digest in self._blocks:
+            hasher.update(digest)
+        return hasher.hexdigest()
+
+    def _dirty_blocks(self, index):
+        '''
+        Find the blocks of rows an item assignment writes to.
+
+        Arguments
+        ----------
+        index: the index passed to __setitem__
+
+        Returns
+        ----------
+        blocks: set of int, or None if the rows can't be cheaply found
+        '''
+        if isinstance(index, tuple):
+            if len(index) == 0:
+                return None
+            index = index[0]
+        if self.ndim == 0 or len(self) == 0:
+            return None
+        rows = _hash_rows(self)
+        if isinstance(index, (int, np.integer)):
+            return {(int(index) % len(self)) // rows}
+        if isinstance(index, slice):
+            written = range(*index.indices(len(self)))
+            if len(written) == 0:
+                return set()
+            low, high = sorted([written[0], written[-1]])
+            return set(range(low // rows, high // rows + 1))
+        if isinstance(index, (list, np.ndarray)):
+            index = np.asarray(index)
+            if index.dtype == np.bool_ and index.shape == (len(self),):
+                index = np.nonzero(index)[0]
+            elif index.dtype.kind not in 'iu':
+                return None
+            index = index.ravel() % len(self)
+            return set(np.unique(index // rows).tolist())
+        return None
+
+    @property
+    def version(self):
+        '''
+        A counter which increases when the array is written to.
+
+        Unlike md5 this is free to check, but only sees writes made through
+        TrackedArray methods: changes made through a plain np.ndarray view,
+        or with the out argument of a ufunc, are not counted.
+
+        Returns
+        ----------
+        version: int, larger than any version before the last write
+        '''
+        root = getattr(self, '_root', self)
+        return max(getattr(self, '_version', 0),
+                   getattr(root, '_version', 0))
+
+    def _bump(self, index=None):
+        '''
+        Mark the array and the array it is a view of as written.
+
+        Arguments
+        ----------
+        index: if passed, the index of an item assignment, used to 
+               track which rows need to be rehashed
+        '''
+        self._modified = True
+        self._version  = next(_versions)
+        root = getattr(self, '_root', self)
+        root._modified = True
+        root._version  = self._version
+        if root is not self:
+            # rows of a view aren't rows of the array it is a view of
+            root._dirty = None
+            self._dirty = None
+        elif self._dirty is not None:
+            if index is None or not _hash_config['incremental']:
+                self._dirty = None
+            else:
+                blocks = self._dirty_blocks(index)
+                if blocks is None:
+                    self._dirty = None
+                else:
+                    self._dirty.update(blocks)
+
     def __hash__(self):
         '''
         Hash is required to return an int, so we convert the hex string to int.
@@ -437,33 +679,84 @@ class TrackedArray(np.ndarray):
         return int(self.md5(), 16)
         
     def __setitem__(self, i, y):
-        self._modified = True
+        self._bump(i)
         super(self.__class__, self).__setitem__(i, y)
 
     def __setslice__(self, i, j, y):
-        self._modified = True
+        self._bump(slice(i, j))
         super(self.__class__, self).__setslice__(i, j, y)
 
+def _tracked_inplace(name):
+    '''
+    Wrap an in- place operator of np.ndarray so it bumps the version
+    of a TrackedArray.
+    '''
+    method = getattr(np.ndarray, name)
+    @wraps(method)
+    def inplace(self, *args, **kwargs):
+        self._bump()
+        return method(self, *args, **kwargs)
+    return inplace
+
+for _name in ['__iadd__', '__isub__', '__imul__', '__itruediv__', 
+              '__ifloordiv__', '__imod__', '__ipow__', '__ilshift__', 
+              '__irshift__', '__iand__', '__ixor__', '__ior__', 
+              'fill', 'sort', 'put', 'itemset', 'resize']:
+    if hasattr(np.ndarray, _name):
+        setattr(TrackedArray, _name, _tracked_inplace(_name))
+
 def cache_decorator(function):
     @wraps(function)
     def get_cached(*args, **kwargs):
         self = args[0]
         name = function.__name__
-        if not (name in self._cache):
-            tic = time.time()
-            self._cache[name] = function(*args, **kwargs)
+        if name in self._cache:
+            self._cache._event(name, 'hits')
+            return self._cache.get(name)
+        namespace = type(self).__name__
+        if self._cache.disk_load(name, namespace):
+            return self._cache.get(name)
+        tic = time.time()
+        with self._cache.computing(name):
+            value = self._cache.set(name, function(*args, **kwargs))
             toc = time.time()
-            log.debug('%s was not in cache, executed in %.6f',
-                      name,
-                      toc-tic)
-        return self._cache[name]
+            self._cache._cost[name] = toc - tic
+            self._cache.disk_save(name, namespace)
+        self._cache._event(name, 'misses')
+        self._cache._event(name, 'compute_time', toc-tic)
+        log.debug('%s was not in cache, executed in %.6f',
+                  name,
+                  toc-tic)
+        return value
     return property(get_cached)
 
 class Cache:
     '''
     Class to cache values until an id function changes.
+
+    If a DataStore is passed as store, the cache is versioned instead: 
+    every value remembers which keys of the store were read while it
+    was computed and the version of each, and only that value is 
+    dropped when one of them changes. This avoids hashing the store
+    on every access.
+
+    Hits, misses, compute time, invalidations and the approximate size
+    of every key are counted, and available from stats(). The same 
+    counters summed over every cache are available from cache_stats().
+    Hits and misses are only counted when a cached property is 
+    requested, so reads with get by the library itself aren't included.
+
+    If max_bytes is set, or a process- wide limit is set with 
+    set_cache_limit, values computed by cache_decorator are evicted 
+    when the limit is exceeded and recomputed when next requested.
+    Values stored directly, outside of a cached property, are never
+    evicted as they may not be possible to regenerate.
+
+    If a trimesh.caching.DiskCache is set as disk, or for every cache
+    with trimesh.caching.set_disk_cache, cached properties are loaded 
+    from it on a miss before being computed, and saved to it after.
     '''
-    def __init__(self, id_function=None):
+    def __init__(self, id_function=None, store=None, max_bytes=None):
         if id_function is None:
             self._id_function = lambda: None
         else:
@@ -471,6 +764,38 @@ class Cache:
         self.id_current   = None
         self._lock = 0
         self.cache = {}
+        # for a versioned cache, {key : {store key : version}}
+        self._store   = store
+        self._depends = {}
+        # {key : {counter name : value}} and {key : bytes held}
+        self._stats  = {}
+        self._nbytes = {}
+        self._held   = 0
+        # maximum bytes held, and the eviction policy, 'lru' or 'cost'
+        # where None uses the process- wide setting
+        self.max_bytes = max_bytes
+        self.policy    = None
+        # {key : cached property which computed it} for evictable keys
+        # {key : tick of last use}, {cached property : seconds to compute}
+        self._owner = {}
+        self._used  = {}
+        self._cost  = {}
+        # stack of cached properties being computed
+        self._computing = []
+        # DiskCache for this cache, None uses the process- wide one
+        self.disk = None
+        _caches.add(self)
+
+    @property
+    def versioned(self):
+        '''
+        Is the cache invalidated per- key by DataStore versions.
+
+        Returns
+        ----------
+        versioned: bool
+        '''
+        return self._store is not None
         
     def get(self, key):
         '''
@@ -478,8 +803,12 @@ class Cache:
 
         If the key is unavailable or the cache has been invalidated returns None.
         '''
-        self.verify()
+        if self.versioned:
+            self._verify_key(key)
+        else:
+            self.verify()
         if key in self.cache: 
+            self._used[key] = next(_ticks)
             return self.cache[key]
         return None
         
@@ -488,6 +817,10 @@ class Cache:
         Verify that the cached values are still for the same value of id_function, 
         and delete all stored items if the value of id_function has changed. 
         '''
+        if self.versioned:
+            for key in list(self.cache.keys()):
+                self._verify_key(key)
+            return
         id_new = self._id_function()
         if (self._lock == 0) and (id_new != self.id_current):
             if len(self.cache) > 0:
@@ -497,29 +830,244 @@ class Cache:
             self.clear()
             self.id_set()
 
+    def _verify_key(self, key):
+        '''
+        For a versioned cache, delete a key if anything it was computed
+        from has changed, and otherwise add its dependencies to
+        the value currently being computed.
+        '''
+        if key not in self.cache:
+            return
+        depends = self._depends.get(key, {})
+        if self._lock == 0:
+            stale = [k for k, v in depends.items() 
+                     if self._store.version(k) != v]
+            if len(stale) > 0:
+                log.debug('%s cleared from cache as %s changed', 
+                          key,
+                          str(stale))
+                self._remove([key], 'invalidated')
+                return
+        if len(self._store._reads) > 0:
+            self._store._reads[-1].update(depends.keys())
+
+    def recording(self, merge=True):
+        '''
+        Context manager which records the keys of the store read
+        while a value is computed, as dependencies of that value.
+
+        Arguments
+        ----------
+        merge: bool, if False keys read inside the block are not
+               added to the value being computed outside of it
+        '''
+        if self.versioned:
+            return self._store.recording(merge=merge)
+        return _NullContext()
+
+    def computing(self, key):
+        '''
+        Context manager for computing a cached property: values set
+        inside it are evicted together with key, and eviction is 
+        deferred until it exits.
+        '''
+        return _CacheComputing(self, key)
+
+    def _stamp(self, key):
+        '''
+        Record the current version of everything a key depends on.
+        '''
+        reads = self._store._reads
+        if len(reads) > 0 and len(reads[-1]) > 0:
+            keys = reads[-1]
+        else:
+            # not computed inside a recording, so depend on everything
+            keys = self._store.keys()
+        self._depends[key] = {k: self._store.version(k) for k in keys}
+
     def clear(self, exclude=None):
         '''
         Remove all elements in the cache. 
         '''
         if exclude is None:
-            self.cache = {}
+            exclude = []
+        self._remove([k for k in self.cache.keys() if k not in exclude], 
+                     'invalidated')
+
+    def _remove(self, keys, reason):
+        '''
+        Remove keys from the cache, counting why in the stats.
+        '''
+        for key in keys:
+            if key not in self.cache:
+                continue
+            self._event(key, reason)
+            self.cache.pop(key)
+            self._depends.pop(key, None)
+            self._owner.pop(key, None)
+            self._used.pop(key, None)
+            self._resize(key, 0)
+
+    def _resize(self, key, nbytes):
+        '''
+        Set the bytes held by key, keeping the totals up to date.
+        '''
+        change = nbytes - self._nbytes.pop(key, 0)
+        if nbytes > 0:
+            self._nbytes[key] = nbytes
+        self._held += change
+        _cache_limit['held'] += change
+
+    def _store_value(self, key, value, evictable=False):
+        '''
+        Put a value into the cache, recording its size and which 
+        cached property it belongs to.
+        '''
+        self.cache[key] = value
+        self._resize(key, nbytes_object(value))
+        self._used[key] = next(_ticks)
+        owner = self._owner.get(key, key)
+        if owner != key and owner in self.cache:
+            # values computed alongside another property, then stored
+            # again by their own property, stay with the first one as
+            # their property may only read them back after populating it
+            pass
+        elif len(self._computing) > 0:
+            self._owner[key] = self._computing[-1]
+        elif evictable:
+            self._owner[key] = key
         else:
-            self.cache = {k:v for k,v in self.cache.items() if k in exclude}
+            self._owner.pop(key, None)
+
+    def _disk(self):
+        if self.disk is not None:
+            return self.disk
+        return _cache_disk['disk']
+
+    def disk_load(self, key, namespace):
+        '''
+        Load key and every value computed with it from the disk cache.
+
+        Arguments
+        ----------
+        key:       str, name of cached property
+        namespace: str, name of the class the property belongs to
+
+        Returns
+        ----------
+        loaded: bool, True if key is now in the cache
+        '''
+        disk = self._disk()
+        if disk is None or key not in disk.keys:
+            return False
+        identifier = self._id_function()
+        if identifier is None:
+            return False
+        values = disk.load(identifier, namespace + '.' + key)
+        if values is None or key not in values:
+            return False
+        with self.computing(key):
+            for name, value in values.items():
+                self.set(name, value)
+        self._event(key, 'loaded')
+        log.debug('%s loaded from disk cache', key)
+        return True
+
+    def disk_save(self, key, namespace):
+        '''
+        Save key and every value computed with it to the disk cache.
+
+        Arguments
+        ----------
+        key:       str, name of cached property
+        namespace: str, name of the class the property belongs to
+
+        Returns
+        ----------
+        saved: bool, True if the values were written
+        '''
+        disk = self._disk()
+        if disk is None or key not in disk.keys or key not in self.cache:
+            return False
+        identifier = self._id_function()
+        if identifier is None:
+            return False
+        keys = set(k for k, owner in self._owner.items() if owner == key)
+        keys.add(key)
+        try:
+            return disk.save(identifier, 
+                             namespace + '.' + key, 
+                             {k: self.cache[k] for k in keys if k in self.cache})
+        except (IOError, OSError):
+            log.warning('unable to save %s to disk cache', key, exc_info=True)
+            return False
 
     def update(self, items):
         '''
         Update the cache with a set of key, value pairs without checking id_function.
         '''
-        self.cache.update(items)
+        for key, value in items.items():
+            self._store_value(key, value)
+            if self.versioned:
+                self._stamp(key)
         self.id_set()
+        self.evict()
        
     def id_set(self):
+        if self.versioned:
+            return
         self.id_current = self._id_function()
 
-    def set(self, key, value):
-        self.verify()
-        self.cache[key] = value
+    def set(self, key, value, evictable=False):
+        '''
+        Put a value into the cache.
+
+        Arguments
+        ----------
+        key:       hashable, key to store value under
+        value:     object to cache
+        evictable: bool, if True the value may be evicted even when 
+                   not set by a cached property, as the caller will
+                   regenerate it if it is missing
+
+        Returns
+        ----------
+        value: the value passed
+        '''
+        if self.versioned:
+            self._verify_key(key)
+            self._stamp(key)
+        else:
+            self.verify()
+        self._store_value(key, value, evictable)
+        # the caller may read the value back from the cache
+        self.evict(keep=key)
         return value
+
+    def evict(self, keep=None):
+        '''
+        Evict values until this cache is under max_bytes and every 
+        cache is under the process- wide limit. 
+
+        Nothing is evicted while a cached property is being computed.
+
+        Arguments
+        ----------
+        keep: key of this cache which should not be evicted
+        '''
+        if len(self._computing) > 0 or self._lock > 0:
+            return
+        if keep is not None:
+            keep = (self, keep)
+        if self.max_bytes is not None and self._held > self.max_bytes:
+            _evict_caches([self], self.max_bytes, self.policy, keep)
+        limit = _cache_limit['max_bytes']
+        if limit is not None and _cache_limit['held'] > limit:
+            # count again as caches may have been garbage collected
+            caches = list(_caches)
+            _cache_limit['held'] = sum(i._held for i in caches)
+            if _cache_limit['held'] > limit:
+                _evict_caches(caches, limit, None, keep)
         
     def __getitem__(self, key):
         return self.get(key)
@@ -528,7 +1076,10 @@ class Cache:
         return self.set(key, value)
 
     def __contains__(self, key):
-        self.verify()
+        if self.versioned:
+            self._verify_key(key)
+        else:
+            self.verify()
         return key in self.cache
 
     def __enter__(self):
@@ -536,8 +1087,153 @@ class Cache:
         
     def __exit__(self, *args):
         self._lock -= 1
+        if self.versioned:
+            # like resetting id_current, values kept through the
+            # locked block are valid for the current data
+            for key, depends in self._depends.items():
+                self._depends[key] = {k: self._store.version(k) 
+                                      for k in depends.keys()}
+            return
         self.id_current = self._id_function()
 
+    def _event(self, key, name, value=1):
+        '''
+        Add value to the counter name of key, here and in the
+        totals across every cache.
+        '''
+        for stats in (self._stats, _cache_totals):
+            if key not in stats:
+                stats[key] = _empty_stats()
+            stats[key][name] += value
+
+    def stats(self):
+        '''
+        Usage statistics for every key of this cache.
+
+        Returns
+        ----------
+        stats: dict, {key : {'hits'         : int, 
+                             'misses'       : int, 
+                             'compute_time' : float, seconds, 
+                             'invalidated'  : int, 
+                             'evicted'      : int,
+                             'loaded'       : int, from disk
+                             'nbytes'       : int, approximate size held}}
+        '''
+        return _merge_stats([self])
+
+    def reset_stats(self):
+        '''
+        Set the counters of this cache to zero.
+        '''
+        self._stats = {}
+
+    def __setstate__(self, state):
+        # copies of a cache are counted in the global stats too
+        self.__dict__.update(state)
+        _caches.add(self)
+        _cache_limit['held'] += self._held
+
+class _CacheComputing(object):
+    '''
+    Track the cached property being computed, and the store keys
+    it reads, for the duration of a block.
+    '''
+    def __init__(self, cache, key):
+        self._cache  = cache
+        self._key    = key
+        self._record = cache.recording()
+
+    def __enter__(self):
+        self._cache._computing.append(self._key)
+        self._record.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self._record.__exit__(*args)
+        self._cache._computing.pop()
+        self._cache.evict()
+        return False
+
+def _evict_caches(caches, max_bytes, policy=None, keep=None):
+    '''
+    Evict values from caches until they hold less than max_bytes.
+
+    Values are evicted together with every value set while they
+    were computed, least recently used first for the 'lru' policy,
+    or cheapest to recompute per byte first for 'cost'. 
+
+    Arguments
+    ----------
+    caches:    sequence of Cache objects
+    max_bytes: int, bytes the caches should hold in total
+    policy:    str, 'lru' or 'cost', or None for the process- wide policy
+    keep:      (Cache, key), a value which should not be evicted
+    '''
+    if policy is None:
+        policy = _cache_limit['policy']
+    if policy not in ['lru', 'cost']:
+        raise ValueError('Eviction policy must be lru or cost!')
+
+    held = sum(i._held for i in caches)
+    candidates = deque()
+    for cache in caches:
+        if len(cache._computing) > 0 or cache._lock > 0:
+            continue
+        groups = defaultdict(list)
+        for key, owner in cache._owner.items():
+            groups[owner].append(key)
+        for owner, keys in groups.items():
+            if keep is not None and keep[0] is cache and keep[1] in keys:
+                continue
+            nbytes = sum(cache._nbytes.get(k, 0) for k in keys)
+            used   = max(cache._used.get(k, 0) for k in keys)
+            if policy == 'cost':
+                score = (cache._cost.get(owner, 0.0) / max(nbytes, 1), used)
+            else:
+                score = (used,)
+            candidates.append((score, id(cache), cache, keys, nbytes))
+
+    for score, index, cache, keys, nbytes in sorted(candidates, 
+                                                    key=lambda x: x[:2]):
+        if held <= max_bytes:
+            break
+        log.debug('evicting %s from cache to free %d bytes', 
+                  str(keys), 
+                  nbytes)
+        cache._remove(keys, 'evicted')
+        held -= nbytes
+
+def set_cache_limit(max_bytes=None, policy='lru'):
+    '''
+    Set a limit on the bytes held by every Cache in the process.
+
+    Arguments
+    ----------
+    max_bytes: int, maximum bytes held, or None for no limit
+    policy:    str, 'lru' evicts the least recently used values first,
+               'cost' evicts the values which are cheapest to recompute
+               per byte first
+    '''
+    if policy not in ['lru', 'cost']:
+        raise ValueError('Eviction policy must be lru or cost!')
+    _cache_limit['max_bytes'] = max_bytes
+    _cache_limit['policy']    = policy
+    if max_bytes is not None:
+        caches = list(_caches)
+        _cache_limit['held'] = sum(i._held for i in caches)
+        if _cache_limit['held'] > max_bytes:
+            _evict_caches(caches, max_bytes)
+
+class _NullContext(object):
+    '''
+    Context manager which does nothing.
+    '''
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        return False
+
 class DataStore:
     @property
     def mutable(self):
@@ -566,11 +1262,15 @@ class DataStore:
 
     def __init__(self):
         self.data = {}
+        # stack of sets of keys read, for cache dependency tracking
+        self._reads = []
 
     def clear(self):
         self.data = {}
 
     def __getitem__(self,key):
+        if len(self._reads) > 0:
+            self._reads[-1].add(key)
         try:
             return self.data[key]
         except KeyError:
@@ -582,14 +1282,155 @@ class DataStore:
     def __len__(self):
         return len(self.data)
 
+    def keys(self):
+        return self.data.keys()
+
     def values(self):
         return self.data.values()
 
+    def version(self, key):
+        '''
+        The version of the array stored at key.
+
+        Returns
+        ----------
+        version: int, or None if key isn't stored
+        '''
+        if key not in self.data:
+            return None
+        return self.data[key].version
+
+    def recording(self, merge=True):
+        '''
+        Context manager which records every key read inside it.
+        Keys read in nested recordings are also added to the outer 
+        one unless merge is False.
+        '''
+        return _StoreRecording(self, merge)
+
     def md5(self):
-        md5 = ''
-        for key in np.sort(list(self.data.keys())):
-            md5 += self.data[key].md5()
-        return md5
+        '''
+        A hash of every stored array and the key it is stored at.
+
+        Returns
+        ----------
+        md5: str, hexadecimal hash
+        '''
+        hashes = [key + ':' + self.data[key].md5() 
+                  for key in sorted(self.data.keys())]
+        return md5_object(';'.join(hashes).encode('utf-8'))
+
+class _StoreRecording(object):
+    '''
+    Push a set of read keys onto a DataStore for the duration of a block.
+    '''
+    def __init__(self, store, merge=True):
+        self._store = store
+        self._merge = merge
+
+    def __enter__(self):
+        self._store._reads.append(set())
+        return self._store._reads[-1]
+
+    def __exit__(self, *args):
+        reads = self._store._reads.pop()
+        if self._merge and len(self._store._reads) > 0:
+            self._store._reads[-1].update(reads)
+        return False
+
+def nbytes_object(obj):
+    '''
+    Approximate the memory used by an object.
+
+    Arrays and array- like objects (including scipy.sparse matrices)
+    report their buffers, sequences and dicts are summed, and other
+    objects (such as a BVH or Trimesh) are summed over the arrays,
+    DataStore and Cache objects in their attributes.
+
+    Returns
+    ----------
+    nbytes: int, approximate number of bytes
+    '''
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (list, tuple, set, deque)):
+        return sum(nbytes_object(i) for i in obj)
+    if isinstance(obj, dict):
+        return sum(nbytes_object(i) for i in obj.values())
+    if isinstance(obj, DataStore):
+        return nbytes_object(list(obj.values()))
+    if isinstance(obj, Cache):
+        return int(sum(obj._nbytes.values()))
+    if hasattr(obj, 'nbytes'):
+        try:
+            return int(obj.nbytes)
+        except (TypeError, ValueError):
+            pass
+    # scipy.sparse matrices
+    buffers = [getattr(obj, i) for i in ['data', 'indices', 'indptr', 'row', 'col']
+               if isinstance(getattr(obj, i, None), np.ndarray)]
+    if len(buffers) > 0:
+        return nbytes_object(buffers)
+    # objects like Trimesh or BVH, where only the attributes which
+    # hold data are counted rather than references to other objects
+    if hasattr(obj, '__dict__'):
+        held = [v for v in obj.__dict__.values() 
+                if isinstance(v, (np.ndarray, DataStore, Cache))]
+        if len(held) > 0:
+            return nbytes_object(held)
+    return int(getsizeof(obj))
+
+def _empty_stats():
+    return {'hits'         : 0,
+            'misses'       : 0,
+            'compute_time' : 0.0,
+            'invalidated'  : 0,
+            'evicted'      : 0,
+            'loaded'       : 0}
+
+def _merge_stats(caches, counters=None):
+    '''
+    Sum the counters and held bytes of caches by key.
+    '''
+    merged = {}
+    if counters is not None:
+        for key, value in counters.items():
+            merged[key] = dict(value)
+    for cache in caches:
+        if counters is None:
+            for key, value in cache._stats.items():
+                if key not in merged:
+                    merged[key] = _empty_stats()
+                for name, count in value.items():
+                    merged[key][name] += count
+        for key, nbytes in cache._nbytes.items():
+            if key not in merged:
+                merged[key] = _empty_stats()
+            merged[key]['nbytes'] = merged[key].get('nbytes', 0) + nbytes
+    for value in merged.values():
+        value.setdefault('nbytes', 0)
+    return merged
+
+def cache_stats():
+    '''
+    Usage statistics for every key summed across every Cache, 
+    including caches which have since been garbage collected.
+    nbytes is the size currently held by live caches.
+
+    Returns
+    ----------
+    stats: dict, {key : {'hits', 'misses', 'compute_time', 
+                         'invalidated', 'nbytes'}}
+    '''
+    return _merge_stats(list(_caches), counters=_cache_totals)
+
+def reset_cache_stats():
+    '''
+    Set the counters of every Cache to zero.
+    '''
+    _cache_totals.clear()
+    for cache in list(_caches):
+        cache.reset_stats()
 
 def stack_lines(indices):
     return np.column_stack((indices[:-1],
@@ -813,7 +1654,8 @@ def concatenate(a, b):
 def submesh(mesh, 
             faces_sequence, 
             only_watertight = False, 
-            append          = False):
+            append          = False,
+            packed          = False):
     '''
     Return a subset of a mesh.
 
@@ -824,77 +1666,400 @@ def submesh(mesh,
     only_watertight: only return submeshes which are watertight. 
     append: return a single mesh which has the faces specified appended.
             if this flag is set, only_watertight is ignored
+    packed: return a PackedMeshes object which stores every submesh in
+            shared arrays, and only creates a Trimesh when indexed
 
     Returns
     ---------
-    if append: Trimesh object
-    else:      list of Trimesh objects
+    if append:   Trimesh object
+    elif packed: PackedMeshes object
+    else:        list of Trimesh objects
     '''
     # evaluate generators so we can escape early
     faces_sequence = list(faces_sequence)
 
-    if len(faces_sequence) == 0: return []
-
-    # check to make sure we're not doing a whole bunch of work
-    # to deliver a subset which ends up as the whole mesh
-    if len(faces_sequence[0]) == len(mesh.faces):
-        all_faces = np.array_equal(np.sort(faces_sequence),
-                                   np.arange(len(faces_sequence)))
-        if all_faces:
-            log.debug('Subset of entire mesh requested, returning copy of original')
-            return mesh.copy()
-
-    # avoid nuking the cache on the original mesh
-    original_faces    = mesh.faces.view(np.ndarray)
-    original_vertices = mesh.vertices.view(np.ndarray)
-
-    faces    = deque()
-    vertices = deque()
-    normals  = deque()
-    visuals  = deque()
-
-    # for reindexing faces
-    mask = np.arange(len(original_vertices))    
-
-    for faces_index in faces_sequence:        
-        # sanitize indices in case they are coming in as a set or tuple
-        faces_index   = np.array(list(faces_index))
-        faces_current = original_faces[faces_index]
-        unique = np.unique(faces_current.reshape(-1))
-        
-        # redefine face indices from zero
-        mask[unique] = np.arange(len(unique))
-
-        normals.append(mesh.face_normals[faces_index])
-        faces.append(mask[faces_current])
-        vertices.append(original_vertices[unique])
-        visuals.extend(mesh.visual.subsets([faces_index]))
-    # we use type(mesh) rather than importing Trimesh from base
-    # as this causes a circular import
-    trimesh_type = type_named(mesh, 'Trimesh')
+    if len(faces_sequence) == 0: 
+        if packed:
+            return PackedMeshes.from_faces(mesh, faces_sequence)
+        return []
+
+    result = PackedMeshes.from_faces(mesh, faces_sequence)
     if append:
-        visuals = np.array(visuals)
-        vertices, faces = append_faces(vertices, faces)
-        appended = trimesh_type(vertices = vertices,
-                                faces = faces,
-                                face_normals = np.vstack(normals),
-                                visual = visuals[0].union(visuals[1:]),
-                                process = False)
-        return appended
-    result = [trimesh_type(vertices     = v, 
-                           faces        = f, 
-                           face_normals = n,
-                           visual       = c,
-                           metadata     = mesh.metadata,
-                           process = False) for v,f,n,c in zip(vertices, 
-                                                               faces, 
-                                                               normals,
-                                                               visuals)]
-    result = np.array(result)
+        return result.appended()
     if only_watertight:
-        watertight = np.array([i.fill_holes() and len(i.faces) > 4 for i in result])
-        result     = result[watertight]
-    return result
+        result = result.watertight_only()
+    if packed:
+        return result
+    meshes = np.empty(len(result), dtype=object)
+    for index, mesh in enumerate(result):
+        meshes[index] = mesh
+    return meshes
+
+class PackedMeshes(object):
+    '''
+    A sequence of meshes stored in shared vertex and face arrays, 
+    with offset arrays marking where each mesh starts.
+
+    Faces index vertices of their own mesh from zero. Indexing 
+    creates a new Trimesh object from copies of the mesh's slices.
+    '''
+    def __init__(self, 
+                 vertices,
+                 faces,
+                 face_normals,
+                 vertex_offsets,
+                 face_offsets,
+                 face_colors = None,
+                 mesh_type   = None,
+                 visual_type = None,
+                 metadata    = None):
+        '''
+        Arguments
+        ----------
+        vertices:       (n,3) float, vertices of every mesh
+        faces:          (m,3) int, faces of every mesh, indexing 
+                        vertices of their own mesh from zero
+        face_normals:   (m,3) float, normal of every face
+        vertex_offsets: (p+1,) int, index of first vertex of each mesh,
+                        ending with the number of vertices
+        face_offsets:   (p+1,) int, index of first face of each mesh,
+                        ending with the number of faces
+        face_colors:    (m,(3,4)) int, color of every face, or None
+        mesh_type:      class to create meshes with, usually Trimesh
+        visual_type:    class to create visual attributes with
+        metadata:       dict, passed to every created mesh
+        '''
+        self.vertices       = vertices
+        self.faces          = faces
+        self.face_normals   = face_normals
+        self.vertex_offsets = np.asanyarray(vertex_offsets, dtype=np.int64)
+        self.face_offsets   = np.asanyarray(face_offsets, dtype=np.int64)
+        self.face_colors    = face_colors
+        self.mesh_type      = mesh_type
+        self.visual_type    = visual_type
+        self.metadata       = metadata
+
+    @classmethod
+    def from_faces(cls, mesh, faces_sequence):
+        '''
+        Pack subsets of the faces of a mesh, remapping the vertex 
+        indices of every subset with a single sort.
+
+        Arguments
+        ----------
+        mesh:           Trimesh object
+        faces_sequence: sequence of face indices from mesh
+
+        Returns
+        ----------
+        packed: PackedMeshes object
+        '''
+        faces_sequence = [np.asanyarray(list(i), dtype=np.int64).reshape(-1)
+                          for i in faces_sequence]
+        face_counts = np.array([len(i) for i in faces_sequence], dtype=np.int64)
+        if len(faces_sequence) > 0:
+            face_index = np.concatenate(faces_sequence)
+        else:
+            face_index = np.zeros(0, dtype=np.int64)
+        component = np.repeat(np.arange(len(faces_sequence)), face_counts)
+
+        # avoid nuking the cache on the original mesh
+        original_faces    = mesh.faces.view(np.ndarray)
+        original_vertices = mesh.vertices.view(np.ndarray)
+
+        # give every vertex of every subset a unique key, so one sort 
+        # finds the unique vertices of every subset and the remapping
+        referenced = original_faces[face_index]
+        count = len(original_vertices)
+        keys  = (component.reshape((-1,1)) * count) + referenced
+        unique, inverse = np.unique(keys.reshape(-1), return_inverse=True)
+
+        vertex_counts  = np.bincount(unique // count, 
+                                     minlength = len(faces_sequence))
+        vertex_offsets = np.append(0, np.cumsum(vertex_counts))
+        face_offsets   = np.append(0, np.cumsum(face_counts))
+
+        # redefine face indices from zero for every subset
+        faces = (inverse.reshape((-1,3)) - 
+                 vertex_offsets[:-1][component].reshape((-1,1)))
+
+        face_colors = None
+        if mesh.visual._set['face']:
+            face_colors = mesh.visual._data['face_colors'][face_index]
+
+        return cls(vertices       = original_vertices[unique % count],
+                   faces          = faces,
+                   face_normals   = mesh.face_normals[face_index],
+                   vertex_offsets = vertex_offsets,
+                   face_offsets   = face_offsets,
+                   face_colors    = face_colors,
+                   # we use type(mesh) rather than importing Trimesh from base
+                   # as this causes a circular import
+                   mesh_type      = type_named(mesh, 'Trimesh'),
+                   visual_type    = type(mesh.visual),
+                   metadata       = mesh.metadata)
+
+    @classmethod
+    def from_meshes(cls, meshes):
+        '''
+        Pack a sequence of meshes.
+
+        Arguments
+        ----------
+        meshes: sequence of Trimesh objects
+
+        Returns
+        ----------
+        packed: PackedMeshes object
+        '''
+        meshes = list(meshes)
+        if len(meshes) == 0:
+            raise ValueError('No meshes to pack!')
+        vertices = [i.vertices.view(np.ndarray) for i in meshes]
+        faces    = [i.faces.view(np.ndarray) for i in meshes]
+        face_colors = None
+        if all(i.visual._set['face'] for i in meshes):
+            face_colors = np.vstack([i.visual._data['face_colors'] for i in meshes])
+        return cls(vertices       = np.vstack(vertices),
+                   faces          = np.vstack(faces),
+                   face_normals   = np.vstack([i.face_normals for i in meshes]),
+                   vertex_offsets = np.append(0, np.cumsum([len(i) for i in vertices])),
+                   face_offsets   = np.append(0, np.cumsum([len(i) for i in faces])),
+                   face_colors    = face_colors,
+                   mesh_type      = type_named(meshes[0], 'Trimesh'),
+                   visual_type    = type(meshes[0].visual),
+                   metadata       = meshes[0].metadata)
+
+    def __len__(self):
+        return len(self.face_offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        '''
+        Create a Trimesh object for a packed mesh.
+
+        Arguments
+        ----------
+        index: int, index of mesh
+
+        Returns
+        ----------
+        mesh: Trimesh object, with copies of the packed arrays
+        '''
+        if not isinstance(index, (int, np.integer)):
+            return self.subset(index)
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('packed mesh index out of range!')
+
+        vertex = slice(*self.vertex_offsets[index:index+2])
+        face   = slice(*self.face_offsets[index:index+2])
+        if self.face_colors is None:
+            visual = self.visual_type()
+        else:
+            visual = self.visual_type(face_colors = self.face_colors[face].copy())
+        mesh = self.mesh_type(vertices     = self.vertices[vertex].copy(),
+                              faces        = self.faces[face].copy(),
+                              face_normals = self.face_normals[face].copy(),
+                              visual       = visual,
+                              metadata     = self.metadata,
+                              process      = False)
+        return mesh
+
+    @property
+    def vertex_counts(self):
+        '''
+        Returns
+        ----------
+        vertex_counts: (n,) int, number of vertices in each mesh
+        '''
+        return np.diff(self.vertex_offsets)
+
+    @property
+    def face_counts(self):
+        '''
+        Returns
+        ----------
+        face_counts: (n,) int, number of faces in each mesh
+        '''
+        return np.diff(self.face_offsets)
+
+    @property
+    def face_mesh(self):
+        '''
+        Returns
+        ----------
+        face_mesh: (m,) int, index of mesh each face belongs to
+        '''
+        return np.repeat(np.arange(len(self)), self.face_counts)
+
+    @property
+    def faces_packed(self):
+        '''
+        Faces indexing the shared vertex array.
+
+        Returns
+        ----------
+        faces: (m,3) int, faces of every mesh
+        '''
+        return self.faces + self.vertex_offsets[:-1][self.face_mesh].reshape((-1,1))
+
+    @property
+    def watertight(self):
+        '''
+        Check every mesh for edges which aren't shared by exactly two faces.
+
+        Returns
+        ----------
+        watertight: (n,) bool, is each mesh watertight
+        '''
+        faces = self.faces_packed
+        edges = np.sort(faces[:,[0,1,1,2,2,0]].reshape((-1,2)), axis=1)
+        count = max(len(self.vertices), 1)
+        keys  = np.sort(edges[:,0] * count + edges[:,1])
+
+        # find edges which aren't included exactly twice from run lengths
+        start  = np.append(0, np.nonzero(np.diff(keys))[0] + 1)
+        length = np.diff(np.append(start, len(keys)))
+        broken = keys[start[length != 2]] // count
+
+        # vertices are only used by one mesh, so the first 
+        # vertex of an edge tells us which mesh it belongs to
+        vertex_mesh = np.repeat(np.arange(len(self)), self.vertex_counts)
+        watertight  = np.ones(len(self), dtype=bool)
+        watertight[vertex_mesh[broken]] = False
+        return watertight
+
+    def subset(self, index):
+        '''
+        Pack a subset of the meshes, without creating any Trimesh objects.
+
+        Arguments
+        ----------
+        index: (n,) int, or (len(self),) bool, meshes to keep
+
+        Returns
+        ----------
+        packed: PackedMeshes object
+        '''
+        index = np.arange(len(self))[index].reshape(-1)
+        vertex, vertex_offsets = _gather_ranges(self.vertex_offsets, index)
+        face,   face_offsets   = _gather_ranges(self.face_offsets, index)
+        face_colors = None
+        if self.face_colors is not None:
+            face_colors = self.face_colors[face]
+        return PackedMeshes(vertices       = self.vertices[vertex],
+                            faces          = self.faces[face],
+                            face_normals   = self.face_normals[face],
+                            vertex_offsets = vertex_offsets,
+                            face_offsets   = face_offsets,
+                            face_colors    = face_colors,
+                            mesh_type      = self.mesh_type,
+                            visual_type    = self.visual_type,
+                            metadata       = self.metadata)
+
+    def appended(self):
+        '''
+        Create a single Trimesh object containing every packed mesh.
+
+        Returns
+        ----------
+        appended: Trimesh object
+        '''
+        if self.face_colors is None:
+            visual = self.visual_type()
+        else:
+            visual = self.visual_type(face_colors = self.face_colors.copy())
+        appended = self.mesh_type(vertices     = self.vertices.copy(),
+                                  faces        = self.faces_packed,
+                                  face_normals = self.face_normals.copy(),
+                                  visual       = visual,
+                                  process      = False)
+        return appended
+
+    def watertight_only(self):
+        '''
+        Keep only meshes which are watertight, or which have holes
+        that can be filled, and have more than four faces. 
+
+        Only meshes with holes are turned into Trimesh objects.
+
+        Returns
+        ----------
+        packed: PackedMeshes object
+        '''
+        counts = self.face_counts
+        closed = self.watertight
+        watertight = closed & (counts > 4)
+        filled = deque()
+        for index in np.nonzero(~closed & (counts > 4))[0]:
+            mesh = self[index]
+            if mesh.fill_holes():
+                filled.append((index, mesh))
+        if len(filled) == 0:
+            return self.subset(watertight)
+
+        # pack the filled meshes after the watertight ones, 
+        # then put them back in their original order
+        index  = np.append(np.nonzero(watertight)[0], [i[0] for i in filled])
+        packed = self.subset(watertight).concatenate(
+            PackedMeshes.from_meshes([i[1] for i in filled]))
+        return packed.subset(np.argsort(index))
+
+    def concatenate(self, other):
+        '''
+        Pack the meshes of this and another PackedMeshes object.
+
+        Arguments
+        ----------
+        other: PackedMeshes object
+
+        Returns
+        ----------
+        packed: PackedMeshes object
+        '''
+        face_colors = None
+        if self.face_colors is not None and other.face_colors is not None:
+            face_colors = np.vstack((self.face_colors, other.face_colors))
+        return PackedMeshes(vertices       = np.vstack((self.vertices, other.vertices)),
+                            faces          = np.vstack((self.faces, other.faces)),
+                            face_normals   = np.vstack((self.face_normals, 
+                                                        other.face_normals)),
+                            vertex_offsets = np.append(self.vertex_offsets, 
+                                                       other.vertex_offsets[1:] + 
+                                                       self.vertex_offsets[-1]),
+                            face_offsets   = np.append(self.face_offsets, 
+                                                       other.face_offsets[1:] + 
+                                                       self.face_offsets[-1]),
+                            face_colors    = face_colors,
+                            mesh_type      = self.mesh_type,
+                            visual_type    = self.visual_type,
+                            metadata       = self.metadata)
+
+def _gather_ranges(offsets, index):
+    '''
+    Find the elements of selected ranges of a packed array.
+
+    Arguments
+    ----------
+    offsets: (n+1,) int, start of each range, ending with the total
+    index:   (m,) int, which ranges to select
+
+    Returns
+    ----------
+    gather:  (p,) int, elements of the selected ranges, in order
+    offsets: (m+1,) int, start of each selected range in gather
+    '''
+    starts  = offsets[:-1][index]
+    lengths = offsets[1:][index] - starts
+    new_offsets = np.append(0, np.cumsum(lengths))
+    gather = (np.arange(new_offsets[-1]) + 
+              np.repeat(starts - new_offsets[:-1], lengths))
+    return gather, new_offsets
 
 def zero_pad(data, count, right=True):
     '''
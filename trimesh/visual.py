@@ -298,15 +298,15 @@ def face_to_vertex_color(mesh, face_colors, dtype=COLOR_DTYPE):
     color_dim = np.shape(face_colors)[1]
 
     vertex_colors = np.zeros((len(mesh.vertices),3,color_dim))
-    population    = np.zeros((len(mesh.vertices),3), dtype=np.bool)
+    population    = np.zeros((len(mesh.vertices),3), dtype=bool)
 
-    vertex_colors[[mesh.faces[:,0],0]] = face_colors
-    vertex_colors[[mesh.faces[:,1],1]] = face_colors
-    vertex_colors[[mesh.faces[:,2],2]] = face_colors
+    vertex_colors[mesh.faces[:,0],0] = face_colors
+    vertex_colors[mesh.faces[:,1],1] = face_colors
+    vertex_colors[mesh.faces[:,2],2] = face_colors
 
-    population[[mesh.faces[:,0], 0]] = True
-    population[[mesh.faces[:,1], 1]] = True
-    population[[mesh.faces[:,2], 2]] = True
+    population[mesh.faces[:,0], 0] = True
+    population[mesh.faces[:,1], 1] = True
+    population[mesh.faces[:,2], 2] = True
 
     # clip the population sum to 1, to avoid a division error in edge cases
     populated     = np.clip(population.sum(axis=1), 1, 3)
@@ -1,26 +1,68 @@
 import numpy as np
-from .grouping   import unique_float
+from .grouping   import unique_float, unique_rows
 from .points     import plot_points
+from .constants  import tol, _log_time
+from .bvh        import _ranges
 from collections import deque
 
 class Voxel:
-    def __init__(self, mesh, pitch): 
-        self._run = mesh_to_run(mesh, pitch)
-        self._raw = None
-        
+    def __init__(self, mesh=None, pitch=None, fill=True, run=None):
+        '''
+        A voxelized representation of a mesh.
+
+        Voxels are stored as runs of filled voxels along Z for every
+        occupied XY column, so memory scales with the surface area of
+        the mesh rather than the volume of its bounding box.
+
+        Arguments
+        ----------
+        mesh:  Trimesh object
+        pitch: float, edge length of a single voxel
+        fill:  bool, if True voxels inside the mesh are filled,
+               otherwise only voxels on the surface are included
+        run:   dict, existing run-length encoding as returned by
+               mesh_to_run, used instead of voxelizing a mesh
+        '''
+        if run is None:
+            run = mesh_to_run(mesh, pitch, fill=fill)
+        self._run  = run
+        self._runs = None
+        self._raw  = None
+
     @property
     def raw(self):
         '''
         Generate a raw 3D boolean array from the internal run-length encoded data
+
+        This allocates the full bounding box of the voxels, for large
+        grids use raw_region or the sparse queries instead.
         '''
         if self._raw is  None:
             self._raw = run_to_raw(**self.run)
         return self._raw
-         
+
     @property
     def run(self):
         return self._run
-        
+
+    @property
+    def runs(self):
+        '''
+        The run-length encoding with one row per run.
+
+        Returns
+        ----------
+        column: (n, 2) int, XY index of the column containing each run
+        start:  (n,) int, first Z index of each run
+        end:    (n,) int, Z index after the last filled voxel of each run
+        '''
+        if self._runs is None:
+            start, end, column = run_flatten(self.run['index_xy'],
+                                             self.run['index_z'])
+            order = np.lexsort((start, column[:,1], column[:,0]))
+            self._runs = column[order], start[order], end[order]
+        return self._runs
+
     @property
     def pitch(self):
         return self.run['pitch']
@@ -29,23 +71,713 @@ class Voxel:
     def origin(self):
         return self.run['origin']
 
+    @property
+    def shape(self):
+        return tuple(self.run['shape'])
+
+    @property
+    def filled_count(self):
+        '''
+        The number of filled voxels.
+        '''
+        start, end = self.runs[1:]
+        return int((end - start).sum())
+
     def volume(self):
-        volume = self.raw.sum() * (self.pitch**2)
+        volume = self.filled_count * (self.pitch**3)
         return volume
-        
+
+    @property
+    def points(self):
+        '''
+        The center of every filled voxel.
+
+        Returns
+        ----------
+        points: (self.filled_count, 3) float, voxel centers
+        '''
+        index  = runs_to_indices(*self.runs)
+        points = ((index + .5) * self.pitch) + self.origin
+        return points
+
+    def raw_region(self, lower, upper):
+        '''
+        A dense boolean array of a subregion of the voxel grid.
+
+        Arguments
+        ----------
+        lower: (3,) int, first voxel index of the region
+        upper: (3,) int, voxel index after the end of the region
+
+        Returns
+        ----------
+        raw: (upper - lower) bool, True for filled voxels
+        '''
+        lower = np.asanyarray(lower, dtype=np.int64)
+        upper = np.asanyarray(upper, dtype=np.int64)
+        column, start, end = self.runs
+
+        start = np.maximum(start, lower[2]) - lower[2]
+        end   = np.minimum(end,   upper[2]) - lower[2]
+        mask  = np.logical_and.reduce((end > start,
+                                       (column >= lower[:2]).all(axis=1),
+                                       (column <  upper[:2]).all(axis=1)))
+        column = column[mask] - lower[:2]
+        raw = run_to_raw(shape    = upper - lower,
+                         index_xy = column,
+                         index_z  = np.column_stack((start[mask], 
+                                                     end[mask])))
+        return raw
+
+    def is_filled(self, points):
+        '''
+        Check whether points in space are inside filled voxels.
+
+        Arguments
+        ----------
+        points: (n, 3) float, points in space
+
+        Returns
+        ----------
+        filled: (n,) bool, True if the point is in a filled voxel
+        '''
+        points = np.asanyarray(points, dtype=np.float64).reshape((-1, 3))
+        index  = np.floor((points - self.origin) / self.pitch).astype(np.int64)
+        column, start, end = self.runs
+
+        filled = np.logical_and((index >= 0).all(axis=1),
+                                (index < self.shape).all(axis=1))
+        if len(start) == 0:
+            return np.zeros(len(points), dtype=bool)
+
+        # runs are sorted by column then start, so the only run which
+        # could contain a voxel is the last run starting at or below it
+        stride    = self.shape[2] + 1
+        key_run   = ((column[:,0] * self.shape[1]) + column[:,1]) * stride + start
+        key_point = ((index[:,0]  * self.shape[1]) + index[:,1])  * stride + index[:,2]
+        candidate = np.searchsorted(key_run, key_point, side='right') - 1
+
+        filled = np.logical_and(filled, candidate >= 0)
+        candidate[candidate < 0] = 0
+        filled = np.logical_and.reduce((filled,
+                                        (column[candidate] == index[:,:2]).all(axis=1),
+                                        index[:,2] < end[candidate]))
+        return filled
+
+    def union(self, other):
+        '''
+        Voxels filled in either this grid or another.
+
+        Arguments
+        ----------
+        other: Voxel object with the same pitch and an aligned origin
+
+        Returns
+        ----------
+        union: Voxel object
+        '''
+        return self._boolean(other, np.logical_or)
+
+    def intersection(self, other):
+        '''
+        Voxels filled in both this grid and another.
+
+        Arguments
+        ----------
+        other: Voxel object with the same pitch and an aligned origin
+
+        Returns
+        ----------
+        intersection: Voxel object
+        '''
+        return self._boolean(other, np.logical_and)
+
+    def difference(self, other):
+        '''
+        Voxels filled in this grid but not in another.
+
+        Arguments
+        ----------
+        other: Voxel object with the same pitch and an aligned origin
+
+        Returns
+        ----------
+        difference: Voxel object
+        '''
+        return self._boolean(other, lambda a, b: np.logical_and(a, np.logical_not(b)))
+
+    def _boolean(self, other, operation):
+        if not np.isclose(self.pitch, other.pitch):
+            raise ValueError('voxel grids must have the same pitch!')
+        offset = [self._global_offset(), other._global_offset()]
+        runs = runs_boolean(_global_runs(self.runs,  offset[0]),
+                            _global_runs(other.runs, offset[1]),
+                            operation)
+        run = _global_to_run(runs, self.pitch, np.minimum(*offset))
+        return Voxel(run=run)
+
+    def _global_offset(self):
+        '''
+        The index of the grid origin on a lattice of the voxel pitch
+        anchored at the world origin.
+        '''
+        offset = self.origin / self.pitch
+        if not np.allclose(offset, np.round(offset), atol=1e-5):
+            raise ValueError('voxel grid origin is not aligned to pitch!')
+        return np.round(offset).astype(np.int64)
+
+    def as_mesh(self):
+        '''
+        Convert the voxels into a Trimesh made of the exposed
+        faces of filled voxels.
+
+        Exposed faces are found from the runs by differencing every
+        column with its neighbors, so the dense grid is never allocated.
+
+        Returns
+        ----------
+        mesh: Trimesh object, the boundary of the filled voxels
+        '''
+        from .base import Trimesh
+        vertices, faces = runs_to_faces(*self.runs)
+        vertices = (vertices * self.pitch) + self.origin
+        return Trimesh(vertices = vertices,
+                       faces    = faces,
+                       process  = False)
+
     def show(self):
-        plot_raw(self.raw, **self.run)
+        plot_points(self.points)
 
 def run_to_raw(shape, index_xy, index_z, **kwargs):
-    raw = np.zeros(shape, dtype=np.bool)
-    for xy, z in zip(index_xy, index_z):
-        for z_start, z_end in np.reshape(z,(-1,2)):
-            raw[xy[0], xy[1]][z_start:z_end] = True
+    '''
+    Convert run-length encoded voxels into a dense 3D boolean array.
+
+    Arguments
+    ----------
+    shape:    (3,) int, shape of the voxel grid
+    index_xy: (n, 2) int, column index of each run group
+    index_z:  (n) sequence of (2*m,) int, [start, end) pairs of
+              filled voxels in each column
+
+    Returns
+    ----------
+    raw: (shape) bool, True for filled voxels
+    '''
+    start, end, column = run_flatten(index_xy, index_z)
+    shape = np.asanyarray(shape, dtype=np.int64)
+
+    # mark the start and end of each run and integrate along Z
+    # runs never overlap so the sum is only ever 0 or 1
+    edges = np.zeros((shape[0], shape[1], shape[2] + 1), dtype=np.int8)
+    np.add.at(edges, (column[:,0], column[:,1], start),  1)
+    np.add.at(edges, (column[:,0], column[:,1], end),   -1)
+    raw = np.cumsum(edges, axis=2, dtype=np.int8)[:,:,:-1] > 0
     return raw
 
-def mesh_to_run(mesh, pitch):
+def run_flatten(index_xy, index_z):
+    '''
+    Flatten a run-length encoding into one row per run.
+
+    Arguments
+    ----------
+    index_xy: (n, 2) int, column index of each run group
+    index_z:  (n) sequence of (2*m,) int, [start, end) pairs
+
+    Returns
+    ----------
+    start:  (p,) int, first Z index of each run
+    end:    (p,) int, Z index after the last filled voxel of each run
+    column: (p, 2) int, XY index of the column containing each run
+    '''
+    counts = np.array([len(i) // 2 for i in index_z], dtype=np.int64)
+    if counts.sum() == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.zeros((0, 2), dtype=np.int64)
+    pairs  = np.hstack([np.asanyarray(i).reshape(-1) for i in index_z])
+    pairs  = pairs.astype(np.int64).reshape((-1, 2))
+    column = np.repeat(np.asanyarray(index_xy, dtype=np.int64).reshape((-1, 2)),
+                       counts, axis=0)
+    return pairs[:,0], pairs[:,1], column
+
+def runs_to_indices(column, start, end):
     '''
-    Convert a mesh to a run-length encoded voxel grid. 
+    Expand runs into the index of every filled voxel.
+
+    Arguments
+    ----------
+    column: (n, 2) int, XY index of the column containing each run
+    start:  (n,) int, first Z index of each run
+    end:    (n,) int, Z index after the last filled voxel of each run
+
+    Returns
+    ----------
+    index: (m, 3) int, index of every filled voxel
+    '''
+    z, owner = _ranges(start, end - start)
+    index = np.column_stack((column[owner], z))
+    return index
+
+def runs_boolean(a, b, operation):
+    '''
+    Apply a boolean operation to two sets of runs.
+
+    Runs are converted to events where the coverage of each input
+    changes, and a sweep through the sorted events finds where the
+    result of the operation changes. Columns end with no coverage
+    so the sweep can run across all columns at once.
+
+    Arguments
+    ----------
+    a:         tuple of (column (n,2) int, start (n,) int, end (n,) int)
+    b:         tuple of (column (m,2) int, start (m,) int, end (m,) int)
+    operation: function, (p,) bool, (p,) bool -> (p,) bool, which 
+               must be False when neither input is covered
+
+    Returns
+    ----------
+    column: (q, 2) int, XY index of the column containing each run
+    start:  (q,) int, first Z index of each run
+    end:    (q,) int, Z index after the last filled voxel of each run
+    '''
+    column = np.vstack((a[0], a[0], b[0], b[0])).astype(np.int64).reshape((-1, 2))
+    z      = np.concatenate((a[1], a[2], b[1], b[2])).astype(np.int64)
+    count  = [len(a[1]), len(b[1])]
+    change = np.concatenate((np.ones(count[0]), -np.ones(count[0]),
+                             np.zeros(2 * count[1]))).astype(np.int64)
+    change = np.column_stack((change,
+                              np.concatenate((np.zeros(2 * count[0]),
+                                              np.ones(count[1]), 
+                                              -np.ones(count[1]))).astype(np.int64)))
+    if len(z) == 0:
+        return column, z, z
+
+    order  = np.lexsort((z, column[:,1], column[:,0]))
+    column = column[order]
+    z      = z[order]
+    # coverage of each input after every event
+    coverage = np.cumsum(change[order], axis=0) > 0
+
+    # only the state after the last event at a position matters
+    last = np.append(np.logical_or((np.diff(column, axis=0) != 0).any(axis=1),
+                                   np.diff(z) != 0), True)
+    column   = column[last]
+    z        = z[last]
+    state    = operation(coverage[last][:,0], coverage[last][:,1])
+    previous = np.append(False, state[:-1])
+
+    starts = np.logical_and(state, np.logical_not(previous))
+    ends   = np.logical_and(previous, np.logical_not(state))
+    return column[starts], z[starts], z[ends]
+
+def runs_to_faces(column, start, end):
+    '''
+    Find the exposed faces of voxels stored as runs.
+
+    Arguments
+    ----------
+    column: (n, 2) int, XY index of the column containing each run
+    start:  (n,) int, first Z index of each run
+    end:    (n,) int, Z index after the last filled voxel of each run
+
+    Returns
+    ----------
+    vertices: (p, 3) int, voxel grid corners 
+    faces:    (q, 3) int, triangles wound outwards
+    '''
+    # corners of the face of a unit cube on each side, counter- clockwise 
+    # viewed from outside, keyed by (axis, direction)
+    corners = {(0,  1): [[1,0,0], [1,1,0], [1,1,1], [1,0,1]],
+               (0, -1): [[0,0,0], [0,0,1], [0,1,1], [0,1,0]],
+               (1,  1): [[0,1,0], [0,1,1], [1,1,1], [1,1,0]],
+               (1, -1): [[0,0,0], [1,0,0], [1,0,1], [0,0,1]],
+               (2,  1): [[0,0,1], [1,0,1], [1,1,1], [0,1,1]],
+               (2, -1): [[0,0,0], [0,1,0], [1,1,0], [1,0,0]]}
+    
+    runs = (column, start, end)
+    quads = deque()
+    for (axis, direction), corner in corners.items():
+        # a voxel face is exposed if the neighbor on that side is empty
+        neighbor = _shift_runs(runs, axis, -direction)
+        exposed  = runs_to_indices(*runs_boolean(runs, neighbor, 
+                                                 lambda a, b: np.logical_and(a, np.logical_not(b))))
+        quads.append(exposed.reshape((-1, 1, 3)) + np.array(corner))
+    quads = np.vstack(quads).reshape((-1, 3))
+
+    # quad corners are on the integer lattice so merge exactly
+    vertices, inverse = np.unique(quads, axis=0, return_inverse=True)
+    quads = inverse.reshape((-1, 4))
+    faces = np.vstack((quads[:,[0,1,2]],
+                       quads[:,[0,2,3]]))
+    return vertices, faces
+
+def _shift_runs(runs, axis, amount):
+    '''
+    Translate runs along an axis by a number of voxels.
+    '''
+    column, start, end = runs
+    if axis == 2:
+        return column, start + amount, end + amount
+    column = column.copy()
+    column[:,axis] += amount
+    return column, start, end
+
+def _global_runs(runs, offset):
+    '''
+    Move runs from a grid into a lattice anchored at the world origin.
+    '''
+    column, start, end = runs
+    return column + offset[:2], start + offset[2], end + offset[2]
+
+def _global_to_run(runs, pitch, default):
+    '''
+    Convert runs on the world lattice into a run-length dictionary
+    for the smallest grid which contains them.
+    '''
+    column, start, end = runs
+    if len(start) == 0:
+        lower = np.asanyarray(default, dtype=np.int64)
+        upper = lower + 1
+    else:
+        lower = np.append(column.min(axis=0), start.min())
+        upper = np.append(column.max(axis=0) + 1, end.max())
+    shape = upper - lower
+
+    flat = ((column[:,0] - lower[0]) * shape[1]) + (column[:,1] - lower[1])
+    pairs = np.column_stack((start, end)) - lower[2]
+    return runs_from_columns(np.repeat(flat, 2), 
+                             pairs.reshape(-1), 
+                             shape, 
+                             pitch, 
+                             lower * pitch)
+
+def runs_from_columns(column, z, shape, pitch, origin):
+    '''
+    Build the run-length dictionary from sorted [start, end) pairs.
+
+    Arguments
+    ----------
+    column: (n,) int, flat XY column index of every value in z,
+            sorted and with an even number of values per column
+    z:      (n,) int, alternating start and end Z index of runs
+    shape:  (3,) int, shape of the voxel grid
+    pitch:  float, edge length of a voxel
+    origin: (3,) float, position of the grid origin
+
+    Returns
+    ----------
+    run: dict, with keys shape, index_xy, index_z, origin, pitch
+    '''
+    index_xy = deque()
+    index_z  = deque()
+    if len(column) > 0:
+        split = np.nonzero(np.diff(column))[0] + 1
+        first = np.append(0, split)
+        index_xy = np.column_stack(np.unravel_index(column[first], shape[:2]))
+        index_z  = np.empty(len(first), dtype=object)
+        for i, group in enumerate(np.split(z, split)):
+            index_z[i] = group
+
+    result = {'shape'    : np.asanyarray(shape, dtype=np.int64),
+              'index_xy' : np.array(index_xy),
+              'index_z'  : np.array(index_z),
+              'origin'   : np.asanyarray(origin, dtype=np.float64),
+              'pitch'    : pitch}
+    return result
+
+def voxel_grid(bounds, pitch):
+    '''
+    Find the origin and shape of a voxel grid aligned to a pitch
+    which contains a bounding box.
+
+    Arguments
+    ----------
+    bounds: (2, 3) float, axis aligned bounding box
+    pitch:  float, edge length of a voxel
+
+    Returns
+    ----------
+    origin: (3,) float, corner of the voxel grid
+    shape:  (3,) int, number of voxels along each axis
+    '''
+    lower  = np.floor(bounds[0] / pitch)
+    upper  = np.ceil(bounds[1] / pitch)
+    origin = lower * pitch
+    shape  = np.maximum(upper - lower, 1).astype(np.int64)
+    return origin, shape
+
+@_log_time
+def mesh_to_run(mesh, pitch, fill=True, engine=None):
+    '''
+    Convert a mesh to a run-length encoded voxel grid.
+
+    Arguments
+    ----------
+    mesh:   Trimesh object
+    pitch:  float, edge length of a single voxel
+    fill:   bool, if True fill the inside of the mesh,
+            otherwise only voxelize the surface
+    engine: str, 'scanline' (or None) rasterizes triangles directly,
+            'ray' casts a ray through every column (fill only)
+
+    Returns
+    ----------
+    run: dict, with keys:
+         shape:    (3,) int, shape of the voxel grid
+         index_xy: (n, 2) int, XY index of every column with filled voxels
+         index_z:  (n) sequence of (2*m,) int, [start, end) Z index
+                   pairs of filled voxels for each column
+         origin:   (3,) float, corner of the voxel grid
+         pitch:    float, edge length of a voxel
+    '''
+    if engine == 'ray':
+        if not fill:
+            raise ValueError('ray voxelization only supports filled voxels!')
+        return mesh_to_run_ray(mesh, pitch)
+    elif engine not in [None, 'scanline']:
+        raise ValueError('voxel engine {} is not available!'.format(engine))
+
+    if fill:
+        return triangles_to_run_fill(mesh.triangles, pitch)
+    return triangles_to_run_surface(mesh.triangles, pitch)
+
+def triangles_to_run_fill(triangles, pitch, chunk_size=2**20):
+    '''
+    Fill the inside of a closed set of triangles using scanline
+    rasterization along Z.
+
+    Every triangle is projected onto the XY plane and the centers of
+    voxel columns inside the projection are found with vectorized
+    barycentric tests. The Z value of the triangle at each column center
+    is a surface crossing, and consecutive crossings in a column bound
+    a run of filled voxels.
+
+    Arguments
+    ----------
+    triangles:  (n, 3, 3) float, triangle vertices
+    pitch:      float, edge length of a voxel
+    chunk_size: int, maximum number of (triangle, column) pairs
+                evaluated at once
+
+    Returns
+    ----------
+    run: dict, see mesh_to_run
+    '''
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    bounds    = np.vstack((triangles.reshape((-1, 3)).min(axis=0),
+                           triangles.reshape((-1, 3)).max(axis=0)))
+    origin, shape = voxel_grid(bounds, pitch)
+
+    # triangles in voxel units, where column (i,j) has its center at (i+.5, j+.5)
+    local = (triangles - origin) / pitch
+
+    column_all = deque()
+    z_all      = deque()
+    for owner, ix, iy in _triangle_columns(local, shape, chunk_size):
+        tri = local[owner]
+        px  = ix + .5
+        py  = iy + .5
+
+        # 2D barycentric coordinates of column centers
+        ax, ay = tri[:,0,0], tri[:,0,1]
+        e0x = tri[:,1,0] - ax
+        e0y = tri[:,1,1] - ay
+        e1x = tri[:,2,0] - ax
+        e1y = tri[:,2,1] - ay
+        det = (e0x * e1y) - (e1x * e0y)
+        # triangles parallel to Z don't cross the column
+        valid = np.abs(det) > tol.zero
+        det[~valid] = 1.0
+        dx = px - ax
+        dy = py - ay
+        u = ((dx * e1y) - (e1x * dy)) / det
+        v = ((e0x * dy) - (dx * e0y)) / det
+
+        inside = np.logical_and.reduce((valid,
+                                        u >= -tol.merge,
+                                        v >= -tol.merge,
+                                        u + v <= 1.0 + tol.merge))
+        z = (tri[:,0,2] +
+             u * (tri[:,1,2] - tri[:,0,2]) +
+             v * (tri[:,2,2] - tri[:,0,2]))
+
+        column_all.append((ix * shape[1] + iy)[inside])
+        z_all.append(z[inside])
+
+    if len(column_all) == 0:
+        return runs_from_columns([], [], shape, pitch, origin)
+    column = np.hstack(column_all)
+    z      = np.hstack(z_all)
+
+    # a column passing through a shared edge or vertex crosses
+    # every triangle that includes it, so remove duplicates
+    unique = unique_rows(np.column_stack((column, z * pitch)))[0]
+    column = column[unique]
+    z      = z[unique]
+    order  = np.lexsort((z, column))
+    column = column[order]
+    z      = np.round(z[order]).astype(np.int64)
+
+    # columns with an odd number of crossings are likely grazing a
+    # vertex or silhouette edge so only keep the first and last crossing
+    first = np.append(0, np.nonzero(np.diff(column))[0] + 1)
+    count = np.diff(np.append(first, len(column)))
+    odd   = np.nonzero(count % 2 == 1)[0]
+    keep  = np.ones(len(column), dtype=bool)
+    if len(odd) > 0:
+        position, group = _ranges(first[odd], count[odd])
+        interior = np.logical_and(position != first[odd][group],
+                                  position != (first[odd] + count[odd] - 1)[group])
+        keep[position[interior]] = False
+        # a single crossing can't bound a run
+        keep[first[odd][count[odd] == 1]] = False
+    column = column[keep]
+    z      = z[keep]
+
+    # remove empty runs where the entry and exit round to the same voxel
+    pairs = z.reshape((-1, 2))
+    ok    = np.repeat(pairs[:,1] > pairs[:,0], 2)
+
+    return runs_from_columns(column[ok], z[ok], shape, pitch, origin)
+
+def triangles_to_run_surface(triangles, pitch, chunk_size=2**20):
+    '''
+    Voxelize the surface of a set of triangles by sampling each
+    triangle on a barycentric lattice finer than the voxel pitch.
+
+    Arguments
+    ----------
+    triangles:  (n, 3, 3) float, triangle vertices
+    pitch:      float, edge length of a voxel
+    chunk_size: int, maximum number of samples evaluated at once
+
+    Returns
+    ----------
+    run: dict, see mesh_to_run
+    '''
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    bounds    = np.vstack((triangles.reshape((-1, 3)).min(axis=0),
+                           triangles.reshape((-1, 3)).max(axis=0)))
+    origin, shape = voxel_grid(bounds, pitch)
+    local = (triangles - origin) / pitch
+
+    # subdivide every edge to be shorter than half a voxel
+    edge_length = np.linalg.norm(local - np.roll(local, 1, axis=1), axis=2).max(axis=1)
+    divisions = np.ceil(edge_length * 2.0).astype(np.int64) + 1
+    # number of points on a triangular lattice with that many divisions
+    counts = ((divisions + 1) * (divisions + 2)) // 2
+
+    occupied = deque()
+    for owner, k in _chunked_ranges(counts, chunk_size):
+        n = divisions[owner].astype(np.float64)
+        # index of a lattice point in row major triangular order
+        row = np.floor((np.sqrt(8.0 * k + 1.0) - 1.0) / 2.0)
+        col = k - (row * (row + 1.0)) / 2.0
+        # fix floating point error at the ends of rows
+        over = col > row
+        row[over] += 1
+        col[over] = k[over] - (row[over] * (row[over] + 1.0)) / 2.0
+
+        tri = local[owner]
+        w1 = (row - col) / n
+        w2 = col / n
+        w0 = 1.0 - w1 - w2
+        points = ((tri[:,0].T * w0) + (tri[:,1].T * w1) + (tri[:,2].T * w2)).T
+
+        index = np.clip(np.floor(points).astype(np.int64), 0, shape - 1)
+        occupied.append(np.ravel_multi_index(index.T, shape))
+
+    if len(occupied) == 0:
+        return runs_from_columns([], [], shape, pitch, origin)
+    occupied = np.unique(np.hstack(occupied))
+    return _occupied_to_run(occupied, shape, pitch, origin)
+
+def _occupied_to_run(occupied, shape, pitch, origin):
+    '''
+    Convert sorted unique flat voxel indices into a run-length encoding.
+
+    Arguments
+    ----------
+    occupied: (n,) int, sorted flat indices into a grid of shape
+    shape:    (3,) int, shape of the voxel grid
+    pitch:    float, edge length of a voxel
+    origin:   (3,) float, corner of the voxel grid
+
+    Returns
+    ----------
+    run: dict, see mesh_to_run
+    '''
+    column = occupied // shape[2]
+    z      = occupied %  shape[2]
+    # a new run starts when the column changes or Z is not contiguous
+    start = np.append(True, np.logical_or(np.diff(column) != 0,
+                                          np.diff(z) != 1))
+    end   = np.append(start[1:], True)
+    pairs = np.column_stack((z[start], z[end] + 1)).reshape(-1)
+    return runs_from_columns(np.repeat(column[start], 2), pairs, shape, pitch, origin)
+
+def _triangle_columns(local, shape, chunk_size):
+    '''
+    Yield chunks of every (triangle, column) pair where the column center
+    is inside the XY bounding box of the triangle.
+
+    Arguments
+    ----------
+    local:      (n, 3, 3) float, triangles in voxel units
+    shape:      (3,) int, shape of the voxel grid
+    chunk_size: int, maximum pairs per chunk
+
+    Yields
+    ----------
+    owner: (p,) int, triangle index
+    ix:    (p,) int, column X index
+    iy:    (p,) int, column Y index
+    '''
+    low  = np.ceil(local[:,:,:2].min(axis=1) - .5 - tol.merge).astype(np.int64)
+    high = np.floor(local[:,:,:2].max(axis=1) - .5 + tol.merge).astype(np.int64)
+    low  = np.maximum(low, 0)
+    high = np.minimum(high, shape[:2] - 1)
+    size = np.maximum(high - low + 1, 0)
+    counts = size[:,0] * size[:,1]
+
+    for owner, k in _chunked_ranges(counts, chunk_size):
+        ix = low[owner, 0] + (k // size[owner, 1])
+        iy = low[owner, 1] + (k %  size[owner, 1])
+        yield owner, ix, iy
+
+def _chunked_ranges(counts, chunk_size):
+    '''
+    For a set of counts, yield chunks of (owner, k) for every k in
+    range(counts[owner]), without splitting a single owner across chunks.
+
+    Arguments
+    ----------
+    counts:     (n,) int, number of items for each owner
+    chunk_size: int, approximate maximum items per chunk
+
+    Yields
+    ----------
+    owner: (p,) int, index of counts
+    k:     (p,) int, position in range(counts[owner])
+    '''
+    counts = np.asanyarray(counts, dtype=np.int64)
+    cumulative = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        # include owners until the chunk is full, but always at least one
+        base = cumulative[start] - counts[start]
+        end  = max(np.searchsorted(cumulative, base + chunk_size, side='right'),
+                   start + 1)
+        chunk = np.arange(start, end)
+        owner = np.repeat(chunk, counts[chunk])
+        k = np.arange(len(owner)) - np.repeat(cumulative[chunk] - counts[chunk] - base,
+                                              counts[chunk])
+        if len(owner) > 0:
+            yield owner, k
+        start = end
+
+def mesh_to_run_ray(mesh, pitch):
+    '''
+    Convert a mesh to a run-length encoded voxel grid.
 
     This is done via ray tests which return intersection points,
     which is easily convertable to a raw 3D boolean voxel array
@@ -53,18 +785,18 @@ def mesh_to_run(mesh, pitch):
     bounds    = mesh.bounds / pitch
     bounds[0] = np.floor(bounds[0]) * pitch
     bounds[1] = np.ceil( bounds[1]) * pitch
-    
+
     x_grid = np.arange(*bounds[:,0], step = pitch)
-    y_grid = np.arange(*bounds[:,1], step = pitch)    
+    y_grid = np.arange(*bounds[:,1], step = pitch)
     grid   = np.dstack(np.meshgrid(x_grid, y_grid)).reshape((-1,2))
 
     ray_origins  = np.column_stack((grid, np.tile(bounds[0][2], len(grid))))
     ray_origins += [pitch*.5, pitch*.5, -pitch]
     ray_vectors  = np.tile([0.0,0.0,1.0], (len(grid),1))
-    rays         = np.column_stack((ray_origins, 
+    rays         = np.column_stack((ray_origins,
                                     ray_vectors)).reshape((-1,2,3))
 
-    hits        = mesh.ray.intersects_location(rays)    
+    hits        = mesh.ray.intersects_location(rays)
     raw_shape   = np.ptp(bounds/pitch, axis=0).astype(int)
     grid_origin = bounds[0]
     grid_index  = np.rint((grid/pitch) - (grid_origin[0:2]/pitch)).astype(int)
@@ -77,7 +809,7 @@ def mesh_to_run(mesh, pitch):
 
         z = hit[:,2]-grid_origin[2]
         # if a ray hits exactly on an edge, there will
-        # be a duplicate entry in hit (for both triangles) 
+        # be a duplicate entry in hit (for both triangles)
         z = unique_float(z)
 
         index_z = np.round(z/pitch).astype(int)
@@ -92,12 +824,12 @@ def mesh_to_run(mesh, pitch):
         run_z.append(index_z)
         run_xy.append(grid_index[i])
 
-    result = {'shape'    : raw_shape, 
-              'index_xy' : np.array(run_xy), 
-              'index_z'  : np.array(run_z), 
+    result = {'shape'    : raw_shape,
+              'index_xy' : np.array(run_xy),
+              'index_z'  : np.array(run_z),
               'origin'   : grid_origin,
-              'pitch'    : pitch}    
-    return result        
+              'pitch'    : pitch}
+    return result
 
 def plot_raw(raw, pitch, origin, **kwargs):
     render = np.column_stack(np.nonzero(raw))*pitch + origin
@@ -0,0 +1,296 @@
+'''
+trimesh.winding: generalized winding numbers for point containment
+
+The winding number of a closed, consistently wound surface around a
+point is 1 inside and 0 outside, and degrades gracefully for meshes with
+small holes or points on edges and vertices, where ray parity fails.
+
+Triangles far from a query point are approximated with the dipole
+expansion of their BVH node (Barnes-Hut), so the cost per point scales
+with the log of the number of faces rather than linearly.
+
+Implemented from:
+Barill et al. "Fast Winding Numbers for Soups and Clouds" 2018
+Jacobson et al. "Robust Inside-Outside Segmentation using Generalized
+Winding Numbers" 2013
+'''
+import numpy as np
+
+from .util      import Cache
+from .triangles import cross
+
+def solid_angle(triangles, points):
+    '''
+    Find the signed solid angle subtended by each triangle at each point,
+    pairwise.
+
+    Implemented from:
+    Van Oosterom and Strackee "The Solid Angle of a Plane Triangle" 1983
+
+    Arguments
+    ----------
+    triangles: (n, 3, 3) float, triangle vertices
+    points:    (n, 3) float, points in space
+
+    Returns
+    ----------
+    angle: (n,) float, signed solid angle in steradians, positive when
+           the point is behind a counter- clockwise wound triangle
+    '''
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    points    = np.asanyarray(points,    dtype=np.float64)
+
+    a = triangles[:,0] - points
+    b = triangles[:,1] - points
+    c = triangles[:,2] - points
+
+    la = np.sqrt(_dot(a, a))
+    lb = np.sqrt(_dot(b, b))
+    lc = np.sqrt(_dot(c, c))
+
+    numerator   = _dot(a, np.cross(b, c))
+    denominator = ((la * lb * lc) +
+                   (_dot(a, b) * lc) +
+                   (_dot(a, c) * lb) +
+                   (_dot(b, c) * la))
+    angle = 2.0 * np.arctan2(numerator, denominator)
+    return angle
+
+def node_dipoles(triangles, tree):
+    '''
+    Find the first order far- field expansion of every node of a BVH.
+
+    Arguments
+    ----------
+    triangles: (n, 3, 3) float, triangle vertices
+    tree:      trimesh.bvh.BVH of triangles
+
+    Returns
+    ----------
+    center: (k, 3) float, area weighted centroid of each node
+    normal: (k, 3) float, summed area weighted normal of each node
+    radius: (k,) float, radius of a sphere around center containing the node
+    '''
+    # area weighted normal vectors
+    normals = cross(triangles) * .5
+    area    = np.sqrt((normals ** 2).sum(axis=1))
+
+    normal = tree.node_reduce(np.add, normals)
+    area_node = tree.node_reduce(np.add, area)
+    center = tree.node_reduce(np.add, triangles.mean(axis=1) * area.reshape((-1, 1)))
+
+    # nodes that are entirely degenerate use the box center
+    valid = area_node > 0.0
+    center[valid] /= area_node[valid].reshape((-1, 1))
+    center[~valid] = tree.node_bounds[~valid].mean(axis=1)
+
+    # distance from center to farthest corner of the node box
+    corner = np.maximum(np.abs(tree.node_bounds[:,0] - center),
+                        np.abs(tree.node_bounds[:,1] - center))
+    radius = np.sqrt((corner ** 2).sum(axis=1))
+
+    return center, normal, radius
+
+def winding_number(triangles,
+                   points,
+                   tree         = None,
+                   dipoles      = None,
+                   beta         = 2.0,
+                   cluster_size = 32,
+                   chunk_size   = 2**18):
+    '''
+    Find the generalized winding number of a set of triangles
+    around a set of points.
+
+    Query points are grouped into spatially compact clusters which
+    descend the triangle tree together, and only split into individual
+    points once a node is too close to approximate for the whole cluster.
+
+    Arguments
+    ----------
+    triangles:    (n, 3, 3) float, triangle vertices
+    points:       (m, 3) float, points in space
+    tree:         trimesh.bvh.BVH of triangles, created if not passed
+    dipoles:      result of node_dipoles(triangles, tree), created if not passed
+    beta:         float, accuracy parameter: a node is approximated if the
+                  point is further than beta * node radius from the node center.
+                  Larger is more accurate and slower, np.inf is exact.
+    cluster_size: int, maximum number of query points in a cluster
+    chunk_size:   int, maximum number of pairs evaluated at once
+
+    Returns
+    ----------
+    winding: (m,) float, winding number of triangles around each point
+    '''
+    from .bvh import BVH
+
+    triangles = np.asanyarray(triangles, dtype=np.float64)
+    points    = np.asanyarray(points,    dtype=np.float64).reshape((-1, 3))
+    if tree is None:
+        tree = BVH(np.stack((triangles.min(axis=1),
+                             triangles.max(axis=1)), axis=1))
+    if dipoles is None:
+        dipoles = node_dipoles(triangles, tree)
+    center, normal, radius = dipoles
+    is_leaf = tree.is_leaf
+
+    total = np.zeros(len(points))
+    if len(triangles) == 0 or len(points) == 0:
+        return total / (4.0 * np.pi)
+
+    # the leaves of a tree built on the query points are the clusters
+    clusters = BVH(np.stack((points, points), axis=1), leaf_size=cluster_size)
+    leaves   = np.nonzero(clusters.is_leaf)[0]
+    cluster_center = clusters.node_bounds[leaves].mean(axis=1)
+    cluster_radius = np.sqrt(((np.diff(clusters.node_bounds[leaves], 
+                                       axis=1).reshape((-1, 3)) * .5) ** 2).sum(axis=1))
+
+    def dipole(query, node):
+        # first order approximation of the solid angle of nodes
+        vector = center[node] - points[query]
+        return np.bincount(query,
+                           weights   = (_dot(vector, normal[node]) /
+                                        (_dot(vector, vector) ** 1.5)),
+                           minlength = len(points))
+
+    def expand(cluster, node):
+        # turn (cluster, node) pairs into (point, node) pairs
+        owner, query = clusters.node_primitives(leaves[cluster])
+        return query, node[owner]
+
+    chunk_size = max(int(chunk_size), 1)
+    # pairs waiting to be evaluated are popped depth first
+    # so pending memory stays bounded by a multiple of chunk_size
+    stack_cluster = _chunks(np.arange(len(leaves)), 
+                            np.zeros(len(leaves), dtype=np.int64),
+                            chunk_size)
+    stack_point = []
+    while len(stack_cluster) > 0:
+        cluster, node = stack_cluster.pop()
+
+        distance = np.sqrt(_dot(center[node] - cluster_center[cluster],
+                                center[node] - cluster_center[cluster]))
+        node_reach = radius[node] * beta
+        # every point in the cluster is far from the node
+        far = distance > (node_reach + cluster_radius[cluster])
+        if far.any():
+            total += dipole(*expand(cluster[far], node[far]))
+
+        # nodes which are leaves or too small relative to the cluster
+        # are evaluated with the per- point traversal
+        near  = np.logical_not(far)
+        split = np.logical_and(near, np.logical_or(is_leaf[node],
+                                                   node_reach < cluster_radius[cluster]))
+        if split.any():
+            stack_point.extend(_chunks(*expand(cluster[split], node[split]),
+                                       chunk_size = chunk_size))
+
+        branch  = np.logical_and(near, np.logical_not(split))
+        cluster = np.repeat(cluster[branch], 2)
+        node    = tree.node_children[node[branch]].reshape(-1)
+        stack_cluster.extend(_chunks(cluster, node, chunk_size))
+
+        # evaluate per- point pairs as they are produced to bound memory
+        while len(stack_point) > 0:
+            query, node = stack_point.pop()
+
+            vector = center[node] - points[query]
+            far = _dot(vector, vector) > ((radius[node] * beta) ** 2)
+            if far.any():
+                total += dipole(query[far], node[far])
+
+            near = np.logical_not(far)
+            leaf = np.logical_and(near, is_leaf[node])
+            if leaf.any():
+                owner, primitive = tree.node_primitives(node[leaf])
+                exact = query[leaf][owner]
+                total += np.bincount(exact,
+                                     weights   = solid_angle(triangles[primitive],
+                                                             points[exact]),
+                                     minlength = len(points))
+
+            branch = np.logical_and(near, np.logical_not(leaf))
+            query  = np.repeat(query[branch], 2)
+            node   = tree.node_children[node[branch]].reshape(-1)
+            stack_point.extend(_chunks(query, node, chunk_size))
+
+    winding = total / (4.0 * np.pi)
+    return winding
+
+def _dot(a, b):
+    '''
+    Row- wise dot product of two (n, 3) arrays.
+    '''
+    return np.einsum('ij,ij->i', a, b)
+
+def _chunks(query, node, chunk_size):
+    '''
+    Split paired arrays into a list of blocks no longer than chunk_size.
+    '''
+    return [(query[i:i + chunk_size], node[i:i + chunk_size])
+            for i in range(0, len(query), chunk_size)]
+
+def contains_points(mesh, points, beta=2.0):
+    '''
+    Check if a mesh contains a set of points, using generalized
+    winding numbers.
+
+    Arguments
+    ---------
+    mesh:   Trimesh object
+    points: (n,3) points in space
+    beta:   float, far- field accuracy parameter
+
+    Returns
+    ---------
+    contains: (n) boolean array, whether point is inside mesh or not
+    '''
+    winding  = mesh.winding.number(points, beta=beta)
+    contains = winding > 0.5
+    return contains
+
+class WindingQuery:
+    '''
+    Winding number queries for the current mesh, which cache
+    the tree and far- field expansion until the mesh changes.
+    '''
+    def __init__(self, mesh):
+        self._mesh  = mesh
+        self._cache = Cache(self._mesh.md5)
+
+    @property
+    def tree(self):
+        '''
+        A BVH of the triangles of the mesh, shared with the other queries.
+        '''
+        return self._mesh.triangles_bvh()
+
+    @property
+    def dipoles(self):
+        '''
+        The far- field expansion of every node of the tree.
+        '''
+        if 'dipoles' in self._cache:
+            return self._cache.get('dipoles')
+        return self._cache.set('dipoles',
+                               node_dipoles(self._mesh.triangles, self.tree),
+                               evictable = True)
+
+    def number(self, points, beta=2.0):
+        '''
+        Find the generalized winding number of the mesh around points.
+
+        Arguments
+        ----------
+        points: (n, 3) float, points in space
+        beta:   float, far- field accuracy parameter
+
+        Returns
+        ----------
+        winding: (n,) float, ~1.0 inside and ~0.0 outside
+        '''
+        return winding_number(triangles = self._mesh.triangles,
+                              points    = points,
+                              tree      = self.tree,
+                              dipoles   = self.dipoles,
+                              beta      = beta)